@@ -1,8 +1,11 @@
 from flask import Flask, jsonify
 from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
-from flask_caching import Cache
 from flask_cors import CORS
+from db.identity import clear_identity_map
+from db.loader import clear_dataloaders
+from utils.response_cache import response_cache
+from core.roles import role_cache
 from settings import *
 
 
@@ -12,6 +15,11 @@ app.config['JWT_SECRET_KEY'] = SECRET_KEY
 # Implements CORS headers
 CORS(app)
 
+# Vertices loaded by id (and the related vertices loaded through the
+# dataloaders) are only kept for the duration of a request
+app.teardown_request(clear_identity_map)
+app.teardown_request(clear_dataloaders)
+
 # Registering the sub-modules
 from auth.views import auth_app
 from core.views import core_app
@@ -20,7 +28,8 @@ app.register_blueprint(auth_app, url_prefix="/auth")
 app.register_blueprint(core_app)
 
 jwt = JWTManager(app)
-# cache = Cache(app)
+response_cache.init_app(app, RESPONSE_CACHE_SETTINGS, WORKER_PROCESSES)
+role_cache.init_app(response_cache.shared_backend(), WORKER_PROCESSES)
 bcrypt = Bcrypt(app)
 
 
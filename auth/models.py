@@ -1,4 +1,6 @@
-from db.engine import Vertex, Edge, client
+from db.engine import (
+    Vertex, Edge, client, g, __, submit_traversal, vertex_key
+)
 from db.exceptions import (
     CustomValidationFailedException,
     ObjectCanNotBeDeletedException
@@ -28,11 +30,9 @@ class UserHoldsAccount(Edge):
                 while a new primary holder is going to be added upon this
                 edge's creation [TODO]
         """
-        user_query = f"g.V().has('{User.LABEL}', 'id', '{outv_id}')"
-        existing_edge_query = user_query + \
-            f".outE('{cls.LABEL}')" + \
-            f".inV().has('{Account.LABEL}', 'id', '{inv_id}')"
-        existing_primary_edge = client.submit(existing_edge_query) \
+        existing_edge_query = g.V(vertex_key(User.LABEL, outv_id)) \
+            .outE(cls.LABEL).inV().has(Account.LABEL, "id", inv_id)
+        existing_primary_edge = submit_traversal(existing_edge_query) \
             .all().result()
 
         if existing_primary_edge:
@@ -41,6 +41,22 @@ class UserHoldsAccount(Edge):
 
         return data
 
+    @classmethod
+    def bulk_custom_validation(cls, rows, outv_label=None, inv_label=None):
+        """ Batched `custom_validation`; runs a single query for finding all
+            of the accounts already held by the users
+        """
+        pairs = [(outv_id, inv_id) for _, outv_id, inv_id, _ in rows]
+        held = cls.existing_edge_pairs(pairs, User.LABEL, Account.LABEL)
+
+        errors = {}
+        for index, outv_id, inv_id, _ in rows:
+            if (outv_id, inv_id) in held:
+                errors[index] = CustomValidationFailedException(
+                    "User already holds account!")
+            held.add((outv_id, inv_id))
+        return errors
+
     def delete(self):
         """ Overwritten to provide custom validation before deleting the
             edge
@@ -62,9 +78,8 @@ class UserIsAccountAdmin(Edge):
     @classmethod
     def get_account_admins(cls, account_id):
         """ Returns all Users that are admins of the given account """
-        query = f"g.V().has('{Account.LABEL}', 'id', '{account_id}')" + \
-            f".in('{cls.LABEL}')"
-        result = client.submit(query).all().result()
+        query = g.V(vertex_key(Account.LABEL, account_id)).in_(cls.LABEL)
+        result = submit_traversal(query).all().result()
 
         return [User.vertex_to_instance(i) for i in result]
 
@@ -106,22 +121,37 @@ class AccountOwnsTeam(Edge):
 
         return data
 
+    @classmethod
+    def bulk_custom_validation(cls, rows, outv_label=None, inv_label=None):
+        """ Batched `custom_validation`; runs a single query for finding all
+            of the existing account -> team edges
+        """
+        pairs = [(outv_id, inv_id) for _, outv_id, inv_id, _ in rows]
+        owned = cls.existing_edge_pairs(pairs, outv_label, inv_label)
+
+        errors = {}
+        for index, outv_id, inv_id, _ in rows:
+            if (outv_id, inv_id) in owned:
+                errors[index] = CustomValidationFailedException(
+                    "Targeted team is already owned by another account")
+            owned.add((outv_id, inv_id))
+        return errors
+
     @classmethod
     def get_teams(cls, account_id):
         """ Returns all teams owned by this account id """
-        query = f"g.V().hasLabel('{Account.LABEL}')" + \
-            f".has('id', '{account_id}').out('{cls.LABEL}')"
-        results = client.submit(query).all().result()
+        query = g.V(vertex_key(Account.LABEL, account_id)).out(cls.LABEL)
+        results = submit_traversal(query).all().result()
 
         return [core.Team.vertex_to_instance(i) for i in results]
 
     @classmethod
     def get_team_owner(self, team_id):
         """ Returns the Account instance that owns the given team """
-        query = f"g.V().hasLabel('{core.Team.LABEL}').has('id', '{team_id}')" + \
-            f".in('{AccountOwnsTeam.LABEL}')"
+        query = g.V(vertex_key(core.Team.LABEL, team_id)) \
+            .in_(AccountOwnsTeam.LABEL)
 
-        owner = client.submit(query).all().result()
+        owner = submit_traversal(query).all().result()
         return Account.vertex_to_instance(owner[0])
 
 
@@ -145,10 +175,10 @@ class UserAssignedToCoreVertex(Edge):
             to the user for the given core-vertex
         """
         INV_LABEL = inv_label or cls.INV_LABEL
-        query = f"g.V().hasLabel('{INV_LABEL}')" + \
-            f".has('id', '{core_vertex_id}').inE('{cls.LABEL}').as('e')" + \
-            f".outV().has('id', '{user_id}').select('e')"
-        result = client.submit(query).all().result()
+        query = g.V(vertex_key(INV_LABEL, core_vertex_id)) \
+            .inE(cls.LABEL).as_("e") \
+            .outV().has("id", user_id).select("e")
+        result = submit_traversal(query).all().result()
 
         if result:
             result = result[0]
@@ -156,20 +186,25 @@ class UserAssignedToCoreVertex(Edge):
             return edge
         return None
 
+    @classmethod
+    def after_write(cls, pairs):
+        """ Drops the cached roles of the (re)assigned users """
+        core.roles.role_cache.invalidate_assignments(pairs)
+
     @classmethod
     def get_members(cls, vertex_type, vertex_id):
         """ Returns a list of members (id, email, avatarLink, role) that
             are assigned to the given coreVertex
                 - SERIALIZED
         """
-        query = f"g.V().has('{vertex_type}', 'id', '{vertex_id}')" + \
-            f".inE('{cls.LABEL}').as('e')" + \
-            f".outV().as('user').project('id', 'email', 'role', 'fullName')" + \
-            f".by(select('user').values('id'))" + \
-            f".by(select('user').values('email'))" + \
-            f".by(select('e').values('role'))" + \
-            f".by(select('user').values('fullName'))"
-        result = client.submit(query).all().result()
+        query = g.V(vertex_key(vertex_type, vertex_id)) \
+            .inE(cls.LABEL).as_("e") \
+            .outV().as_("user").project("id", "email", "role", "fullName") \
+            .by(__.select("user").values("id")) \
+            .by(__.select("user").values("email")) \
+            .by(__.select("e").values("role")) \
+            .by(__.select("user").values("fullName"))
+        result = submit_traversal(query).all().result()
 
         for i in result:
             i["avatarLink"] = None
@@ -194,12 +229,11 @@ class Account(Vertex):
         """ Returns the account details along with the admins of this
             account
         """
-        query = f"g.V().has('{cls.LABEL}', 'id', '{account_id}')" + \
-            f".fold().project('account', 'admins')" + \
-            f".by(unfold())" + \
-            f".by(unfold().inE('{UserIsAccountAdmin.LABEL}')" + \
-            f".outV().fold())"
-        result = client.submit(query).all().result()
+        query = g.V(vertex_key(cls.LABEL, account_id)) \
+            .fold().project("account", "admins") \
+            .by(__.unfold()) \
+            .by(__.unfold().inE(UserIsAccountAdmin.LABEL).outV().fold())
+        result = submit_traversal(query).all().result()
         
         if not result:
             return []
@@ -212,9 +246,9 @@ class Account(Vertex):
         """ Returns all users who "hold" this account through the
             UserHoldsAccount edge
         """
-        query = f"g.V().has('{self.LABEL}', 'id', '{self.id}')" + \
-            f".in('{UserHoldsAccount.LABEL}').hasLabel('{User.LABEL}')"
-        r = client.submit(query).all().result()
+        query = g.V(vertex_key(self.LABEL, self.id)) \
+            .in_(UserHoldsAccount.LABEL).hasLabel(User.LABEL)
+        r = submit_traversal(query).all().result()
 
         return [User.vertex_to_instance(i) for i in r]
 
@@ -240,31 +274,28 @@ class User(Vertex):
             into Account models before being returned; otherwise they're
             returned as IDs
         """
-        user_accounts_q = f"g.V().has('{cls.LABEL}', 'id', '{user_id}')" + \
-                           f".as('u').out('{UserHoldsAccount.LABEL}')" + \
-                           f".hasLabel('{Account.LABEL}')" + \
-                           f".store('accounts').select('u')" + \
-                           f".out('{UserAssignedToCoreVertex.LABEL}')" + \
-                           f".hasLabel('team').in('{AccountOwnsTeam.LABEL}')" + \
-                           f".store('accounts').cap('accounts')" + \
-                           f".unfold().dedup()"
-        user_accounts = client.submit(user_accounts_q).all().result()
+        user_accounts_q = g.V(vertex_key(cls.LABEL, user_id)) \
+            .as_("u").out(UserHoldsAccount.LABEL).hasLabel(Account.LABEL) \
+            .store("accounts").select("u") \
+            .out(UserAssignedToCoreVertex.LABEL) \
+            .hasLabel("team").in_(AccountOwnsTeam.LABEL) \
+            .store("accounts").cap("accounts") \
+            .unfold().dedup()
 
         if initialize_models:
-            account_ids = ','.join([f"'{i['id']}'" for i in user_accounts])
-            admins_query = f"g.V().has('id', within({account_ids}))" + \
-                f".inE('{UserIsAccountAdmin.LABEL}')" + \
-                f".project('inV', 'outV')" + \
-                f".by(inV()).by(outV())"
-            admins = client.submit(admins_query).all().result()
+            # The admins are fetched along with each account, rather than
+            # being looked up through the list of account ids
+            user_accounts_q = user_accounts_q \
+                .project("account", "admins") \
+                .by() \
+                .by(__.in_(UserIsAccountAdmin.LABEL).fold())
             accounts = []
-            for account in user_accounts:
-                account = Account.vertex_to_instance(account)
-                account.admins = list(map(
-                    lambda x: User.vertex_to_instance(x["outV"]),
-                    filter(lambda x: x["inV"]["id"] == account.id, admins)
-                ))
+            for result in submit_traversal(user_accounts_q).all().result():
+                account = Account.vertex_to_instance(result["account"])
+                account.admins = [User.vertex_to_instance(i)
+                                  for i in result["admins"]]
                 accounts.append(account)
             return accounts
         else:
+            user_accounts = submit_traversal(user_accounts_q).all().result()
             return [i["id"] for i in user_accounts]
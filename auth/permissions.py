@@ -2,7 +2,8 @@ import functools
 import flask
 from flask import make_response, jsonify
 from auth.models import User, Account
-from flask_jwt_extended import get_jwt_identity
+from flask_jwt_extended import get_jwt_identity, get_jwt_claims
+from settings import ADMIN_EMAILS
 
 
 def account_held_by_user(view):
@@ -16,7 +17,9 @@ def account_held_by_user(view):
             model Methods
         """
         user_id = get_jwt_identity()
-        user = User.filter(id=user_id)[0]
+        # The views only need the user's details (not the password hash)
+        user = User.filter(
+            id=user_id, fields=["fullName", "email", "username"])[0]
 
         account = Account.get_account_with_admins(account_id)
         if not account:
@@ -33,3 +36,18 @@ def account_held_by_user(view):
                     account_id=account_id, **kwargs)
 
     return wrapper
+
+
+def user_is_admin(view):
+    """ Returns the view if the authenticated user's email is one of the
+        ADMIN_EMAILS (set through the settings)
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if get_jwt_claims().get("email") not in ADMIN_EMAILS:
+            return flask.abort(make_response(
+                jsonify({"error": "User is not an admin."}), 403))
+
+        return view(*args, **kwargs)
+
+    return wrapper
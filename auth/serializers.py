@@ -33,8 +33,6 @@ class AccountDetailSchema(Schema):
         """ Returns all users holding this account as well as their
             relationship
         """
-        return ["TEMPORARILY DISABLED TO PREVENT REQUEST"
-                "RATE TOO LARGE ERROR!"]
         users = obj.get_users()
         data = UserListSchema(many=True).dumps(users)
         data = json.loads(data.data)
@@ -0,0 +1,54 @@
+from utils.flask_test_case import FlaskTestCase
+from flask_jwt_extended import create_access_token
+from auth.models import *
+from auth import permissions
+from db.engine import get_slow_query_log
+
+
+class SlowQueryLogTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) Only the admin users can read/clear the slow query log
+        2) The logged queries are returned with the log's threshold
+    """
+    def setUp(self):
+        super().setUp()
+        self.url = "/auth/admin/slow-queries"
+        self.user = User.create(**{
+            "username": "TestU",
+            "email": "admin@g.com",
+            "password": "Test",
+            "fullName": "Test User"
+        })
+        self.token = create_access_token(identity=self.user)
+        self.slow_query_log = get_slow_query_log()
+        self.threshold_ms = self.slow_query_log.threshold_ms
+
+    def tearDown(self):
+        self.slow_query_log.threshold_ms = self.threshold_ms
+        if self.user.email in permissions.ADMIN_EMAILS:
+            permissions.ADMIN_EMAILS.remove(self.user.email)
+        super().tearDown()
+
+    def test_only_admins_can_read_the_log(self):
+        """ Asserts that non-admin users get a 403 """
+        response = self.client.get(self.url, headers={
+            "Authorization": f"Bearer {self.token}"})
+        self.assertEqual(response.status_code, 403)
+
+    def test_admins_can_read_and_clear_the_log(self):
+        """ Asserts that the slow queries are returned, and cleared """
+        permissions.ADMIN_EMAILS.append(self.user.email)
+        self.slow_query_log.clear()
+        self.slow_query_log.threshold_ms = 0
+        User.filter(id=self.user.id)
+
+        headers = {"Authorization": f"Bearer {self.token}"}
+        response = self.client.get(self.url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["threshold_ms"], 0)
+        self.assertIn("User.filter",
+                      [i["caller"] for i in response.json["queries"]])
+
+        response = self.client.delete(self.url, headers=headers)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.slow_query_log.snapshot(), [])
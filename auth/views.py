@@ -17,6 +17,10 @@ from db.exceptions import (
     ObjectCanNotBeDeletedException
 )
 from utils.s3_engine import S3Engine
+from db.engine import UnitOfWork, get_slow_query_log
+from core.roles import role_cache
+from core.templates import template_cache
+from utils.response_cache import response_cache
 
 
 auth_app = Blueprint("auth", __name__)
@@ -45,11 +49,14 @@ def register():
         data.data["password"]).decode("utf-8")
 
     # Creating the User and it's primary account + account admin edge
-    user = User.create(**data.data)
-    account = Account.create(title=f"myaccount@{user.username}")
-    holds_edge = UserHoldsAccount.create(user=user.id, account=account.id,
-                                         relationType="primary")
-    admin_edge = UserIsAccountAdmin.create(user=user.id, account=account.id)
+    with UnitOfWork() as uow:
+        user = uow.create(User, **data.data)
+        account = uow.create(
+            Account, title=f"myaccount@{data.data['username']}")
+        uow.create_edge(UserHoldsAccount, user, account,
+                        relationType="primary")
+        uow.create_edge(UserIsAccountAdmin, user, account)
+    user = user.instance
 
     response = {
         "user": json.loads(schema.dumps(user).data),
@@ -100,18 +107,11 @@ def create_account():
     if 'title' not in data:
         return jsonify_response({"errors": "`title` field is required."}, 400)
 
-    held_accounts = user.get_held_accounts(user.id)
-    if held_accounts:
-        user_accounts = ",".join(f"'{i}'" for i in held_accounts)
-        user_account_names_q = \
-            f"g.V().hasLabel('{Account.LABEL}')" + \
-            f".has('id', within({user_accounts}))" + \
-            f".values('title')"
-        user_account_names = client.submit(user_account_names_q).all().result()
-
-        if data["title"] in user_account_names:
-            return jsonify_response(
-                {"errors": "Users with the title already exist"}, 400)
+    held_accounts = Account.get_many(
+        user.get_held_accounts(user.id), fields=["title"])
+    if data["title"] in [i.title for i in held_accounts.values()]:
+        return jsonify_response(
+            {"errors": "Users with the title already exist"}, 400)
 
     account = Account.create(title=data["title"])
     edge = UserHoldsAccount.create(user=user.id, account=account.id,
@@ -150,19 +150,12 @@ class ListCreateAccountsView(MethodView):
         if 'title' not in data:
             return jsonify_response({"errors": "`title` field is required."}, 400)
 
-        held_accounts = User.get_held_accounts(user_id)
-        if held_accounts:
-            user_accounts = ",".join(f"'{i}'" for i in held_accounts)
-            user_account_names_q = \
-                f"g.V().hasLabel('{Account.LABEL}')" + \
-                f".has('id', within({user_accounts}))" + \
-                f".values('title')"
-            user_account_names = client.submit(user_account_names_q).all().result()
-
-            if data["title"] in user_account_names:
-                return jsonify_response(
-                    {"errors": "Account with the given title already exists"},
-                    400)
+        held_accounts = Account.get_many(
+            User.get_held_accounts(user_id), fields=["title"])
+        if data["title"] in [i.title for i in held_accounts.values()]:
+            return jsonify_response(
+                {"errors": "Account with the given title already exists"},
+                400)
 
         account = Account.create(title=data["title"])
         held_edge = UserHoldsAccount.create(user=user_id, account=account.id,
@@ -359,11 +352,65 @@ class UserListView(MethodView):
             queries["fullName"] = f"TextP.startingWith('{email_query}')"
             queries["wildcard_properties"].append("email")
 
-        users = User.filter(limit=10, **queries)
-        response = UserListSchema(many=True).dumps(users).data
+        users = User.stream_filter(limit=10, **queries)
 
-        return jsonify_response(json.loads(response), 200)
+        return stream_json_response(users, UserListSchema())
 
 auth_app.add_url_rule("/users",
                       view_func=UserListView.as_view(
                           "users_search"))
+
+
+class SlowQueryLogView(MethodView):
+    """ Admin endpoint that provides the queries kept in the slow query log
+        (see db.instrumentation.SlowQueryLog)
+    """
+    @jwt_required
+    @permissions.user_is_admin
+    def get(self):
+        """ Returns the logged slow queries (the slowest first) along with
+            the log's threshold
+        """
+        slow_query_log = get_slow_query_log()
+        if slow_query_log is None:
+            return jsonify_response(
+                {"error": "Queries are not instrumented."}, 404)
+
+        response = {
+            "threshold_ms": slow_query_log.threshold_ms,
+            "queries": slow_query_log.snapshot()
+        }
+        return jsonify_response(json.loads(json.dumps(
+            response, default=str)), 200)
+
+    @jwt_required
+    @permissions.user_is_admin
+    def delete(self):
+        """ Clears the slow query log """
+        slow_query_log = get_slow_query_log()
+        if slow_query_log is not None:
+            slow_query_log.clear()
+        return jsonify_response({}, 204)
+
+auth_app.add_url_rule("/admin/slow-queries",
+                      view_func=SlowQueryLogView.as_view(
+                          "slow_query_log"))
+
+
+class CacheStatsView(MethodView):
+    """ Admin endpoint that provides the hit/miss metrics of the caches
+        shared between requests
+    """
+    @jwt_required
+    @permissions.user_is_admin
+    def get(self):
+        """ Returns the metrics of the response, role and template caches """
+        return jsonify_response({
+            "responses": response_cache.stats(),
+            "roles": role_cache.stats(),
+            "templates": template_cache.stats()
+        }, 200)
+
+auth_app.add_url_rule("/admin/cache-stats",
+                      view_func=CacheStatsView.as_view(
+                          "cache_stats"))
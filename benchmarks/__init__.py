@@ -0,0 +1,36 @@
+""" Contains the benchmark scripts used for comparing the performance of
+    different database access paths. Each benchmark can be run from the
+    main package as a module, i.e:
+        python -m benchmarks.query_templates_benchmark
+"""
+import time
+
+
+def run_benchmark(name, function, iterations=1000):
+    """ Calls the given function `iterations` times and returns a dictionary
+        with the total duration and the throughput (calls per second)
+    """
+    start = time.perf_counter()
+    for i in range(iterations):
+        function(i)
+    duration = time.perf_counter() - start
+
+    return {
+        "name": name,
+        "iterations": iterations,
+        "duration": duration,
+        "throughput": iterations / duration if duration else float("inf")
+    }
+
+
+def print_results(results):
+    """ Prints the results returned by `run_benchmark` as a table, along
+        with each result's speedup compared to the first result
+    """
+    baseline = results[0]["throughput"]
+    print(f"{'benchmark':<40}{'iterations':>12}{'seconds':>12}"
+          f"{'ops/sec':>14}{'speedup':>10}")
+    for result in results:
+        print(f"{result['name']:<40}{result['iterations']:>12}"
+              f"{result['duration']:>12.4f}{result['throughput']:>14.1f}"
+              f"{result['throughput'] / baseline:>9.2f}x")
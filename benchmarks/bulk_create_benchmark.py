@@ -0,0 +1,56 @@
+""" Compares creating CoreVertex rows one query at a time (`create` in a
+    loop) against `Vertex.bulk_create`, which writes each chunk of rows
+    through a single query with several chunks in flight at once.
+
+    The rows are submitted to the configured database; DB_BACKEND=memory can
+    be used to measure the Python side alone:
+        python -m benchmarks.bulk_create_benchmark --rows 10000
+"""
+import argparse
+from benchmarks import run_benchmark, print_results
+from core.models import CoreVertex
+from db.engine import client
+
+
+def rows(count, run):
+    """ Returns `count` unique CoreVertex property dictionaries """
+    return [{
+        "title": f"Benchmark Node {run}-{i}",
+        "templateData": "{}",
+        "content": ""
+    } for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--chunk-size", type=int,
+                        default=CoreVertex.BULK_CHUNK_SIZE)
+    parser.add_argument("--parallelism", type=int,
+                        default=CoreVertex.BULK_PARALLELISM)
+    args = parser.parse_args()
+
+    def create_loop(run):
+        for data in rows(args.rows, run):
+            CoreVertex.create(**data)
+
+    def bulk_create(run):
+        CoreVertex.bulk_create(rows(args.rows, run),
+                               chunk_size=args.chunk_size,
+                               parallelism=args.parallelism)
+
+    try:
+        results = [
+            run_benchmark(f"create loop ({args.rows} rows)", create_loop, 1),
+            run_benchmark(f"bulk_create ({args.rows} rows)", bulk_create, 1)
+        ]
+    finally:
+        client.submit(f"g.V().hasLabel('{CoreVertex.LABEL}')"
+                      ".has('title', TextP.startingWith('Benchmark Node'))"
+                      ".drop()").all().result()
+
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
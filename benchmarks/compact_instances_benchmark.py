@@ -0,0 +1,133 @@
+""" Compares building model instances with a `__dict__` per instance (as
+    `vertex_to_instance` used to) against the compact (`__slots__`)
+    instances built by `Vertex.vertex_to_instance`, on a
+    `get_children_tree`-sized response of GraphSON vertices.
+
+    Nothing is submitted to the database; the responses are generated:
+        python -m benchmarks.compact_instances_benchmark --vertices 10000
+"""
+import argparse
+import tracemalloc
+from benchmarks import run_benchmark, print_results
+from core.models import CoreVertex, Template
+from settings import DATABASE_SETTINGS
+
+
+def graphson_vertex(label, index, properties):
+    """ Returns a vertex shaped like the ones in the client's responses """
+    properties = dict(properties)
+    properties[DATABASE_SETTINGS["partition_key"]] = label
+    return {
+        "id": f"{label}-{index}",
+        "label": label,
+        "type": "vertex",
+        "properties": {
+            key: [{"id": f"{label}-{index}-{key}", "value": value}]
+            for key, value in properties.items()
+        }
+    }
+
+
+def children_tree_response(count):
+    """ Returns `count` (child, template) vertex pairs, with all of the
+        properties the models write
+    """
+    return [{
+        "child": graphson_vertex("coreVertex", i, {
+            "title": f"Node {i}",
+            "templateData": "{\"property\": \"value\"}",
+            "content": "Formatted content " * 4,
+            "teamId": "team-0",
+            "ancestors": "coreVertex-0",
+            "childrenCount": "0",
+            "messagesCount": "0"
+        }),
+        "template": graphson_vertex("template", i, {
+            "name": f"Template {i}",
+            "canHaveChildren": "True",
+            "pillForegroundColor": "#000",
+            "pillBackgroundColor": "#fff",
+            "topicsCount": "1"
+        })
+    } for i in range(count)]
+
+
+def dict_instance(cls, vertex):
+    """ Builds an instance the way `vertex_to_instance` did before the
+        compact instances
+    """
+    instance = cls()
+    instance.id = vertex["id"]
+    for field, value in vertex.get("properties", {}).items():
+        setattr(instance, field, value[0]["value"])
+    return instance
+
+
+def compact_instance(cls, vertex):
+    return cls.vertex_to_instance(vertex)
+
+
+def build_tree(response, build):
+    """ Builds the nodes like `get_children_tree` does """
+    tree = []
+    for item in response:
+        child = build(CoreVertex, item["child"])
+        child.template = build(Template, item["template"])
+        child.isFavorite = False
+        tree.append(child)
+    return tree
+
+
+def build_list(response, build):
+    """ Builds the nodes without any attributes outside of their schema """
+    return [build(CoreVertex, item["child"]) for item in response]
+
+
+def read_tree(tree):
+    """ Reads every property, like serializing the whole tree would """
+    for child in tree:
+        (child.id, child.title, child.templateData, child.content,
+         child.template.name, child.template.canHaveChildren)
+
+
+def allocated(response, build, build_nodes=build_tree):
+    """ Returns the bytes allocated (and held) by the built nodes """
+    tracemalloc.start()
+    tree = build_nodes(response, build)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tree
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vertices", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    response = children_tree_response(args.vertices)
+    # Generating the compact classes up front
+    build_tree(response[:1], compact_instance)
+
+    results = []
+    for name, build in [("dict", dict_instance),
+                        ("compact", compact_instance)]:
+        results.append(run_benchmark(
+            f"{name} build ({args.vertices} vertices)",
+            lambda i: build_tree(response, build), args.iterations))
+        results.append(run_benchmark(
+            f"{name} build + read ({args.vertices} vertices)",
+            lambda i: read_tree(build_tree(response, build)),
+            args.iterations))
+    print_results(results)
+
+    print(f"\n{'memory':<40}{'tree KiB':>12}{'list KiB':>12}")
+    for name, build in [("dict", dict_instance),
+                        ("compact", compact_instance)]:
+        print(f"{name:<40}{allocated(response, build) / 1024:>12.1f}"
+              f"{allocated(response, build, build_list) / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
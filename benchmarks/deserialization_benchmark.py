@@ -0,0 +1,133 @@
+""" Compares decoding `get_children_tree` and `get_inbox_nodes` sized
+    responses through each of the selectable message serializers (see
+    db.serialization), from the raw response message to the model
+    instances:
+        - untyped responses (as returned by CosmosDB) through every
+            serializer
+        - typed GraphSON 3.0 responses (as returned by a TinkerPop server)
+            through `graphson3` and `lean3`; only decoded, as the vertices
+            decoded by `graphson3` don't keep their properties (which it
+            skips, so it's decoding does less work than `lean3`'s)
+
+    Nothing is submitted to the database; the responses are generated:
+        python -m benchmarks.deserialization_benchmark --vertices 10000
+"""
+import argparse
+import json
+from benchmarks import run_benchmark, print_results
+from benchmarks.compact_instances_benchmark import (
+    graphson_vertex,
+    children_tree_response
+)
+from core.models import CoreVertex, Template, Message
+from db.serialization import load_serializer
+
+
+def inbox_response(count):
+    """ Returns `count` inbox nodes, with their template and last message """
+    return [{
+        "node": graphson_vertex("coreVertex", i, {
+            "title": f"Node {i}",
+            "templateData": "{\"property\": \"value\"}"
+        }),
+        "template": [graphson_vertex("template", i, {
+            "name": f"Template {i}",
+            "canHaveChildren": "True"
+        })],
+        "lastMessage": [graphson_vertex("message", i, {
+            "text": "Message text " * 4,
+            "sent_at": "2020-01-01T00:00:00"
+        })],
+        "parent": [graphson_vertex("team", i, {"name": f"Team {i}"})],
+        "lastSeenMessageTime": ["2020-01-01T00:00:00"]
+    } for i in range(count)]
+
+
+def typed(value):
+    """ Returns the value as (GraphSON 3.0) typed json; vertices (and their
+        properties) are tagged, along with the lists and maps
+    """
+    if isinstance(value, dict) and value.get("type") == "vertex":
+        return {"@type": "g:Vertex", "@value": {
+            "id": value["id"],
+            "label": value["label"],
+            "properties": {key: [{"@type": "g:VertexProperty", "@value": {
+                "id": item["id"], "label": key, "value": item["value"]
+            }} for item in items] for key, items in
+                value["properties"].items()}
+        }}
+    if isinstance(value, dict):
+        return {"@type": "g:Map", "@value": [
+            i for key, item in value.items() for i in (key, typed(item))]}
+    if isinstance(value, list):
+        return {"@type": "g:List", "@value": [typed(i) for i in value]}
+    return value
+
+
+def message(data):
+    """ Returns the raw (json encoded) response message holding the data """
+    return json.dumps({
+        "requestId": "00000000-0000-0000-0000-000000000000",
+        "status": {"code": 200, "attributes": {}, "message": ""},
+        "result": {"data": data, "meta": {}}
+    }).encode("utf-8")
+
+
+def decode(serializer, raw):
+    return serializer.deserialize_message(
+        json.loads(raw.decode("utf-8")))["result"]["data"]
+
+
+def build_tree(data):
+    tree = []
+    for item in data:
+        child = CoreVertex.vertex_to_instance(item["child"])
+        child.template = Template.vertex_to_instance(item["template"])
+        tree.append(child)
+    return tree
+
+
+def build_inbox(data):
+    nodes = []
+    for item in data:
+        node = CoreVertex.vertex_to_instance(item["node"])
+        node.template = Template.vertex_to_instance(item["template"][0])
+        node.last_message = Message.vertex_to_instance(
+            item["lastMessage"][0])
+        nodes.append(node)
+    return nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vertices", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    responses = [
+        ("tree", children_tree_response(args.vertices), build_tree),
+        ("inbox", inbox_response(args.vertices), build_inbox)
+    ]
+    for name, data, build in responses:
+        raw, raw_typed = message(data), message(typed(data))
+        # Generating the compact classes up front
+        build(data[:1])
+
+        results = []
+        for serializer_name in ["graphson2", "graphson3", "lean"]:
+            serializer = load_serializer(serializer_name)
+            results.append(run_benchmark(
+                f"{serializer_name} {name}",
+                lambda i: build(decode(serializer, raw)), args.iterations))
+        for serializer_name in ["graphson3", "lean3"]:
+            serializer = load_serializer(serializer_name)
+            results.append(run_benchmark(
+                f"{serializer_name} {name} (typed, decode)",
+                lambda i: decode(serializer, raw_typed), args.iterations))
+
+        print(f"\n{name} ({args.vertices} results)")
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
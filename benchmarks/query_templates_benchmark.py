@@ -0,0 +1,108 @@
+""" Compares the throughput of the parameterized query templates (with
+    bindings) against the previous string-building path, where every
+    value was concatenated into a brand new script string.
+
+    By default only the Python side (building the query) is measured. Pass
+    `--submit` to also submit the queries to the configured database, which
+    includes the cost of the server compiling every unique script:
+        python -m benchmarks.query_templates_benchmark --submit
+"""
+import argparse
+import uuid
+from benchmarks import run_benchmark, print_results
+from core.models import CoreVertex
+from db.engine import client
+from settings import DATABASE_SETTINGS
+
+
+def legacy_create_query(data):
+    """ The create query as it was built before the query templates """
+    query = f"g.addV('{CoreVertex.LABEL}')" + \
+        f".property('{DATABASE_SETTINGS['partition_key']}', " + \
+        f"'{CoreVertex.LABEL}')"
+    for key, value in data.items():
+        query += f".property('{key}', '{value}')"
+    return query, None
+
+
+def template_create_query(data):
+    """ The create query built through the class's template cache """
+    steps, bindings = CoreVertex.property_bindings(data)
+    query = CoreVertex.query_templates().get(
+        ("create", tuple(key for key, _ in steps)),
+        lambda: CoreVertex.generate_create_query(steps))
+    return query, bindings
+
+
+def legacy_filter_query(properties):
+    """ The filter query as it was built before the query templates """
+    query = f"g.V().hasLabel('{CoreVertex.LABEL}')"
+    for key, value in properties.items():
+        query += f".has('{key}', '{value}')"
+    return query, None
+
+
+def template_filter_query(properties):
+    """ The filter query built through the class's template cache """
+    steps, bindings = CoreVertex.property_bindings(properties)
+    query = CoreVertex.query_templates().get(
+        ("filter", tuple(key for key, _ in steps), False, None, False, False),
+        lambda: CoreVertex.generate_filter_query(steps))
+    return query, bindings
+
+
+def node_data(i):
+    """ Returns unique CoreVertex properties for the given iteration """
+    return {
+        "title": f"Benchmark Node {i}",
+        "templateData": "{}",
+        "content": str(uuid.uuid4())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--submit", action="store_true",
+                        help="Submit the queries to the configured database")
+    args = parser.parse_args()
+
+    if args.submit:
+        def submit(build):
+            def run(i):
+                query, bindings = build(i)
+                client.submit(query, bindings).all().result()
+            return run
+    else:
+        def submit(build):
+            return build
+
+    print_results([
+        run_benchmark(
+            "create: string building",
+            submit(lambda i: legacy_create_query(node_data(i))),
+            args.iterations),
+        run_benchmark(
+            "create: templates + bindings",
+            submit(lambda i: template_create_query(node_data(i))),
+            args.iterations),
+    ])
+    print_results([
+        run_benchmark(
+            "filter: string building",
+            submit(lambda i: legacy_filter_query({"id": str(uuid.uuid4())})),
+            args.iterations),
+        run_benchmark(
+            "filter: templates + bindings",
+            submit(lambda i: template_filter_query({"id": str(uuid.uuid4())})),
+            args.iterations),
+    ])
+
+    if args.submit:
+        client.submit(f"g.V().hasLabel('{CoreVertex.LABEL}')"
+                      ".has('title', TextP.startingWith('Benchmark Node'))"
+                      ".drop()").all().result()
+
+
+if __name__ == "__main__":
+    main()
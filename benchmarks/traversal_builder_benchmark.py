@@ -0,0 +1,91 @@
+""" Compares the script strings the models used to concatenate (with every
+    value written into the script) against the traversals built through the
+    traversal builder (`db.traversal`), which are translated into the same
+    parameterized script for every value.
+
+    CosmosDB doesn't accept bytecode, so both paths submit scripts; the
+    difference on the server is that every concatenated script is unique
+    and has to be compiled, while the translated script is compiled once.
+    By default only the Python side (building the query) is measured. Pass
+    `--submit` to also submit the queries to the configured database:
+        python -m benchmarks.traversal_builder_benchmark --submit
+"""
+import argparse
+import uuid
+from benchmarks import run_benchmark, print_results
+from core.models import CoreVertex, CoreVertexOwnership, \
+    CoreVertexInheritsFromTemplate
+from db.engine import client, g, vertex_key
+from db.traversal import translate, ScriptTranslator
+
+
+def legacy_children_query(parent_id, template_id):
+    """ The `get_children` query as it was concatenated before the
+        traversal builder
+    """
+    query = f"g.V().has('team', 'id', '{parent_id}')" + \
+        f".out('{CoreVertexOwnership.LABEL}')" + \
+        f".hasLabel('{CoreVertex.LABEL}')" + \
+        f".as('cv')" + \
+        f".out('{CoreVertexInheritsFromTemplate.LABEL}')" + \
+        f".has('id', '{template_id}').select('cv')"
+    return query, None
+
+
+def children_traversal(parent_id, template_id):
+    """ The `get_children` query's traversal """
+    return g.V(vertex_key("team", parent_id)) \
+        .out(CoreVertexOwnership.LABEL).hasLabel(CoreVertex.LABEL) \
+        .as_("cv").out(CoreVertexInheritsFromTemplate.LABEL) \
+        .has("id", template_id).select("cv")
+
+
+def builder_children_query(parent_id, template_id):
+    """ The `get_children` query built through the traversal builder """
+    return translate(children_traversal(parent_id, template_id))
+
+
+def uncached_children_query(parent_id, template_id):
+    """ The `get_children` query translated without the translation cache """
+    return ScriptTranslator().translate(
+        children_traversal(parent_id, template_id))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--submit", action="store_true",
+                        help="Submit the queries to the configured database")
+    args = parser.parse_args()
+
+    if args.submit:
+        def submit(build):
+            def run(i):
+                query, bindings = build(i)
+                client.submit(query, bindings).all().result()
+            return run
+    else:
+        def submit(build):
+            return build
+
+    print_results([
+        run_benchmark(
+            "children: script strings",
+            submit(lambda i: legacy_children_query(
+                str(uuid.uuid4()), str(uuid.uuid4()))),
+            args.iterations),
+        run_benchmark(
+            "children: builder (uncached)",
+            submit(lambda i: uncached_children_query(
+                str(uuid.uuid4()), str(uuid.uuid4()))),
+            args.iterations),
+        run_benchmark(
+            "children: traversal builder",
+            submit(lambda i: builder_children_query(
+                str(uuid.uuid4()), str(uuid.uuid4()))),
+            args.iterations),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,11 @@
-from db.engine import Vertex, Edge, client
+from db.engine import (
+    Vertex, Edge, UnitOfWork, client, identity_map, g, __, submit_traversal,
+    vertex_key, notify_write
+)
+from db.loader import Relationship
+from core.roles import role_cache
+from core.templates import template_cache, property_index
+from gremlin_python.process.traversal import P, Order
 from settings import DATABASE_SETTINGS
 from db.exceptions import (
     CustomValidationFailedException,
@@ -6,9 +13,116 @@ from db.exceptions import (
 )
 import auth
 import re
+import json
 import datetime
 
 
+def counter_updates(model, names, path=None):
+    """ Returns the traversal recounting the `names` counters (see the
+        model's `COUNTERS`) of the vertex, or of the `model` vertices
+        reached through the `path` traversal, through `property` steps;
+        used for the edges' `counter_updates`
+    """
+    traversal = path
+    for name in names:
+        counter = model.COUNTERS[name]()
+        traversal = __.property(name, counter) if traversal is None else \
+            traversal.property(name, counter)
+    return traversal
+
+
+def update_counters(edge_model, end, keys):
+    """ Runs the `end` (outV/inV) counter updates of the edge model (see
+        `Edge.counter_updates`) from each of the vertices with the given
+        keys (see `vertex_key`) through a single query; for the counters of
+        the edges that were dropped along with a vertex
+    """
+    updates = [traversal for update_end, traversal
+               in edge_model.counter_updates() if update_end == end]
+    if not keys or not updates:
+        return
+    query = g.V(*keys)
+    for traversal in updates:
+        query = query.sideEffect(traversal)
+    submit_traversal(query).all().result()
+
+
+def refresh_counters(models, vertex_ids, names):
+    """ Recounts the `names` counters (see the models' `COUNTERS`) of the
+        given vertices, which can be vertices of any of the given models
+        (whose counters of those names must count the same edges); only
+        used for repairing the counters (see `reconcile_counters`), as the
+        counters are updated along with their edges' writes.
+        Only the counters that have changed are written (through a
+        UnitOfWork per chunk); returns the number of written vertices
+    """
+    vertex_ids = list(dict.fromkeys(i for i in vertex_ids if i))
+    labels = {model.LABEL: model for model in models}
+    counters = models[0].COUNTERS
+    chunk_size = Vertex.GET_MANY_CHUNK_SIZE
+    updates = []
+    for start in range(0, len(vertex_ids), chunk_size):
+        chunk = vertex_ids[start:start + chunk_size]
+        counts = __.project(*names)
+        stored = __.project(*names)
+        for name in names:
+            counts = counts.by(counters[name]())
+            stored = stored.by(__.values(name).fold())
+        query = g.V(*[vertex_key(label, i) for label in labels
+                      for i in chunk]) \
+            .project("id", "label", "counts", "stored") \
+            .by(__.id()).by(__.label()).by(counts).by(stored)
+
+        for item in submit_traversal(query).all().result():
+            # Counters are written as strings by the models, but as numbers
+            # by the counter updates
+            stored = {name: str(item["stored"][name][0])
+                      if item["stored"][name] else None for name in names}
+            counts = {name: str(item["counts"][name]) for name in names}
+            if stored != counts:
+                updates.append((labels[item["label"]], item["id"], counts))
+
+    for start in range(0, len(updates), chunk_size):
+        with UnitOfWork() as uow:
+            for model, vertex_id, counts in updates[start:start + chunk_size]:
+                uow.update(model, vertex_id, **counts)
+
+    return len(updates)
+
+
+def initial_counters(model):
+    """ Returns the (zeroed) counters of a new `model` vertex """
+    return {name: 0 for name in model.COUNTERS}
+
+
+def reconcile_counters(team_ids=None):
+    """ Recounts every counter of the given teams (or all of the teams)
+        along with their templates and coreVertices, correcting the
+        counters that have drifted (i.e. that were written before the
+        counters existed, or whose edges were written outside of the
+        models); returns the number of corrected vertices
+    """
+    query = g.V(*[vertex_key(Team.LABEL, i) for i in team_ids]) \
+        if team_ids else g.V().hasLabel(Team.LABEL)
+    query = query.project("id", "templates", "coreVertices") \
+        .by(__.id()) \
+        .by(__.out(TeamOwnsTemplate.LABEL).hasLabel(Template.LABEL)
+            .id().fold()) \
+        .by(__.out(CoreVertexOwnership.LABEL).hasLabel(CoreVertex.LABEL)
+            .emit().repeat(__.out(CoreVertexOwnership.LABEL)
+                           .hasLabel(CoreVertex.LABEL)).id().fold())
+    result = submit_traversal(query).all().result()
+
+    corrected = 0
+    for model, key in [(Team, "id"), (Template, "templates"),
+                       (CoreVertex, "coreVertices")]:
+        vertex_ids = [i for team in result for i in (
+            [team[key]] if key == "id" else team[key])]
+        corrected += refresh_counters(
+            [model], vertex_ids, list(model.COUNTERS))
+    return corrected
+
+
 class TeamOwnsTemplate(Edge):
     """ Represents an Ownership Relationship (One to Many) between a
         Team to a Template.
@@ -26,23 +140,46 @@ class TeamOwnsTemplate(Edge):
         """ Provides validation to confirm that:
             1) A template is only ever owned by one team at a time
         """
-        existing_edge_q = f"g.V().has('{cls.INV_LABEL}', 'id', '{inv_id}')" + \
-            f".inE('owns')"
-        existing_edge = client.submit(existing_edge_q).all().result()
+        existing_edge_q = g.V(vertex_key(cls.INV_LABEL, inv_id)).inE("owns")
+        existing_edge = submit_traversal(existing_edge_q).all().result()
         if existing_edge:
             raise CustomValidationFailedException(
                 "Template can only be owned by a single template at a time!")
 
         return data
 
+    @classmethod
+    def bulk_custom_validation(cls, rows, outv_label=None, inv_label=None):
+        """ Batched `custom_validation`; runs a single query for finding all
+            of the templates that are already owned
+        """
+        owned = cls.vertices_with_edges(
+            [inv_id for _, _, inv_id, _ in rows], cls.INV_LABEL)
+
+        errors = {}
+        for index, _, inv_id, _ in rows:
+            if inv_id in owned:
+                errors[index] = CustomValidationFailedException(
+                    "Template can only be owned by a single template at a "
+                    "time!")
+            owned.add(inv_id)
+        return errors
+
+    @classmethod
+    def counter_updates(cls):
+        """ Recounts the templates (and topics) of the team """
+        return [("outV", counter_updates(
+            Team, ["templatesCount", "topicsCount"]))]
+
+    @classmethod
+    def after_write(cls, pairs):
+        """ Drops the cached templates of the teams """
+        template_cache.invalidate_teams(team_id for team_id, _ in pairs)
+
     @classmethod
     def all_team_templates(cls, team_id):
         """ Return all templates under the given team """
-        query = f"g.V().has('{Team.LABEL}', 'id', '{team_id}')" + \
-            f".out('{cls.LABEL}')"
-        results = client.submit(query).all().result()
-
-        return [Template.vertex_to_instance(i) for i in results]
+        return list(Template.get_team_templates(team_id).values())
 
     @classmethod
     def get_template(cls, vertex_type, vertex_id, template_id):
@@ -51,23 +188,22 @@ class TeamOwnsTemplate(Edge):
                 "CoreVertex's Root Level Team" if the vertex_type is a
                     `coreVertex`
         """
-        base_template_query = f".out('{TeamOwnsTemplate.LABEL}')" + \
-            f".has('id', '{template_id}')"
-
-        if vertex_type == "team":
-            # If this node is the team (root), we can just check if it has an
-            # outgoing edge to this template
-            query = f"g.V().has('{Team.LABEL}', 'id', '{vertex_id}')" + \
-                base_template_query
-        else:
-            # Otherwise, we have to find the Team (Root) for this CoreVertex,
-            # and then check if that team has the template
-            query = f"g.V().has('{CoreVertex.LABEL}', 'id', '{vertex_id}')" + \
-                f".repeat(__.in('{CoreVertexOwnership.LABEL}'))" + \
-                f".until(__.hasLabel('{Team.LABEL}'))" + \
-                base_template_query
-
-        template = client.submit(query).all().result()
+        team_id = vertex_id if vertex_type == "team" else \
+            CoreVertex.get_team_id(vertex_id)
+        if team_id:
+            # If this node is the team (root), or the CoreVertex's path to
+            # it's team is materialized, the template is read from the
+            # team's (cached) templates
+            return Template.get_team_templates(team_id).get(template_id)
+
+        # Otherwise, we have to find the Team (Root) for this CoreVertex,
+        # and then check if that team has the template
+        query = g.V(vertex_key(CoreVertex.LABEL, vertex_id)) \
+            .repeat(__.in_(CoreVertexOwnership.LABEL)) \
+            .until(__.hasLabel(Team.LABEL)) \
+            .out(TeamOwnsTemplate.LABEL).has("id", template_id)
+
+        template = submit_traversal(query).all().result()
         if not template:
             return None
         return Template.vertex_to_instance(template[0])
@@ -82,6 +218,26 @@ class CoreVertexInheritsFromTemplate(Edge):
     INV_LABEL = "template"
     properties = {}
 
+    @classmethod
+    def counter_updates(cls):
+        """ Recounts the topics of the template, and of it's team """
+        return [
+            ("inV", counter_updates(Template, ["topicsCount"])),
+            ("inV", counter_updates(
+                Team, ["topicsCount"],
+                __.in_(TeamOwnsTemplate.LABEL).hasLabel(Team.LABEL)))
+        ]
+
+    @classmethod
+    def get_templates(cls, cv_ids):
+        """ Returns the {coreVertex_id: Template} of each of the given core
+            vertices that inherits from a template; used for loading the
+            `CoreVertex.template` relationship
+        """
+        related = cls.related_vertices(cv_ids, cls.OUTV_LABEL)
+        return {cv_id: Template.vertex_to_instance(templates[0])
+                for cv_id, templates in related.items() if templates}
+
     @classmethod
     def custom_validation(cls, data, outv_id=None, inv_id=None,
                           outv_label=None, inv_label=None):
@@ -91,25 +247,28 @@ class CoreVertexInheritsFromTemplate(Edge):
                 team [TODO]
         """
         # Verification for [1]
-        existing_template_query = \
-            f"g.V().has('{cls.OUTV_LABEL}', 'id', '{outv_id}')" + \
-            f".out('{cls.LABEL}')"
-        existing_template = client.submit(
+        existing_template_query = g.V(vertex_key(cls.OUTV_LABEL, outv_id)) \
+            .out(cls.LABEL)
+        existing_template = submit_traversal(
             existing_template_query).all().result()
         if existing_template:
             raise CustomValidationFailedException(
                 "A CoreVertex can only inherit from a single Template "
                 "at a time")
 
-        # Verification for [2]
-        team_template_query = \
-            f"g.V().has('{CoreVertex.LABEL}', 'id', '{outv_id}')" + \
-            f".until(hasLabel('{Team.LABEL}'))" + \
-            f".repeat(__.in('{CoreVertexOwnership.LABEL}')).emit()" + \
-            f".out('{TeamOwnsTemplate.LABEL}')" + \
-            f".has('{Template.LABEL}', 'id', '{inv_id}')"
-        template_exists = client.submit(
-            team_template_query).all().result()
+        # Verification for [2]; through the (cached) templates of the
+        # materialized path's team if there is one
+        team_id = CoreVertex.get_team_id(outv_id)
+        if team_id:
+            template_exists = inv_id in Template.get_team_templates(team_id)
+        else:
+            team_template_query = g.V(vertex_key(CoreVertex.LABEL, outv_id)) \
+                .until(__.hasLabel(Team.LABEL)) \
+                .repeat(__.in_(CoreVertexOwnership.LABEL)).emit() \
+                .out(TeamOwnsTemplate.LABEL) \
+                .has(Template.LABEL, "id", inv_id)
+            template_exists = submit_traversal(
+                team_template_query).all().result()
         if not template_exists:
             raise CustomValidationFailedException(
                 "The provided template either doesn't exist, or is not owned"
@@ -117,15 +276,68 @@ class CoreVertexInheritsFromTemplate(Edge):
 
         return data
 
+    @classmethod
+    def bulk_custom_validation(cls, rows, outv_label=None, inv_label=None):
+        """ Batched `custom_validation`; runs a single query for finding the
+            existing template and the root team of every CoreVertex (from
+            it's materialized path, or by walking the tree if it isn't
+            materialized), whose templates are read from the template cache
+        """
+        cv_ids = list({outv_id for _, outv_id, _, _ in rows})
+        if not cv_ids:
+            return {}
+        query = g.V(*[vertex_key(cls.OUTV_LABEL, i) for i in cv_ids]) \
+            .project("id", "existing", "team") \
+            .by(__.id()) \
+            .by(__.out(cls.LABEL).id().fold()) \
+            .by(__.coalesce(
+                __.values("teamId"),
+                __.until(__.hasLabel(Team.LABEL))
+                .repeat(__.in_(CoreVertexOwnership.LABEL)).id()).fold())
+        details = {i["id"]: i for i in
+                   submit_traversal(query).all().result()}
+
+        templates = {}
+        for detail in details.values():
+            team_id = detail["team"][0] if detail["team"] else None
+            if team_id and team_id not in templates:
+                templates[team_id] = Template.get_team_templates(team_id)
+            detail["teamTemplates"] = templates.get(team_id, {})
+
+        errors = {}
+        inheriting = set()
+        for index, outv_id, inv_id, _ in rows:
+            detail = details.get(outv_id, {})
+            if detail.get("existing") or outv_id in inheriting:
+                errors[index] = CustomValidationFailedException(
+                    "A CoreVertex can only inherit from a single Template "
+                    "at a time")
+            elif inv_id not in detail.get("teamTemplates", []):
+                errors[index] = CustomValidationFailedException(
+                    "The provided template either doesn't exist, or is not "
+                    "owned by the same team as the CoreVertex")
+            inheriting.add(outv_id)
+        return errors
+
     @classmethod
     def get_all_template_inheritors(cls, template_id):
         """ Returns all vertices that inherit from this template id """
-        query = f"g.V().has('{Template.LABEL}', 'id', '{template_id}')" + \
-            f".in('{cls.LABEL}')"
+        return list(cls.stream_template_inheritors(template_id))
 
-        res = client.submit(query).all().result()
+    @classmethod
+    def stream_template_inheritors(cls, template_id, batch_size=None):
+        """ Yields all vertices that inherit from this template id as the
+            result batches arrive
+        """
+        query = cls.query_templates().get(
+            ("template_inheritors",),
+            lambda: f"g.V().has('{Template.LABEL}', 'id', template_id)" +
+            f".in('{cls.LABEL}')")
 
-        return [CoreVertex.vertex_to_instance(i) for i in res]
+        for batch in client.stream(query, {"template_id": template_id},
+                                   batch_size=batch_size):
+            for vertex in batch:
+                yield CoreVertex.vertex_to_instance(vertex)
 
 
 class UserFavoriteNode(Edge):
@@ -141,51 +353,68 @@ class UserFavoriteNode(Edge):
             he has access to
         """
         if parent_id:
-            query = f"g.V().has('id', '{parent_id}')" + \
-                f".emit()" + \
-                f".until(out('{CoreVertexOwnership.LABEL}').count().is(0))" + \
-                f".repeat(out('{CoreVertexOwnership.LABEL}'))"
+            query = g.V().has("id", parent_id) \
+                .emit() \
+                .until(__.out(CoreVertexOwnership.LABEL).count().is_(0)) \
+                .repeat(__.out(CoreVertexOwnership.LABEL))
         else:
-            query = f"g.V().hasLabel('{CoreVertex.LABEL}')"
+            query = g.V().hasLabel(CoreVertex.LABEL)
 
-        query += f".as('cv').in('{cls.LABEL}').has('id', '{user_id}')" + \
-            f".select('cv')"
+        # Only the properties used for displaying the nodes are fetched
+        query = Vertex.projection_traversal(
+            query.as_("cv").in_(cls.LABEL).has("id", user_id).select("cv"),
+            ["title", "name"])
 
-        result = client.submit(query).all().result()
+        result = submit_traversal(query).all().result()
 
         nodes = []
         for node in result:
             if node["label"] == "coreVertex":
-                nodes.append(CoreVertex.vertex_to_instance(node))
+                nodes.append(
+                    CoreVertex.projection_to_instance(node, ["title"]))
             else:
-                nodes.append(Team.vertex_to_instance(node))
+                nodes.append(Team.projection_to_instance(node, ["name"]))
 
         return nodes
 
     @staticmethod
     def get_inbox_nodes(user_id):
-        """ Returns a list of coreVertices that the user has favorited
-            along with the last-message and template details
-        """
-        query = f"g.V().has('{auth.User.LABEL}', 'id', '{user_id}')" + \
-            f".out('{UserFavoriteNode.LABEL}')" + \
-            f".hasLabel('{CoreVertex.LABEL}').as('cv')" + \
-            f".out('{NodeHasMessage.LABEL}').select('cv').dedup()" + \
-            f".project('node', 'template'," + \
-            f"'lastMessage', 'parent', 'lastSeenMessageTime')" + \
-            f".by()" + \
-            f".by(outE('{CoreVertexInheritsFromTemplate.LABEL}').inV().fold())" + \
-            f".by(outE('{NodeHasMessage.LABEL}').inV().order()" + \
-            f".by('sent_at', decr).limit(1).fold())" + \
-            f".by(until(__.hasLabel('{Team.LABEL}'))" + \
-            f".repeat(__.inE('{CoreVertexOwnership.LABEL}').outV()).fold())" + \
-            f".by(inE('{UserLastCheckedMessage.LABEL}').as('e')" + \
-            f".outV().has('id', '{user_id}').select('e').values('time').fold())"
-
-        result = client.submit(query).all().result()
+        """ Returns a (nodes, favorite_ids) tuple with the list of
+            coreVertices that the user has favorited (and that have
+            messages) along with the last-message and template details, and
+            the ids of all of the user's favorited coreVertices
+        """
+        def favorites():
+            return __.out(UserFavoriteNode.LABEL).hasLabel(CoreVertex.LABEL)
+
+        query = g.V(vertex_key(auth.User.LABEL, user_id)) \
+            .project("favorites", "nodes") \
+            .by(favorites().id().fold()) \
+            .by(favorites().as_("cv")
+                .out(NodeHasMessage.LABEL).select("cv").dedup()
+                .project("node", "template", "lastMessage", "parent",
+                         "lastSeenMessageTime")
+                .by()
+                .by(__.outE(CoreVertexInheritsFromTemplate.LABEL).inV()
+                    .fold())
+                .by(__.outE(NodeHasMessage.LABEL).inV().order()
+                    .by("sent_at", Order.decr).limit(1).fold())
+                .by(__.coalesce(
+                    __.values("teamId"),
+                    __.until(__.hasLabel(Team.LABEL))
+                    .repeat(__.inE(CoreVertexOwnership.LABEL).outV()).id())
+                    .fold())
+                .by(__.inE(UserLastCheckedMessage.LABEL).as_("e")
+                    .outV().has("id", user_id).select("e").values("time")
+                    .fold())
+                .fold())
+
+        result = submit_traversal(query).all().result()
+        if not result:
+            return [], []
 
         nodes = []
-        for node in result:
+        for node in result[0]["nodes"]:
             node_vertex = node["node"]
             if node["template"]:
                 node["template"] = node["template"][0]
@@ -199,13 +428,22 @@ class UserFavoriteNode(Edge):
                     node["template"])
                 node_vertex.last_message = Message.vertex_to_instance(
                     node["lastMessage"][0]) if node["lastMessage"] else None
-                node_vertex.parentId = node["parent"][0]["id"] if \
+                node_vertex.parentId = node["parent"][0] or None if \
                     node["parent"] else None
                 node_vertex.last_seen_time = node["lastSeenMessageTime"][0] if \
                     node["lastSeenMessageTime"] else None
 
                 nodes.append(node_vertex)
-        return nodes
+        return nodes, result[0]["favorites"]
+
+
+# The counters of both teams and coreVertices; {counter: the traversal
+# counting it's edges from the vertex}
+NODE_COUNTERS = {
+    "childrenCount": lambda: __.out(CoreVertexOwnership.LABEL)
+    .hasLabel(CoreVertex.LABEL).count(),
+    "messagesCount": lambda: __.out(NodeHasMessage.LABEL).count()
+}
 
 
 class Team(Vertex):
@@ -215,21 +453,55 @@ class Team(Vertex):
     """
     LABEL = "team"
     properties = {
-        "name": str
+        "name": str,
+        # Counters updated by the queries writing their edges (see
+        # `Edge.counter_updates`), rather than counted on every read
+        "templatesCount": int,
+        "topicsCount": int,
+        "childrenCount": int,
+        "messagesCount": int
     }
+    COUNTERS = dict(
+        NODE_COUNTERS,
+        templatesCount=lambda: __.out(TeamOwnsTemplate.LABEL)
+        .hasLabel(Template.LABEL).count(),
+        topicsCount=lambda: __.out(TeamOwnsTemplate.LABEL)
+        .hasLabel(Template.LABEL)
+        .inE(CoreVertexInheritsFromTemplate.LABEL).count())
 
     def get_user_permissions(self, user_id):
         """ Returns the roles assigned to the given user for this
-            Team
+            Team (cached in the role cache; see core.roles)
         """
-        query = f"g.V().has('{self.LABEL}', 'id', '{self.id}')" + \
-            f".inE('{auth.UserAssignedToCoreVertex.LABEL}').as('e')" + \
-            f".outV().has('{auth.User.LABEL}', 'id', '{user_id}')" + \
-            f".select('e')"
-        result = client.submit(query).all().result()
-
-        return auth.UserAssignedToCoreVertex.edge_to_instance(result[0]).role \
+        roles = role_cache.get(self.id, user_id)
+        if roles is not None:
+            return roles["direct_role"]
+        version = role_cache.version(self.id, user_id)
+
+        query = g.V(vertex_key(self.LABEL, self.id)) \
+            .inE(auth.UserAssignedToCoreVertex.LABEL).as_("e") \
+            .outV().has(auth.User.LABEL, "id", user_id) \
+            .select("e")
+        result = submit_traversal(query).all().result()
+
+        role = auth.UserAssignedToCoreVertex.edge_to_instance(result[0]).role \
             if result else None
+        role_cache.set(self.id, user_id,
+                       {"direct_role": role, "indirect_roles": []},
+                       [self.id], version)
+
+        return role
+
+    def delete(self):
+        """ Overwritten to clear the materialized paths, and drop the
+            cached roles, whose path includes this vertex
+        """
+        team_id = self.id
+        children = CoreVertexOwnership.get_children_ids(self.LABEL, team_id)
+        res = super().delete()
+        CoreVertex.update_ancestry(children)
+        role_cache.invalidate_paths([team_id])
+        return res
 
     @classmethod
     def get_team_details(cls, team_id):
@@ -238,11 +510,11 @@ class Team(Vertex):
                 name, id, templates
             NOTE: This will raise an exception if the ID doesn't exist
         """
-        query = f"g.V().as('team').has('{cls.LABEL}', 'id', '{team_id}')" + \
-            f".fold().project('team', 'templates').by(unfold())" + \
-            f".by(unfold().out('{TeamOwnsTemplate.LABEL}')" + \
-            f".hasLabel('{Template.LABEL}').fold())"
-        result = client.submit(query).next()[0]
+        query = g.V(vertex_key(cls.LABEL, team_id)) \
+            .fold().project("team", "templates").by(__.unfold()) \
+            .by(__.unfold().out(TeamOwnsTemplate.LABEL)
+                .hasLabel(Template.LABEL).fold())
+        result = submit_traversal(query).next()[0]
 
         team = Team.vertex_to_instance(result["team"])
         team.templates = [
@@ -260,20 +532,21 @@ class Team(Vertex):
             -- Returns only the teams the user has access to
             -- SERIALIZED
         """
-        query = f"g.V().has('{auth.Account.LABEL}', 'id', '{account_id}')" + \
-            f".out('{auth.AccountOwnsTeam.LABEL}').as('team')" + \
-            f".inE('{auth.UserAssignedToCoreVertex.LABEL}').outV()" + \
-            f".as('member').select('team')" + \
-            f".project('templatesCount', 'name', 'id', 'member', 'topicsCount')" + \
-            f".by(outE('{TeamOwnsTemplate.LABEL}').inV()" + \
-            f".hasLabel('{Template.LABEL}').count())" + \
-            f".by(values('name'))" + \
-            f".by(values('id'))" + \
-            f".by(select('member'))" + \
-            f".by(outE('{TeamOwnsTemplate.LABEL}').inV()" + \
-            f".hasLabel('{Template.LABEL}')" + \
-            f".inE('{CoreVertexInheritsFromTemplate.LABEL}').count())"
-        result = client.submit(query).all().result()
+        # The counts are read from the teams' counters; teams whose
+        # counters haven't been reconciled yet are still counted
+        query = g.V(vertex_key(auth.Account.LABEL, account_id)) \
+            .out(auth.AccountOwnsTeam.LABEL).as_("team") \
+            .inE(auth.UserAssignedToCoreVertex.LABEL).outV() \
+            .as_("member").select("team") \
+            .project("templatesCount", "name", "id", "member", "topicsCount") \
+            .by(__.coalesce(__.values("templatesCount"),
+                            cls.COUNTERS["templatesCount"]())) \
+            .by(__.values("name")) \
+            .by(__.values("id")) \
+            .by(__.select("member")) \
+            .by(__.coalesce(__.values("topicsCount"),
+                            cls.COUNTERS["topicsCount"]()))
+        result = submit_traversal(query).all().result()
 
         teams = {}
         for team in result:
@@ -281,8 +554,8 @@ class Team(Vertex):
                 teams[team["id"]] = {
                     "id": team["id"],
                     "name": team["name"],
-                    "templatesCount": team["templatesCount"],
-                    "topicsCount": team["topicsCount"],
+                    "templatesCount": int(team["templatesCount"]),
+                    "topicsCount": int(team["topicsCount"]),
                     "members": []
                 }
             member = {
@@ -309,8 +582,134 @@ class CoreVertex(Vertex):
     properties = {
         "title": str,
         "templateData": str,
-        "content": str  # Text Field that contains formatted text
+        "content": str,  # Text Field that contains formatted text
+        # The materialized path of the vertex (see `get_ancestry`); the id
+        # of the root team, and the JSON list of the ids of the
+        # coreVertices between the team and this vertex (root first)
+        "teamId": str,
+        "ancestors": str,
+        # Counters (see `Team.properties`)
+        "childrenCount": int,
+        "messagesCount": int
     }
+    COUNTERS = NODE_COUNTERS
+    # Loaded (in batches) through the request's dataloader unless it's set
+    # when building the instance
+    template = Relationship(
+        lambda ids: CoreVertexInheritsFromTemplate.get_templates(ids),
+        max_batch_size=Vertex.GET_MANY_CHUNK_SIZE)
+
+    def get_ancestry(self):
+        """ Returns the (team_id, [ancestor ids]) of this vertex's
+            materialized path, with the ancestors ordered from the team's
+            child down to this vertex's parent; or None if the path hasn't
+            been materialized (i.e. vertices written before it was, which
+            `rebuild_ancestry` materializes), in which case the path has to
+            be found by walking the tree
+        """
+        team_id = getattr(self, "teamId", None)
+        ancestors = getattr(self, "ancestors", None)
+        if not team_id or not ancestors:
+            return None
+        return team_id, json.loads(ancestors)
+
+    @classmethod
+    def get_team_id(cls, vertex_id):
+        """ Returns the id of the given vertex's root team from it's
+            materialized path (the vertex is usually already loaded in the
+            request's identity map), or None if it isn't materialized
+        """
+        vertex = cls.filter(id=vertex_id)
+        ancestry = vertex[0].get_ancestry() if vertex else None
+        return ancestry[0] if ancestry else None
+
+    @classmethod
+    def child_ancestry(cls, parent):
+        """ Returns the materialized path properties of a new child of the
+            given Team/CoreVertex instance, so that it can be written along
+            with the child; an empty dictionary if the parent's path isn't
+            materialized
+        """
+        if parent.LABEL == Team.LABEL:
+            return {"teamId": parent.id, "ancestors": "[]"}
+        ancestry = parent.get_ancestry()
+        if ancestry is None:
+            return {}
+        team_id, ancestors = ancestry
+        return {"teamId": team_id,
+                "ancestors": json.dumps(ancestors + [parent.id])}
+
+    @classmethod
+    def update_ancestry(cls, vertex_ids):
+        """ Materializes the path of the given vertices and all of their
+            descendants by walking the ownership tree; called whenever a
+            vertex is given a new parent. Vertices that aren't under a team
+            (anymore) have their path cleared.
+            Only the vertices whose stored path has changed are written
+            (through a UnitOfWork per chunk); returns the number of written
+            vertices
+        """
+        vertex_ids = list(dict.fromkeys(i for i in vertex_ids if i))
+        chunk_size = cls.GET_MANY_CHUNK_SIZE
+        updates = {}
+        for start in range(0, len(vertex_ids), chunk_size):
+            chunk = vertex_ids[start:start + chunk_size]
+            query = g.V(*[vertex_key(cls.LABEL, i) for i in chunk]) \
+                .project("id", "path", "subtree") \
+                .by(__.id()) \
+                .by(__.until(__.hasLabel(Team.LABEL))
+                    .repeat(__.in_(CoreVertexOwnership.LABEL))
+                    .path().unfold().id().fold()) \
+                .by(__.emit().repeat(__.out(CoreVertexOwnership.LABEL))
+                    .project("id", "parent", "teamId", "ancestors")
+                    .by(__.id())
+                    .by(__.in_(CoreVertexOwnership.LABEL).id().fold())
+                    .by(__.values("teamId").fold())
+                    .by(__.values("ancestors").fold()).fold())
+
+            for item in submit_traversal(query).all().result():
+                # The path is [vertex, parent, ..., team]
+                path = item["path"]
+                ancestries = {item["id"]: (
+                    path[-1], list(reversed(path[1:-1]))) if path else None}
+                parents = {i["id"]: i["parent"][0] for i in item["subtree"]
+                           if i["parent"]}
+
+                def ancestry(vertex_id):
+                    if vertex_id not in ancestries:
+                        parent = ancestry(parents[vertex_id])
+                        ancestries[vertex_id] = None if parent is None else \
+                            (parent[0], parent[1] + [parents[vertex_id]])
+                    return ancestries[vertex_id]
+
+                for vertex in item["subtree"]:
+                    new = ancestry(vertex["id"])
+                    data = {"teamId": new[0],
+                            "ancestors": json.dumps(new[1])} if new else \
+                        {"teamId": "", "ancestors": ""}
+                    stored = {key: vertex[key][0] if vertex[key] else ""
+                              for key in data}
+                    if stored != data:
+                        updates[vertex["id"]] = data
+
+        updates = list(updates.items())
+        for start in range(0, len(updates), chunk_size):
+            with UnitOfWork() as uow:
+                for vertex_id, data in updates[start:start + chunk_size]:
+                    uow.update(cls, vertex_id, **data)
+
+        return len(updates)
+
+    @classmethod
+    def rebuild_ancestry(cls, team_ids=None):
+        """ Materializes the path of every coreVertex under the given teams
+            (or all of the teams); returns the number of written vertices
+        """
+        query = g.V(*[vertex_key(Team.LABEL, i) for i in team_ids]) \
+            if team_ids else g.V().hasLabel(Team.LABEL)
+        query = query.out(CoreVertexOwnership.LABEL) \
+            .hasLabel(cls.LABEL).id()
+        return cls.update_ancestry(submit_traversal(query).all().result())
 
     @classmethod
     def bulk_update_template_data(cls, nodes):
@@ -318,12 +717,19 @@ class CoreVertex(Vertex):
             node in the array - format for nodes must be:
                 { nodeId: templateDataString }
         """
-        query = f"g.V().hasLabel('{cls.LABEL}').choose(id())"
+        query = g.V().hasLabel(cls.LABEL).choose(__.id())
         for node in nodes:
-            query += f".option('{node['id']}', " + \
-                f"property('templateData', '{node['templateData']}'))"
+            query = query.option(
+                node["id"],
+                __.property("templateData", str(node["templateData"])))
+
+        result = submit_traversal(query).all().result()
 
-        result = client.submit(query).all().result()
+        identity = identity_map()
+        if identity is not None:
+            for node in nodes:
+                identity.discard(cls.LABEL, node["id"])
+        notify_write(node["id"] for node in nodes)
 
         return result
 
@@ -331,16 +737,39 @@ class CoreVertex(Vertex):
         """ Returns all roles assigned to the given user for this CoreVertex
             as a dictionary of
             {direct_role: <edge>, indirect_roles: [edges...]}
+            The roles are cached (along with the ids of the vertex's path
+            to the team) in the role cache; see core.roles
         """
-        # This will return all of the permissions the user has for all of the
-        # vertices in this vertex's path to the root
-        query = f"g.V().has('{self.LABEL}', 'id', '{self.id}')" + \
-            f".until(__.hasLabel('{Team.LABEL}'))" + \
-            f".repeat(__.in('{CoreVertexOwnership.LABEL}')).path()" + \
-            f".unfold().inE('{auth.UserAssignedToCoreVertex.LABEL}')" + \
-            f".as('e').outV().has('{auth.User.LABEL}', 'id', '{user_id}')" + \
-            f".select('e')"
-        results = client.submit(query).all().result()
+        roles = role_cache.get(self.id, user_id)
+        if roles is not None:
+            return roles
+        version = role_cache.version(self.id, user_id)
+
+        ancestry = self.get_ancestry()
+        if ancestry is not None:
+            # The vertices in the path are read directly (by their ids)
+            team_id, ancestors = ancestry
+            path = [team_id] + ancestors + [self.id]
+            query = g.V(vertex_key(Team.LABEL, team_id),
+                        *[vertex_key(self.LABEL, i)
+                          for i in ancestors + [self.id]]) \
+                .inE(auth.UserAssignedToCoreVertex.LABEL).as_("e") \
+                .outV().has(auth.User.LABEL, "id", user_id).select("e")
+            results = submit_traversal(query).all().result()
+        else:
+            # This will return the ids of the vertices in this vertex's path
+            # to the root, and all of the permissions the user has for them
+            query = g.V(vertex_key(self.LABEL, self.id)) \
+                .until(__.hasLabel(Team.LABEL)) \
+                .repeat(__.in_(CoreVertexOwnership.LABEL)).path() \
+                .project("path", "edges") \
+                .by(__.unfold().id().fold()) \
+                .by(__.unfold().inE(auth.UserAssignedToCoreVertex.LABEL)
+                    .as_("e").outV().has(auth.User.LABEL, "id", user_id)
+                    .select("e").fold())
+            result = submit_traversal(query).all().result()
+            path, results = (result[0]["path"], result[0]["edges"]) \
+                if result else ([self.id], [])
 
         roles = {
             "indirect_roles": [],
@@ -355,47 +784,114 @@ class CoreVertex(Vertex):
                 roles["indirect_roles"].append(
                     auth.UserAssignedToCoreVertex.edge_to_instance(edge).role)
 
+        role_cache.set(self.id, user_id, roles, path, version)
         return roles
 
+    def delete(self):
+        """ Overwritten to clear the materialized paths, and drop the
+            cached roles, whose path includes this vertex; as well as to
+            recount the children of it's parent and the topics of it's
+            template
+        """
+        vertex_id = self.id
+        query = g.V(vertex_key(self.LABEL, vertex_id)) \
+            .project("children", "parent", "template") \
+            .by(__.out(CoreVertexOwnership.LABEL).hasLabel(self.LABEL)
+                .id().fold()) \
+            .by(__.in_(CoreVertexOwnership.LABEL).id().fold()) \
+            .by(__.out(CoreVertexInheritsFromTemplate.LABEL).id().fold())
+        related = submit_traversal(query).all().result()
+        related = related[0] if related else \
+            {"children": [], "parent": [], "template": []}
+        res = super().delete()
+        CoreVertex.update_ancestry(related["children"])
+        role_cache.invalidate_paths([vertex_id])
+        update_counters(
+            CoreVertexOwnership, "outV",
+            [vertex_key(label, i) for label in [Team.LABEL, self.LABEL]
+             for i in related["parent"]])
+        update_counters(
+            CoreVertexInheritsFromTemplate, "inV",
+            [vertex_key(Template.LABEL, i) for i in related["template"]])
+        return res
+
     @classmethod
-    def get_core_vertex_with_details(cls, vertex_id, user_id):
+    def get_core_vertex_with_details(cls, vertex_id, user_id, vertex=None):
         """ Returns the core vertex with the following details:
             'template'
             'templateProperties'
             'path' -> breadcrumbs
             'isFavorite' -> Whether the user has this node in favorites
-            with it's properties in another `template` attribute
-            NOTE: Raises an exception if the vertex id isn't valid
-        """
-        query = f"g.V().has('{cls.LABEL}', 'id', '{vertex_id}')" + \
-            f".fold().project('cv', 'template', 'templateProperties', " + \
-            f"'path', 'isFavorite')" + \
-            f".by(unfold())" + \
-            f".by(unfold().outE('{CoreVertexInheritsFromTemplate.LABEL}')" + \
-            f".inV().fold())" + \
-            f".by(unfold().outE('{CoreVertexInheritsFromTemplate.LABEL}')" + \
-            f".inV().outE('{TemplateHasProperty.LABEL}')" + \
-            f".inV().fold())" + \
-            f".by(unfold().until(__.hasLabel('team'))" + \
-            f".repeat(__.in('{CoreVertexOwnership.LABEL}')).path())" + \
-            f".by(unfold().inE('{UserFavoriteNode.LABEL}').outV()" + \
-            f".has('id', '{user_id}').count())"
-
-        result = client.submit(query).all().result()[0]
+            with it's properties in another `template` attribute; or None
+            if the vertex doesn't exist.
+            Everything is read through a single traversal
+        """
+        # The breadcrumbs are read directly (by their ids) if the vertex's
+        # path is materialized and the vertex is already loaded (i.e. by the
+        # permission decorators), rather than walking up the tree, and the
+        # template (with it's properties) is read from the team's cached
+        # templates
+        if vertex is None:
+            identity = identity_map()
+            vertex = identity.get(cls.LABEL, vertex_id) \
+                if identity is not None else None
+        ancestry = vertex.get_ancestry() if vertex is not None else None
+        projections = {"cv": __.identity()}
+        if ancestry is not None:
+            team_id, ancestors = ancestry
+            projections["template"] = \
+                __.out(CoreVertexInheritsFromTemplate.LABEL).id().fold()
+            projections["path"] = __.V(
+                vertex_key(Team.LABEL, team_id),
+                *[vertex_key(cls.LABEL, i) for i in ancestors]).fold()
+        else:
+            projections["template"] = \
+                __.outE(CoreVertexInheritsFromTemplate.LABEL).inV().fold()
+            projections["templateProperties"] = \
+                __.outE(CoreVertexInheritsFromTemplate.LABEL).inV() \
+                .outE(TemplateHasProperty.LABEL).inV().fold()
+            projections["path"] = __.until(__.hasLabel("team")) \
+                .repeat(__.in_(CoreVertexOwnership.LABEL)).path()
+        projections["isFavorite"] = \
+            __.inE(UserFavoriteNode.LABEL).outV().has("id", user_id).count()
+
+        query = g.V(vertex_key(cls.LABEL, vertex_id)).project(*projections)
+        for projection in projections.values():
+            query = query.by(projection)
+
+        result = submit_traversal(query).all().result()
+        if not result:
+            return None
+        result = result[0]
 
         core_vertex = cls.vertex_to_instance(result["cv"])
-        core_vertex.template = Template.vertex_to_instance(
-            result["template"][0])
-        core_vertex.template.properties = [
-            Template.vertex_to_instance(i) for i
-            in result["templateProperties"]]
-        
-        # Adding the path - the first is the object itself, the last is the team
-        path = result["path"]["objects"]
-        core_vertex.path = []
-        core_vertex.path += [CoreVertex.vertex_to_instance(i) for i in path[2:-1]]
-        core_vertex.path += [Team.vertex_to_instance(path[-1])]
-        core_vertex.path = reversed(core_vertex.path)
+        if ancestry is not None:
+            template_id = result["template"][0]
+            core_vertex.template = \
+                Template.get_team_templates(team_id).get(template_id) or \
+                Template.get_template_with_properties(template_id)
+        else:
+            core_vertex.template = Template.vertex_to_instance(
+                result["template"][0])
+            core_vertex.template.properties = [
+                TemplateProperty.vertex_to_instance(i) for i
+                in sorted(result["templateProperties"], key=property_index)]
+
+        if ancestry is not None:
+            # Ordering the (team first) breadcrumbs by the materialized path
+            vertices = {i["id"]: i for i in result["path"]}
+            core_vertex.path = [Team.vertex_to_instance(vertices[team_id])]
+            core_vertex.path += [CoreVertex.vertex_to_instance(vertices[i])
+                                 for i in ancestors if i in vertices]
+        else:
+            # Adding the path - the first is the object itself, the last is
+            # the team
+            path = result["path"]["objects"]
+            core_vertex.path = []
+            core_vertex.path += [CoreVertex.vertex_to_instance(i)
+                                 for i in path[1:-1]]
+            core_vertex.path += [Team.vertex_to_instance(path[-1])]
+            core_vertex.path = reversed(core_vertex.path)
         core_vertex.isFavorite = result["isFavorite"] > 0
 
         return core_vertex
@@ -417,14 +913,40 @@ class TemplateProperty(Vertex):
         """ Receives a list of property IDs, and updates all of their
             index fields with their index in the given list
         """
-        query = f"g.V().hasLabel('{cls.LABEL}').choose(id())"
+        query = g.V().hasLabel(cls.LABEL).choose(__.id())
         for index, prop_id in enumerate(property_ids):
-            query += f".option('{prop_id}', property('index', {index}))"
+            query = query.option(prop_id, __.property("index", index))
 
-        result = client.submit(query).all().result()
+        result = submit_traversal(query).all().result()
+
+        identity = identity_map()
+        if identity is not None:
+            for prop_id in property_ids:
+                identity.discard(cls.LABEL, prop_id)
+        template_cache.invalidate_properties(property_ids)
+        notify_write(property_ids)
 
         return [cls.vertex_to_instance(i) for i in result]
 
+    @classmethod
+    def update(cls, validated_data={}, vertex_id=None):
+        """ Overwritten to drop the cached templates of the property's
+            team
+        """
+        template_property = super().update(
+            validated_data=validated_data, vertex_id=vertex_id)
+        template_cache.invalidate_properties([vertex_id])
+        return template_property
+
+    def delete(self):
+        """ Overwritten to drop the cached templates of the property's
+            team
+        """
+        property_id = self.id
+        res = super().delete()
+        template_cache.invalidate_properties([property_id])
+        return res
+
 
 class Message(Vertex):
     """ Represents a message sent against a node by a user """
@@ -433,6 +955,9 @@ class Message(Vertex):
         "text": str,
         "sent_at": str
     }
+    author = Relationship(
+        lambda ids: UserSentMessage.get_authors(ids),
+        max_batch_size=Vertex.GET_MANY_CHUNK_SIZE)
 
     @staticmethod
     def list_messages(node_id, start=0, end=10,
@@ -441,19 +966,20 @@ class Message(Vertex):
             given `since` datetime object
             NOTE: Serialized
         """
-        query = f"g.V().has('id', '{node_id}')" + \
-            f".out('{NodeHasMessage.LABEL}').order().by('sent_at')"
+        query = g.V().has("id", node_id) \
+            .out(NodeHasMessage.LABEL).order().by("sent_at")
 
         if date_filter and filter_date:
-            query += f".has('sent_at', {date_filter}('{filter_date.isoformat()}'))"
+            query = query.has("sent_at", getattr(P, date_filter)(
+                filter_date.isoformat()))
 
-        query += f".project('id', 'text', 'sent_at', 'author')" + \
-            f".by(values('id'))" + \
-            f".by(values('text'))" +\
-            f".by(values('sent_at'))" + \
-            f".by(inE('{UserSentMessage.LABEL}').outV())"
+        query = query.project("id", "text", "sent_at", "author") \
+            .by(__.values("id")) \
+            .by(__.values("text")) \
+            .by(__.values("sent_at")) \
+            .by(__.inE(UserSentMessage.LABEL).outV())
 
-        result = client.submit(query).all().result()
+        result = submit_traversal(query).all().result()
         if result:
             result = result[start:end]
             messages = []
@@ -479,6 +1005,11 @@ class NodeHasMessage(Edge):
     INV_LABEL = Message.LABEL
     properties = {}
 
+    @classmethod
+    def counter_updates(cls):
+        """ Recounts the messages of the node """
+        return [("outV", counter_updates(CoreVertex, ["messagesCount"]))]
+
 
 class UserSentMessage(Edge):
     """ Represents an edge between a user and a message; turning the user
@@ -489,6 +1020,15 @@ class UserSentMessage(Edge):
     INV_LABEL = Message.LABEL
     properties = {}
 
+    @classmethod
+    def get_authors(cls, message_ids):
+        """ Returns the {message_id: User} of each of the given messages;
+            used for loading the `Message.author` relationship
+        """
+        related = cls.related_vertices(message_ids, cls.INV_LABEL, "in")
+        return {message_id: auth.User.vertex_to_instance(users[0])
+                for message_id, users in related.items() if users}
+
 
 class UserLastCheckedMessage(Edge):
     """ Represents a continuously updated edge that shows when the user
@@ -504,11 +1044,11 @@ class UserLastCheckedMessage(Edge):
     @staticmethod
     def get_last_checked_time(user_id, node_id):
         """ Returns the time that this user last checked messages """
-        query = f"g.V().has('{auth.User.LABEL}', 'id', '{user_id}')" + \
-            f".outE('{UserLastCheckedMessage.LABEL}').as('e')" + \
-            f".inV().has('id', '{node_id}').select('e').order()" + \
-            f".by('time', decr)"
-        result = client.submit(query).all().result()
+        query = g.V(vertex_key(auth.User.LABEL, user_id)) \
+            .outE(UserLastCheckedMessage.LABEL).as_("e") \
+            .inV().has("id", node_id).select("e").order() \
+            .by("time", Order.decr)
+        result = submit_traversal(query).all().result()
         if result:
             last_read = UserLastCheckedMessage.edge_to_instance(result[0])
             return last_read
@@ -525,8 +1065,21 @@ class Template(Vertex):
         "name": str,
         "canHaveChildren": bool,
         "pillForegroundColor": str,
-        "pillBackgroundColor": str
+        "pillBackgroundColor": str,
+        # The number of coreVertices inheriting from the template; a
+        # counter (see `Team.properties`)
+        "topicsCount": int
     }
+    COUNTERS = {
+        "topicsCount": lambda: __.inE(CoreVertexInheritsFromTemplate.LABEL)
+        .outV().hasLabel(CoreVertex.LABEL).count()
+    }
+    # The template's TemplateProperty instances; separate from the
+    # `properties` (which is the vertex's schema, unless it's overwritten
+    # with the properties fetched along with the template)
+    template_properties = Relationship(
+        lambda ids: TemplateHasProperty.get_templates_properties(ids),
+        many=True, max_batch_size=Vertex.GET_MANY_CHUNK_SIZE)
 
     @classmethod
     def update(cls, validated_data={}, vertex_id=None):
@@ -537,62 +1090,111 @@ class Template(Vertex):
         template_properties = validated_data.pop("properties", [])
 
         template = super().update(validated_data=validated_data, vertex_id=vertex_id)
+        template_cache.invalidate_templates([vertex_id])
 
         # Dropping all template properties and recreating them
         if template_properties:
-            drop_query = f"g.V().has('{cls.LABEL}', 'id', '{vertex_id}')" + \
-                f".out('{TemplateHasProperty.LABEL}').drop()"
-            client.submit(drop_query)
+            drop_query = g.V(vertex_key(cls.LABEL, vertex_id)) \
+                .out(TemplateHasProperty.LABEL).drop()
+            submit_traversal(drop_query).all().result()
 
             # Recreating the provided template_properties
-            create_query = "g.V()" + \
-                f".has('{Template.LABEL}', 'id', '{template.id}').as('t')"
+            create_query = g.V(vertex_key(Template.LABEL, template.id)) \
+                .as_("t")
             for prop in template_properties:
                 # Vertex Create + partition key query
-                create_query += f".addV('{TemplateProperty.LABEL}')" + \
-                    f".property('{DATABASE_SETTINGS['partition_key']}', " + \
-                    f"'{TemplateProperty.LABEL}')"
+                create_query = create_query.addV(TemplateProperty.LABEL) \
+                    .property(DATABASE_SETTINGS["partition_key"],
+                              TemplateProperty.LABEL)
                 # A property call for each field
                 for field, field_type in TemplateProperty.properties.items():
-                    create_query += f".property('{field}', '{prop[field]}')"
+                    create_query = create_query.property(
+                        field, str(prop[field]))
                 # The edge linking the template to the property
-                create_query += f".addE('{TemplateHasProperty.LABEL}')" + \
-                    ".from('t')"
+                create_query = create_query \
+                    .addE(TemplateHasProperty.LABEL).from_("t")
             # Selecting all created properties at the end of the query
-            create_query += f".outV().out('{TemplateHasProperty.LABEL}')"
+            create_query = create_query.outV().out(TemplateHasProperty.LABEL)
 
-            res = client.submit(create_query).all().result()
+            res = submit_traversal(create_query).all().result()
             template.properties = [
                 TemplateProperty.vertex_to_instance(i) for i in res]
+            template_cache.invalidate_templates([vertex_id])
+            notify_write([vertex_id])
 
         return template
 
+    def delete(self):
+        """ Overwritten to drop the cached templates, and recount the
+            templates, of the template's team
+        """
+        template_id = self.id
+        query = g.V(vertex_key(self.LABEL, template_id)) \
+            .in_(TeamOwnsTemplate.LABEL).hasLabel(Team.LABEL).id()
+        team_ids = submit_traversal(query).all().result()
+        res = super().delete()
+        template_cache.invalidate_templates([template_id], deleted=True)
+        update_counters(TeamOwnsTemplate, "outV",
+                        [vertex_key(Team.LABEL, i) for i in team_ids])
+        return res
+
+    @classmethod
+    def load_team_templates(cls, team_id):
+        """ Returns the template vertices of the team and the vertices of
+            their properties; loaded into the template cache
+        """
+        query = g.V(vertex_key(Team.LABEL, team_id)) \
+            .out(TeamOwnsTemplate.LABEL).hasLabel(cls.LABEL) \
+            .project("template", "properties").by() \
+            .by(__.out(TemplateHasProperty.LABEL).fold())
+        result = submit_traversal(query).all().result()
+
+        return {
+            "templates": [i["template"] for i in result],
+            "properties": {i["template"]["id"]: i["properties"]
+                           for i in result}
+        }
+
+    @classmethod
+    def get_team_templates(cls, team_id):
+        """ Returns the {template_id: Template} of the team's templates,
+            with their TemplateProperty instances (ordered by their index)
+            as their `properties`; read from the template cache (see
+            core.templates), so new instances are returned every time
+        """
+        templates = template_cache.get(team_id, cls.load_team_templates)
+
+        instances = {}
+        for vertex in templates["templates"]:
+            template = cls.vertex_to_instance(vertex)
+            template.properties = [
+                TemplateProperty.vertex_to_instance(i)
+                for i in templates["properties"][vertex["id"]]]
+            instances[template.id] = template
+        return instances
+
+    @classmethod
+    def get_template_team_id(cls, template_id):
+        """ Returns the id of the team that owns the template """
+        team_id = template_cache.team_of(template_id)
+        if team_id is None:
+            query = g.V(vertex_key(cls.LABEL, template_id)) \
+                .in_(TeamOwnsTemplate.LABEL).hasLabel(Team.LABEL).id()
+            result = submit_traversal(query).all().result()
+            team_id = result[0] if result else None
+        return team_id
+
     @classmethod
     def get_template_with_properties(cls, template_id, parent_team_id=None):
         """ Returns the template and the template properties belonging to it
-            in a single query
+            from the team's (cached) templates; None if the template doesn't
+            exist or isn't owned by the given team
         """
-        query = "g.V()"
-        # Prepending a team query if the team id arg is provided
-        if parent_team_id:
-            query += f".has('{Team.LABEL}', 'id', " + \
-                f"'{parent_team_id}').out('{TeamOwnsTemplate.LABEL}')"
-        query += f".has('{Template.LABEL}', 'id', '{template_id}')" + \
-            f".fold().project('template', 'properties').by(unfold())" + \
-            f".by(unfold().out('{TemplateHasProperty.LABEL}').fold())"
-
-        try:
-            # This raises a 597 error if there's nothing found
-            res = client.submit(query).all().result()
-        except:
+        team_id = parent_team_id or cls.get_template_team_id(template_id)
+        if not team_id:
             return None
 
-        template = Template.vertex_to_instance(res[0]["template"])
-        template.properties = [
-            TemplateProperty.vertex_to_instance(i) for i
-            in res[0]["properties"]]
-
-        return template
+        return cls.get_team_templates(team_id).get(template_id)
 
     @classmethod
     def get_templates_with_details(cls, team_id):
@@ -601,21 +1203,26 @@ class Template(Vertex):
                 - id, name, topicsCount
             -- SERIALIZED
         """
-        query = f"g.V().has('{Team.LABEL}', 'id', '{team_id}')" + \
-            f".out('{TeamOwnsTemplate.LABEL}').hasLabel('{Template.LABEL}')" + \
-            f".project('id', 'name', 'topicsCount', 'properties')" + \
-            f".by(values('id')).by(values('name'))" + \
-            f".by(inE('{CoreVertexInheritsFromTemplate.LABEL}').outV()" + \
-            f".hasLabel('{CoreVertex.LABEL}').count())" + \
-            f".by(outE('{TemplateHasProperty.LABEL}').inV().fold())"
-        result = client.submit(query).all().result()
+        # The templates are read from the template cache, and only their
+        # topic counters are read (or counted, if they haven't been
+        # reconciled yet)
+        query = g.V(vertex_key(Team.LABEL, team_id)) \
+            .out(TeamOwnsTemplate.LABEL).hasLabel(Template.LABEL) \
+            .project("id", "topicsCount").by(__.id()) \
+            .by(__.coalesce(__.values("topicsCount"),
+                            cls.COUNTERS["topicsCount"]()))
+        topics = {i["id"]: int(i["topicsCount"])
+                  for i in submit_traversal(query).all().result()}
 
         templates = []
-        for template in result:
-            properties = [TemplateProperty.vertex_to_instance(i)
-                          for i in template["properties"]]
-            template["properties"] = []
-            for prop in properties:
+        for instance in cls.get_team_templates(team_id).values():
+            template = {
+                "id": instance.id,
+                "name": instance.name,
+                "topicsCount": topics.get(instance.id, 0),
+                "properties": []
+            }
+            for prop in instance.properties:
                 template["properties"].append({
                     "id": prop.id,
                     "name": prop.name,
@@ -637,15 +1244,43 @@ class TemplateHasProperty(Edge):
     INV_LABEL = TemplateProperty.LABEL
     properties = {}
 
+    @classmethod
+    def after_write(cls, pairs):
+        """ Drops the cached templates of the templates' teams """
+        template_cache.invalidate_templates(
+            template_id for template_id, _ in pairs)
+
     @classmethod
     def get_template_properties(cls, template_id):
         """ Returns all TemplateProperties belonging to the given template """
-        query = f"g.V().has('{Template.LABEL}', 'id', '{template_id}')" + \
-            f".out('{cls.LABEL}')"
+        template = Template.get_template_with_properties(template_id)
+        return template.properties if template else []
 
-        res = client.submit(query).all().result()
+    @classmethod
+    def get_templates_properties(cls, template_ids):
+        """ Returns the {template_id: [TemplateProperty, ...]} of each of
+            the given templates; used for loading the
+            `Template.template_properties` relationship.
+            The properties of the templates of cached teams are read from
+            the template cache, and the rest through a single query
+        """
+        properties, missing = {}, []
+        for template_id in template_ids:
+            team_id = template_cache.team_of(template_id)
+            template = Template.get_team_templates(team_id).get(
+                template_id) if team_id else None
+            if template is not None:
+                properties[template_id] = template.properties
+            else:
+                missing.append(template_id)
 
-        return [TemplateProperty.vertex_to_instance(i) for i in res]
+        if missing:
+            related = cls.related_vertices(missing, cls.OUTV_LABEL)
+            properties.update({
+                template_id: [TemplateProperty.vertex_to_instance(i)
+                              for i in sorted(vertices, key=property_index)]
+                for template_id, vertices in related.items()})
+        return properties
 
 
 class CoreVertexOwnership(Edge):
@@ -668,9 +1303,8 @@ class CoreVertexOwnership(Edge):
             2) A coreVertex can only be owned by a coreVertex whose Template
                  has the canHaveChildren property set to True
         """
-        existing_edge_q = f"g.V().has('{inv_label}', 'id', '{inv_id}')" + \
-            f".inE('owns')"
-        existing_edge = client.submit(existing_edge_q).all().result()
+        existing_edge_q = g.V(vertex_key(inv_label, inv_id)).inE("owns")
+        existing_edge = submit_traversal(existing_edge_q).all().result()
         if existing_edge:
             raise CustomValidationFailedException(
                 "CoreVertex can only be owned by a single parent at a time!")
@@ -678,11 +1312,10 @@ class CoreVertexOwnership(Edge):
         # Checking for the template's canHaveChildren property if the
         # parent is a coreVertex
         if outv_label == "coreVertex":
-            parent_template_query = \
-                f"g.V().has('{outv_label}', 'id', '{outv_id}')" + \
-                f".out('{CoreVertexInheritsFromTemplate.LABEL}')"
+            parent_template_query = g.V(vertex_key(outv_label, outv_id)) \
+                .out(CoreVertexInheritsFromTemplate.LABEL)
             parent_template = Template.vertex_to_instance(
-                client.submit(parent_template_query).all().result()[0])
+                submit_traversal(parent_template_query).all().result()[0])
             if parent_template.canHaveChildren != "True":
                 raise CustomValidationFailedException(
                     "CoreVertex can only be owned by a CoreVertex that has"
@@ -690,20 +1323,78 @@ class CoreVertexOwnership(Edge):
 
         return data
 
+    @classmethod
+    def get_children_ids(cls, vertex_label, vertex_id):
+        """ Returns the ids of the coreVertices owned by the given vertex """
+        query = g.V(vertex_key(vertex_label, vertex_id)).out(cls.LABEL) \
+            .hasLabel(CoreVertex.LABEL).id()
+        return submit_traversal(query).all().result()
+
+    @classmethod
+    def after_write(cls, pairs):
+        """ Updates the materialized paths, and drops the cached roles, of
+            the moved (or newly created) nodes' subtrees, as their path to
+            the team has changed
+        """
+        vertex_ids = [inv_id for _, inv_id in pairs]
+        CoreVertex.update_ancestry(vertex_ids)
+        role_cache.invalidate_paths(vertex_ids)
+
+    @classmethod
+    def counter_updates(cls):
+        """ Recounts the children of the parent """
+        return [("outV", counter_updates(CoreVertex, ["childrenCount"]))]
+
+    @classmethod
+    def bulk_custom_validation(cls, rows, outv_label=None, inv_label=None):
+        """ Batched `custom_validation`; runs a single query for finding the
+            already owned children, and one for the parents' templates'
+            canHaveChildren property (if the parents are CoreVertices)
+        """
+        owned = cls.vertices_with_edges(
+            [inv_id for _, _, inv_id, _ in rows], inv_label or cls.INV_LABEL)
+
+        can_have_children = {}
+        parent_ids = list({outv_id for _, outv_id, _, _ in rows})
+        if outv_label == "coreVertex" and parent_ids:
+            query = g.V(*[vertex_key(outv_label, i) for i in parent_ids]) \
+                .project("id", "canHaveChildren") \
+                .by(__.id()) \
+                .by(__.out(CoreVertexInheritsFromTemplate.LABEL)
+                    .values("canHaveChildren").fold())
+            can_have_children = {
+                i["id"]: i["canHaveChildren"] == ["True"]
+                for i in submit_traversal(query).all().result()}
+
+        errors = {}
+        for index, outv_id, inv_id, _ in rows:
+            if inv_id in owned:
+                errors[index] = CustomValidationFailedException(
+                    "CoreVertex can only be owned by a single parent at a "
+                    "time!")
+            elif outv_label == "coreVertex" and \
+                    not can_have_children.get(outv_id):
+                errors[index] = CustomValidationFailedException(
+                    "CoreVertex can only be owned by a CoreVertex that has"
+                    " it's template's canHaveChildren property set to "
+                    "`true`!")
+            owned.add(inv_id)
+        return errors
+
     @classmethod
     def get_children(cls, parent_id, parent_type, template_id=None):
         """ Returns all DIRECT children coreVertices under the given
             parent
         """
-        query = f"g.V().has('{parent_type}', 'id', '{parent_id}')" + \
-            f".out('{cls.LABEL}').hasLabel('{CoreVertex.LABEL}')"
+        query = g.V(vertex_key(parent_type, parent_id)) \
+            .out(cls.LABEL).hasLabel(CoreVertex.LABEL)
 
         if template_id:
-            query += f".as('cv')" + \
-                f".out('{CoreVertexInheritsFromTemplate.LABEL}')" + \
-                f".has('id', '{template_id}').select('cv')"
+            query = query.as_("cv") \
+                .out(CoreVertexInheritsFromTemplate.LABEL) \
+                .has("id", template_id).select("cv")
 
-        result = client.submit(query).all().result()
+        result = submit_traversal(query).all().result()
 
         return [CoreVertex.vertex_to_instance(i) for i in result]
 
@@ -714,18 +1405,22 @@ class CoreVertexOwnership(Edge):
             direct sub-children
                 - Also returns an isFavorite value for each child
         """
-        query = f"g.V().has('id', '{parent_id}').out('owns')" + \
-            f".hasLabel('{CoreVertex.LABEL}').as('children')" + \
-            f".select('children').by(project('topChild', 'template', 'sub_children')" + \
-            f".by()" + \
-            f".by(outE('{CoreVertexInheritsFromTemplate.LABEL}').inV())" + \
-            f".by(outE('{CoreVertexOwnership.LABEL}').inV()" + \
-            f".hasLabel('{CoreVertex.LABEL}').as('subchild')" + \
-            f".outE('{CoreVertexInheritsFromTemplate.LABEL}').inV()" + \
-            f".as('subchildTemplate').select('subchild')" + \
-            f".map(outE('{CoreVertexOwnership.LABEL}').inV()" + \
-            f".hasLabel('{CoreVertex.LABEL}').count()).as('childCount')" + \
-            f".select('subchild', 'subchildTemplate', 'childCount').fold()))"
+        query = g.V().has("id", parent_id).out("owns") \
+            .hasLabel(CoreVertex.LABEL).as_("children") \
+            .select("children").by(
+                __.project("topChild", "template", "sub_children")
+                .by()
+                .by(__.outE(CoreVertexInheritsFromTemplate.LABEL).inV())
+                .by(__.outE(CoreVertexOwnership.LABEL).inV()
+                    .hasLabel(CoreVertex.LABEL).as_("subchild")
+                    .outE(CoreVertexInheritsFromTemplate.LABEL).inV()
+                    .as_("subchildTemplate").select("subchild")
+                    .map(__.coalesce(
+                        __.values("childrenCount"),
+                        CoreVertex.COUNTERS["childrenCount"]()))
+                    .as_("childCount")
+                    .select("subchild", "subchildTemplate", "childCount")
+                    .fold()))
 
         tree = []
         favorite_nodes = UserFavoriteNode.get_favorite_nodes(
@@ -734,7 +1429,7 @@ class CoreVertexOwnership(Edge):
 
         # Raises an exception if there are NO direct children
         try:
-            result = client.submit(query).all().result()
+            result = submit_traversal(query).all().result()
         except:
             return tree
 
@@ -750,7 +1445,7 @@ class CoreVertexOwnership(Edge):
                 cv.isFavorite = cv.id in favorite_nodes
                 cv.template = Template.vertex_to_instance(
                     sub_child["subchildTemplate"])
-                if sub_child["childCount"] > 0:
+                if int(sub_child["childCount"]) > 0:
                     cv.children = []
                 sub_children.append(cv)
             if sub_children:
@@ -766,9 +1461,8 @@ class CoreVertexOwnership(Edge):
             ownership tree
             [UNTESTED]
         """
-        query = \
-            f"g.V().has('{CoreVertex.LABEL}', 'id', '{core_vertex_id}')" + \
-            f".until(hasLabel('{Team.LABEL}')).repeat(out('{cls.LABEL}'))"
+        query = g.V(vertex_key(CoreVertex.LABEL, core_vertex_id)) \
+            .until(__.hasLabel(Team.LABEL)).repeat(__.out(cls.LABEL))
 
-        team = client.submit(query).all().result()[0]
+        team = submit_traversal(query).all().result()[0]
         return Team.vertex_to_instance(team)
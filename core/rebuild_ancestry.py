@@ -0,0 +1,22 @@
+""" Materializes the path to the root team of every coreVertex under the
+    given teams (or all of the teams); for the vertices written before the
+    paths were materialized (see `CoreVertex.get_ancestry`), or to repair
+    them after the tree has been edited outside of the models:
+        python -m core.rebuild_ancestry [--team <team id> ...]
+"""
+import argparse
+from core.models import CoreVertex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--team", action="append", dest="teams",
+                        help="Only rebuilds the paths under this team")
+    args = parser.parse_args()
+
+    updated = CoreVertex.rebuild_ancestry(args.teams)
+    print(f"Updated the path of {updated} coreVertices")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+""" Recounts the counters (i.e. `templatesCount`, `topicsCount`,
+    `childrenCount`, `messagesCount`) of the given teams (or all of the
+    teams) along with their templates and coreVertices; for the vertices
+    written before the counters existed, or to correct the counters that
+    have drifted from their edges (see `core.models.refresh_counters`):
+        python -m core.reconcile_counters [--team <team id> ...]
+"""
+import argparse
+from core.models import reconcile_counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--team", action="append", dest="teams",
+                        help="Only reconciles the counters under this team")
+    args = parser.parse_args()
+
+    corrected = reconcile_counters(args.teams)
+    print(f"Corrected the counters of {corrected} vertices")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+""" Provides the process-wide cache of the roles resolved for the
+    permission decorators (see `Team.get_user_permissions` and
+    `CoreVertex.get_user_permissions`), which are checked on every request.
+    The roles of a user for a node are inherited through every node in it's
+    path to the team, so each entry keeps the ids of that path along with
+    the roles; which lets the entries be invalidated precisely:
+        - assigning, changing or removing a user's role for a node drops
+            that user's entries whose path includes the node
+        - moving (or deleting) a node drops every entry whose path includes
+            the node, as the path of it's whole subtree has changed
+    The entries are dropped from the process that made the change; for the
+    other processes to drop theirs, each entry is tagged with the user and
+    the vertices of it's path, whose tokens are kept in a cache backend
+    shared by every process (see `init_app`) and replaced on invalidation;
+    entries are only served while all of their tokens are still current
+"""
+from db.cache import TTLCache
+from settings import ROLE_CACHE_SETTINGS
+import logging
+import uuid
+
+
+logger = logging.getLogger(__name__)
+
+
+class RoleCache:
+    """ Caches the {direct_role, indirect_roles} of (vertex_id, user_id)
+        pairs along with the ids of the vertex's path to it's team
+    """
+    # Included in the tags of every entry; replaced when every entry is
+    # invalidated
+    ALL = "*"
+
+    def __init__(self, maxsize=1024, ttl=60, **kwargs):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl, **kwargs)
+        # The Flask-Caching backend holding the tokens of the tags
+        self.shared = None
+
+    def init_app(self, shared=None, processes=1):
+        """ Sets the cache backend shared by every process (if any), which
+            holds the tokens of the entries' tags.
+            Without one, the cache is disabled if the app is served by more
+            than one process, as a role removed (or downgraded) through one
+            process would still be honored by the others until their
+            entries expire
+        """
+        self.shared = shared
+        if shared is None and processes > 1:
+            logger.warning(
+                "The role cache is disabled, as it can't be invalidated "
+                f"across the {processes} worker processes without a shared "
+                "response cache backend (i.e. \"redis\")")
+            self.cache.maxsize = 0
+            self.cache.clear()
+
+    @staticmethod
+    def tag_key(kind, value):
+        return f"roles:{kind}:{value}"
+
+    def entry_tags(self, user_id, path):
+        """ Returns the keys of the tags of a user's entry with the given
+            path
+        """
+        return [self.tag_key("all", self.ALL),
+                self.tag_key("user", user_id)] + \
+            [self.tag_key("node", i) for i in path]
+
+    def tokens(self, keys):
+        """ Returns the current {key: token} of the given tag keys, setting
+            a token for the keys that don't have one
+        """
+        keys = list(keys)
+        values = self.shared.get_many(*keys)
+        if None in values:
+            for key, value in zip(keys, values):
+                if value is None:
+                    # Not overwriting the token set by a concurrent request
+                    self.shared.add(key, uuid.uuid4().hex, timeout=0)
+            values = self.shared.get_many(*keys)
+        return dict(zip(keys, values))
+
+    def replace_tokens(self, keys):
+        """ Replaces the tokens of the given tag keys, which invalidates the
+            entries of every process tagged with them
+        """
+        if self.shared is not None and keys:
+            self.shared.set_many(
+                {key: uuid.uuid4().hex for key in keys}, timeout=0)
+
+    def get(self, vertex_id, user_id):
+        """ Returns (a copy of) the cached roles, or None """
+        entry = self.cache.get((vertex_id, user_id))
+        if entry is None:
+            return None
+        roles, _, tokens = entry
+        if tokens is not None and \
+                self.shared.get_many(*tokens) != list(tokens.values()):
+            self.cache.pop((vertex_id, user_id))
+            return None
+        return {
+            "direct_role": roles["direct_role"],
+            "indirect_roles": list(roles["indirect_roles"])
+        }
+
+    def version(self, vertex_id, user_id):
+        """ Returns the tokens of the user's (and the vertex's) tags before
+            the roles are resolved, to be passed on to `set`; None if there
+            is no shared backend
+        """
+        if self.shared is None or self.cache.maxsize <= 0:
+            return None
+        return self.tokens(self.entry_tags(user_id, [vertex_id]))
+
+    def set(self, vertex_id, user_id, roles, path, version=None):
+        """ Caches the roles, unless the tokens of the `version` (see
+            `version`) have been replaced while the roles were resolved
+        """
+        tokens = None
+        if version is not None:
+            tokens = self.tokens(self.entry_tags(user_id, path))
+            if any(tokens.get(key, token) != token
+                   for key, token in version.items()):
+                return
+        self.cache.set((vertex_id, user_id), ({
+            "direct_role": roles["direct_role"],
+            "indirect_roles": tuple(roles["indirect_roles"])
+        }, frozenset(path), tokens))
+
+    def invalidate_assignments(self, pairs):
+        """ Drops the entries affected by the (user_id, vertex_id) role
+            assignments; a None user or vertex matches every user/vertex
+        """
+        pairs = list(pairs)
+        # Every entry of a (re)assigned user is invalidated in the other
+        # processes, as the entries there can't be matched by their path
+        self.replace_tokens(
+            [self.tag_key("all", self.ALL)
+             if user is None and vertex is None else
+             self.tag_key("node", vertex) if user is None else
+             self.tag_key("user", user) for user, vertex in pairs])
+        if any(user is None and vertex is None for user, vertex in pairs):
+            return self.cache.discard_if(lambda key, entry: True)
+
+        def affected(key, entry):
+            return any(
+                (user is None or key[1] == user) and
+                (vertex is None or vertex in entry[1])
+                for user, vertex in pairs)
+        return self.cache.discard_if(affected)
+
+    def invalidate_paths(self, vertex_ids):
+        """ Drops the entries of every vertex whose path includes any of the
+            given vertices
+        """
+        vertex_ids = set(vertex_ids)
+        self.replace_tokens(
+            [self.tag_key("all", self.ALL) if i is None else
+             self.tag_key("node", i) for i in vertex_ids])
+        if None in vertex_ids:
+            return self.cache.discard_if(lambda key, entry: True)
+        return self.cache.discard_if(
+            lambda key, entry: not entry[1].isdisjoint(vertex_ids))
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        return self.cache.stats()
+
+
+role_cache = RoleCache(**ROLE_CACHE_SETTINGS)
@@ -1,4 +1,6 @@
-from marshmallow import Schema, fields, validates, ValidationError
+from marshmallow import (
+    Schema, fields, validates, ValidationError, pre_dump
+)
 from .models import *
 import auth.serializers
 import json
@@ -11,6 +13,14 @@ class MessageListSchema(Schema):
     sent_at = fields.Str(dumps_only=True)
     author = fields.Nested(auth.serializers.UserListSchema, dumps_only=True)
 
+    @pre_dump(pass_many=True)
+    def queue_authors(self, data, many):
+        """ Queues the messages without a loaded author, so that all of
+            their authors are loaded through a single query
+        """
+        Message.author.queue(data if many else [data])
+        return data
+
 
 class TemplatePropertySchema(Schema):
     """ Schema for TemplateProperties """
@@ -30,14 +40,24 @@ class TemplateDetailSchema(Schema):
     pillForegroundColor = fields.Str(required=True)
     pillBackgroundColor = fields.Str(required=True)
 
+    @pre_dump(pass_many=True)
+    def queue_template_properties(self, data, many):
+        """ Queues the templates without preloaded properties, so that all
+            of their properties are loaded through a single query
+        """
+        templates = data if many else [data]
+        Template.template_properties.queue(
+            [i for i in templates if not isinstance(i.properties, list)])
+        return data
+
     def get_template_properties(self, obj):
-        """ Uses the template methods to get a serialized list of
-            properties
+        """ Returns the serialized list of the template's properties; loaded
+            through the request's dataloader if they weren't preloaded
         """
         if obj.properties and isinstance(obj.properties, list):
             properties = obj.properties
         else:
-            properties = TemplateHasProperty.get_template_properties(obj.id)
+            properties = obj.template_properties
 
         data = TemplatePropertySchema(many=True).dumps(properties)
         return json.loads(data.data)
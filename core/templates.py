@@ -0,0 +1,103 @@
+""" Provides the process-wide cache of each team's templates along with their
+    (index ordered) properties, which are read by most of the node and
+    template endpoints but rarely change.
+    The cache holds the raw vertices the Template/TemplateProperty
+    instances are built from (see `Template.get_team_templates`), so that
+    every read gets it's own instances. It's versioned: every invalidation
+    increments the version, and a team's templates that were loaded while
+    the version changed aren't stored, so that a load racing a write never
+    caches the templates from before the write
+"""
+import threading
+from db.cache import TTLCache
+from settings import TEMPLATE_CACHE_SETTINGS
+
+
+def property_index(vertex):
+    """ Returns the sort key of a TemplateProperty vertex; properties
+        without a (valid) index are placed last
+    """
+    try:
+        return 0, int(vertex["properties"]["index"][0]["value"])
+    except (KeyError, IndexError, TypeError, ValueError):
+        return 1, 0
+
+
+class TemplateCache:
+    """ Caches the templates of teams as {"templates": [vertex, ...],
+        "properties": {template_id: [vertex, ...]}} dictionaries, keyed by
+        the team id
+    """
+    def __init__(self, maxsize=1024, ttl=300, **kwargs):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl, **kwargs)
+        self.lock = threading.Lock()
+        self.version = 0
+        # The team of every cached template
+        self.teams = {}
+
+    def get(self, team_id, load):
+        """ Returns the team's templates, loading them through
+            `load(team_id)` (which returns the template vertices and their
+            property vertices as {"templates": .., "properties": ..}) if
+            they aren't cached
+        """
+        templates = self.cache.get(team_id)
+        if templates is not None:
+            return templates
+
+        version = self.version
+        templates = load(team_id)
+        for properties in templates["properties"].values():
+            properties.sort(key=property_index)
+        with self.lock:
+            if version == self.version:
+                self.cache.set(team_id, templates)
+                for template in templates["templates"]:
+                    self.teams[template["id"]] = team_id
+        return templates
+
+    def team_of(self, template_id):
+        """ Returns the id of the team that owns the (cached) template """
+        return self.teams.get(template_id)
+
+    def invalidate_teams(self, team_ids):
+        with self.lock:
+            self.version += 1
+            for team_id in team_ids:
+                self.cache.pop(team_id)
+
+    def invalidate_templates(self, template_ids, deleted=False):
+        """ Drops the cached templates of the teams that own the given
+            templates
+        """
+        with self.lock:
+            self.version += 1
+            for template_id in template_ids:
+                team_id = self.teams.pop(template_id, None) if deleted else \
+                    self.teams.get(template_id)
+                if team_id is not None:
+                    self.cache.pop(team_id)
+
+    def invalidate_properties(self, property_ids):
+        """ Drops the cached templates of the teams with any of the given
+            template properties
+        """
+        property_ids = set(property_ids)
+        with self.lock:
+            self.version += 1
+            self.cache.discard_if(lambda team_id, templates: any(
+                i["id"] in property_ids
+                for properties in templates["properties"].values()
+                for i in properties))
+
+    def clear(self):
+        with self.lock:
+            self.version += 1
+            self.cache.clear()
+            self.teams.clear()
+
+    def stats(self):
+        return dict(self.cache.stats(), version=self.version)
+
+
+template_cache = TemplateCache(**TEMPLATE_CACHE_SETTINGS)
@@ -0,0 +1,80 @@
+from utils.flask_test_case import FlaskTestCase
+from core.models import *
+from db.exceptions import CustomValidationFailedException
+
+
+class BulkEdgeCreationTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) A whole subtree can be wired to it's parents and templates
+            through `Edge.bulk_create`
+        2) The (batched) validation rules of the single-edge `create` are
+            applied to every row, with the failures reported per row
+    """
+    def setUp(self):
+        """ Fixtures for the test cases;
+            variables that remain the same for all of the test cases
+        """
+        super().setUp()
+        self.team = Team.create(name="testTeam")
+        self.template = Template.create(name="Temp", canHaveChildren=True)
+        TeamOwnsTemplate.create(team=self.team.id, template=self.template.id)
+        self.other_template = Template.create(
+            name="Other", canHaveChildren=True)
+
+    def test_subtree_is_wired_in_bulk(self):
+        """ Asserts that roots (owned by the team) and their children (owned
+            by the roots) are created in order
+        """
+        roots = CoreVertex.bulk_create(
+            [{"title": f"Root {i}", "templateData": "{}"} for i in range(3)])
+        children = CoreVertex.bulk_create(
+            [{"title": f"Child {i}", "templateData": "{}"} for i in range(6)])
+
+        edges, errors = CoreVertexOwnership.bulk_create(
+            [(self.team.id, root.id) for root in roots])
+        self.assertEqual(errors, {})
+        self.assertEqual([e.inV for e in edges], [r.id for r in roots])
+
+        edges, errors = CoreVertexInheritsFromTemplate.bulk_create(
+            [(cv.id, self.template.id) for cv in roots], chunk_size=2)
+        self.assertEqual(errors, {})
+
+        edges, errors = CoreVertexOwnership.bulk_create(
+            [(roots[i % 3].id, child.id) for i, child in enumerate(children)],
+            outv_label="coreVertex", chunk_size=4, parallelism=2)
+        self.assertEqual(errors, {})
+        self.assertEqual([e.outV for e in edges],
+                         [roots[i % 3].id for i in range(6)])
+
+    def test_failures_are_reported_per_row(self):
+        """ Asserts that invalid rows are reported without stopping the
+            valid rows from being created
+        """
+        cv, second_cv = CoreVertex.bulk_create(
+            [{"title": "CV", "templateData": "{}"},
+             {"title": "Second CV", "templateData": "{}"}])
+
+        edges, errors = CoreVertexOwnership.bulk_create([
+            (self.team.id, cv.id),
+            # Already owned by the first row
+            (self.team.id, cv.id),
+            # Nonexistent child
+            (self.team.id, "missing"),
+            (self.team.id, second_cv.id)
+        ])
+
+        self.assertEqual(sorted(errors), [1, 2])
+        self.assertIsInstance(errors[1], CustomValidationFailedException)
+        self.assertIsNone(edges[1])
+        self.assertEqual(edges[3].inV, second_cv.id)
+
+        edges, errors = CoreVertexInheritsFromTemplate.bulk_create([
+            # Template isn't owned by the CoreVertex's team
+            (cv.id, self.other_template.id),
+            (second_cv.id, self.template.id),
+            # Already inheriting from the template in the previous row
+            (second_cv.id, self.template.id)
+        ])
+
+        self.assertEqual(sorted(errors), [0, 2])
+        self.assertEqual(edges[1].outV, second_cv.id)
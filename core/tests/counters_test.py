@@ -0,0 +1,155 @@
+from utils.flask_test_case import FlaskTestCase
+from auth.models import *
+from core.models import *
+from db.engine import client, UnitOfWork
+from db.identity import clear_identity_map
+import datetime
+
+
+class CountersTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) The counters are updated whenever their edges are written,
+            by the same query that writes the edge
+        2) Deleting a template or coreVertex updates the counters it was
+            counted by
+        3) The list endpoints read the counters, falling back to counting
+            the edges of vertices without counters
+        4) Reconciling the counters corrects the ones that have drifted
+    """
+    def setUp(self):
+        """ A team -> parent -> child tree """
+        self.team = Team.create(name="Team", **initial_counters(Team))
+        self.template = Template.create(
+            name="Template", canHaveChildren=True,
+            pillForegroundColor="#000", pillBackgroundColor="#fff",
+            **initial_counters(Template))
+        TeamOwnsTemplate.create(team=self.team.id, template=self.template.id)
+        self.parent = self.create_node("Parent", self.team)
+        self.child = self.create_node("Child", self.parent)
+
+    def create_node(self, title, parent):
+        node = CoreVertex.create(title=title, templateData="{}",
+                                 **initial_counters(CoreVertex))
+        CoreVertexOwnership.create(
+            outv_id=parent.id, inv_id=node.id, outv_label=parent.LABEL,
+            inv_label=CoreVertex.LABEL)
+        CoreVertexInheritsFromTemplate.create(
+            coreVertex=node.id, template=self.template.id)
+        return node
+
+    def counters(self, model, vertex_id):
+        clear_identity_map()
+        vertex = model.filter(id=vertex_id)[0]
+        return {name: int(getattr(vertex, name)) for name in model.COUNTERS}
+
+    def test_edge_writes_update_the_counters(self):
+        """ Asserts that creating and deleting edges updates the counters """
+        self.assertEqual(self.counters(Team, self.team.id), {
+            "templatesCount": 1, "topicsCount": 2, "childrenCount": 1,
+            "messagesCount": 0})
+        self.assertEqual(self.counters(Template, self.template.id),
+                         {"topicsCount": 2})
+        self.assertEqual(self.counters(CoreVertex, self.parent.id),
+                         {"childrenCount": 1, "messagesCount": 0})
+
+        message = Message.create(
+            text="Text", sent_at=datetime.datetime.now().isoformat())
+        edge = NodeHasMessage.create(
+            outv_id=self.child.id, inv_id=message.id,
+            outv_label=CoreVertex.LABEL, inv_label=Message.LABEL)
+        self.assertEqual(
+            self.counters(CoreVertex, self.child.id)["messagesCount"], 1)
+
+        edge.delete()
+        self.assertEqual(
+            self.counters(CoreVertex, self.child.id)["messagesCount"], 0)
+
+    def test_counters_are_updated_by_the_edge_writes(self):
+        """ Asserts that writing a counted edge doesn't run any other
+            query, and that bulk and unit of work writes update the
+            counters as well
+        """
+        def queries():
+            callers = client.metrics.snapshot("caller")
+            return sum(i["count"] for i in callers.values())
+
+        message = Message.create(
+            text="Text", sent_at=datetime.datetime.now().isoformat())
+        before = queries()
+        edge = NodeHasMessage.create(
+            outv_id=self.team.id, inv_id=message.id,
+            outv_label=Team.LABEL, inv_label=Message.LABEL)
+        edge.delete()
+        self.assertEqual(queries() - before, 2)
+        self.assertEqual(
+            self.counters(Team, self.team.id)["messagesCount"], 0)
+
+        nodes = CoreVertex.bulk_create(
+            [{"title": f"Node {i}", "templateData": "{}"} for i in range(3)])
+        CoreVertexOwnership.bulk_create(
+            [(self.child.id, node.id) for node in nodes],
+            outv_label=CoreVertex.LABEL)
+        with UnitOfWork() as uow:
+            uow.create_edge(CoreVertexInheritsFromTemplate, nodes[0].id,
+                            self.template.id, validate=False)
+        self.assertEqual(
+            self.counters(CoreVertex, self.child.id)["childrenCount"], 3)
+        self.assertEqual(self.counters(Template, self.template.id),
+                         {"topicsCount": 3})
+        self.assertEqual(
+            self.counters(Team, self.team.id)["topicsCount"], 3)
+
+    def test_deletes_update_the_counters(self):
+        """ Asserts that deleting a coreVertex or template updates the
+            counters of it's parent, template and team
+        """
+        self.child.delete()
+        self.assertEqual(
+            self.counters(CoreVertex, self.parent.id)["childrenCount"], 0)
+        self.assertEqual(self.counters(Template, self.template.id),
+                         {"topicsCount": 1})
+        self.assertEqual(
+            self.counters(Team, self.team.id)["topicsCount"], 1)
+
+        template = Template.create(name="Other", canHaveChildren=False)
+        TeamOwnsTemplate.create(team=self.team.id, template=template.id)
+        self.assertEqual(
+            self.counters(Team, self.team.id)["templatesCount"], 2)
+        Template.filter(id=template.id)[0].delete()
+        self.assertEqual(
+            self.counters(Team, self.team.id)["templatesCount"], 1)
+
+    def test_lists_read_the_counters(self):
+        """ Asserts that the counts of the lists are read from the
+            counters, and counted for vertices without them
+        """
+        Template.update({"topicsCount": 5}, vertex_id=self.template.id)
+        CoreVertex.update({"childrenCount": 3}, vertex_id=self.child.id)
+        self.assertEqual(Template.get_templates_with_details(
+            self.team.id)[0]["topicsCount"], 5)
+        tree = CoreVertexOwnership.get_children_tree(self.team.id, None)
+        self.assertEqual(tree[0].children[0].children, [])
+
+        # A template written before the counters existed, inherited from
+        # outside of the models
+        template = Template.create(name="Legacy", canHaveChildren=False)
+        TeamOwnsTemplate.create(team=self.team.id, template=template.id)
+        node = CoreVertex.create(title="Legacy", templateData="{}")
+        client.submit(
+            f"g.V().has('id', '{node.id}').addE('{CoreVertexInheritsFromTemplate.LABEL}')"
+            f".to(g.V().has('id', '{template.id}'))").all().result()
+        topics = {i["id"]: i["topicsCount"] for i in
+                  Template.get_templates_with_details(self.team.id)}
+        self.assertEqual(topics, {self.template.id: 5, template.id: 1})
+
+    def test_counters_are_reconciled(self):
+        """ Asserts that the counters that drifted are corrected """
+        Team.update({"templatesCount": 7}, vertex_id=self.team.id)
+        CoreVertex.update({"childrenCount": 0}, vertex_id=self.parent.id)
+
+        self.assertEqual(reconcile_counters([self.team.id]), 2)
+        self.assertEqual(
+            self.counters(Team, self.team.id)["templatesCount"], 1)
+        self.assertEqual(
+            self.counters(CoreVertex, self.parent.id)["childrenCount"], 1)
+        self.assertEqual(reconcile_counters(), 0)
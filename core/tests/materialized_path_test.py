@@ -0,0 +1,182 @@
+from utils.flask_test_case import FlaskTestCase
+from flask_jwt_extended import create_access_token
+from auth.models import *
+from core.models import *
+from db.engine import client
+from db.identity import clear_identity_map
+import json
+
+
+class MaterializedPathTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) CoreVertices carry the path to their root team once they're
+            given a parent
+        2) Moving a node updates the path of it's whole subtree
+        3) The root/ancestor lookups are read through the path
+        4) The paths can be rebuilt for vertices written without them
+        5) Moving a node under one of it's children moves it's direct
+            children to it's old parent, and leaves the tree unchanged if
+            they can't be moved
+    """
+    def setUp(self):
+        """ A team -> parent -> child -> grandchild tree """
+        self.team = Team.create(name="Team")
+        self.template = Template.create(
+            name="Template", canHaveChildren=True,
+            pillForegroundColor="#000", pillBackgroundColor="#fff")
+        TeamOwnsTemplate.create(team=self.team.id, template=self.template.id)
+        self.parent = self.create_node("Parent", self.team)
+        self.child = self.create_node("Child", self.parent)
+        self.grandchild = self.create_node("Grandchild", self.child)
+        self.user = User.create(**self.test_user_details)
+        UserAssignedToCoreVertex.create(
+            team=self.team.id, user=self.user.id, role="team_admin")
+
+    def create_node(self, title, parent):
+        node = CoreVertex.create(title=title, templateData="{}")
+        CoreVertexOwnership.create(
+            outv_id=parent.id, inv_id=node.id, outv_label=parent.LABEL,
+            inv_label=CoreVertex.LABEL)
+        CoreVertexInheritsFromTemplate.create(
+            coreVertex=node.id, template=self.template.id)
+        return node
+
+    def ancestry(self, node):
+        return CoreVertex.filter(id=node.id)[0].get_ancestry()
+
+    def test_path_is_materialized(self):
+        """ Asserts that every node has it's team and ancestors """
+        self.assertEqual(self.ancestry(self.parent), (self.team.id, []))
+        self.assertEqual(self.ancestry(self.grandchild),
+                         (self.team.id, [self.parent.id, self.child.id]))
+
+        # Created through the endpoint, along with the node itself
+        token = create_access_token(self.user)
+        r = self.client.post(
+            f"/coreVertex/{self.child.id}/templates/{self.template.id}/nodes",
+            data=json.dumps({"title": "New", "templateData": "{}",
+                             "content": ""}),
+            headers=self.generate_headers(token))
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(
+            CoreVertex.filter(id=r.json["id"])[0].get_ancestry(),
+            (self.team.id, [self.parent.id, self.child.id]))
+
+    def test_moving_a_node_updates_it_subtree(self):
+        """ Asserts that moving a node through the change parent endpoint
+            (and removing it's parent) updates the paths of it's subtree
+        """
+        other = self.create_node("Other", self.team)
+        token = create_access_token(self.user)
+        r = self.client.put(
+            f"/coreVertex/{self.child.id}/change_parent",
+            data=json.dumps({"newParent": other.id}),
+            headers=self.generate_headers(token))
+        self.assertEqual(r.status_code, 200)
+
+        self.assertEqual(self.ancestry(self.child),
+                         (self.team.id, [other.id]))
+        self.assertEqual(self.ancestry(self.grandchild),
+                         (self.team.id, [other.id, self.child.id]))
+
+        # Vertices that aren't under a team don't have a path
+        CoreVertexOwnership.filter(
+            outv_label=CoreVertex.LABEL, inv_label=CoreVertex.LABEL,
+            outv_id=other.id, inv_id=self.child.id)[0].delete()
+        self.assertIsNone(self.ancestry(self.grandchild))
+        self.assertEqual(
+            self.grandchild.get_user_permissions(self.user.id),
+            {"direct_role": None, "indirect_roles": []})
+
+    def move(self, node, new_parent):
+        return self.client.put(
+            f"/coreVertex/{node.id}/change_parent",
+            data=json.dumps({"newParent": new_parent.id}),
+            headers=self.generate_headers(create_access_token(self.user)))
+
+    def test_moving_a_node_under_it_child(self):
+        """ Asserts that the moved node's children are moved to it's old
+            parent, or put back under the node if any of them failed
+        """
+        sibling = self.create_node("Sibling", self.child)
+        # A second parent (i.e. written outside of the models) makes the
+        # grandchild fail the single parent validation
+        other = self.create_node("Other", self.team)
+        client.submit(
+            f"g.V().has('id', '{other.id}')"
+            f".addE('{CoreVertexOwnership.LABEL}')"
+            f".to(g.V().has('id', '{self.grandchild.id}'))").all().result()
+        r = self.move(self.child, self.grandchild)
+        self.assertEqual(r.status_code, 500)
+        self.assertIn(self.grandchild.id, r.json["errors"])
+        clear_identity_map()
+        self.assertEqual(self.ancestry(self.child),
+                         (self.team.id, [self.parent.id]))
+        self.assertEqual(self.ancestry(sibling),
+                         (self.team.id, [self.parent.id, self.child.id]))
+
+        r = self.move(self.child, sibling)
+        self.assertEqual(r.status_code, 200)
+        clear_identity_map()
+        self.assertEqual(self.ancestry(sibling),
+                         (self.team.id, [self.parent.id]))
+        self.assertEqual(self.ancestry(self.child),
+                         (self.team.id, [self.parent.id, sibling.id]))
+
+    def test_lookups_are_read_through_the_path(self):
+        """ Asserts that the root/ancestor lookups match the tree """
+        grandchild = CoreVertex.filter(id=self.grandchild.id)[0]
+        self.assertEqual(grandchild.get_user_permissions(self.user.id),
+                         {"direct_role": None,
+                          "indirect_roles": ["team_admin"]})
+        self.assertEqual(TeamOwnsTemplate.get_template(
+            "coreVertex", grandchild.id, self.template.id).id,
+            self.template.id)
+        self.assertEqual(CoreVertex.get_team_id(grandchild.id), self.team.id)
+
+        details = CoreVertex.get_core_vertex_with_details(
+            grandchild.id, self.user.id)
+        self.assertEqual([i.id for i in details.path],
+                         [self.team.id, self.parent.id, self.child.id])
+
+    def test_details_are_read_through_one_traversal(self):
+        """ Asserts that the node details are read through a single query,
+            and that missing nodes return None
+        """
+        def queries():
+            callers = client.metrics.snapshot("caller")
+            return {name: callers.get(f"CoreVertex.{name}", {}).get("count")
+                    for name in ["filter", "get_core_vertex_with_details"]}
+
+        grandchild = CoreVertex.filter(id=self.grandchild.id)[0]
+        before = queries()
+        details = CoreVertex.get_core_vertex_with_details(
+            grandchild.id, self.user.id, vertex=grandchild)
+        self.assertEqual([i.id for i in details.path],
+                         [self.team.id, self.parent.id, self.child.id])
+        self.assertEqual(details.template.id, self.template.id)
+        after = queries()
+        self.assertEqual(after["filter"], before["filter"])
+        self.assertEqual(after["get_core_vertex_with_details"],
+                         (before["get_core_vertex_with_details"] or 0) + 1)
+
+        self.assertIsNone(CoreVertex.get_core_vertex_with_details(
+            "missing", self.user.id))
+
+    def test_paths_are_rebuilt(self):
+        """ Asserts that the paths of vertices written without them are
+            materialized by `rebuild_ancestry`
+        """
+        client.submit(
+            "g.V().hasLabel('coreVertex')"
+            ".property('teamId', '').property('ancestors', '')"
+        ).all().result()
+        clear_identity_map()
+        self.assertIsNone(self.ancestry(self.grandchild))
+        self.assertEqual(CoreVertex.get_core_vertex_with_details(
+            self.grandchild.id, self.user.id).template.id, self.template.id)
+
+        self.assertEqual(CoreVertex.rebuild_ancestry(), 3)
+        self.assertEqual(self.ancestry(self.grandchild),
+                         (self.team.id, [self.parent.id, self.child.id]))
+        self.assertEqual(CoreVertex.rebuild_ancestry([self.team.id]), 0)
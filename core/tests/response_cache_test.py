@@ -0,0 +1,167 @@
+from utils.flask_test_case import FlaskTestCase
+from flask_jwt_extended import create_access_token
+from auth.models import *
+from core.models import *
+from db.engine import notify_write
+import datetime
+from utils.response_cache import (
+    ResponseCache, response_cache, response_ids)
+from settings import RESPONSE_CACHE_SETTINGS
+from flask import Flask
+
+
+class ResponseCacheTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) Responses are cached per endpoint, url arguments and user
+        2) Writes to any of the vertices in the url or the response
+            invalidate the cached response
+        3) Writes to unknown vertices invalidate every cached response
+        4) Responses are invalidated by writes to the vertices they were
+            tagged with by the view (i.e. the inbox's favorited nodes)
+        5) The in-process cache is disabled when the app is served by
+            more than one process
+    """
+    def setUp(self):
+        """ A team -> parent -> child tree, with a team_admin user """
+        self.team = Team.create(name="Team")
+        self.template = Template.create(
+            name="Template", canHaveChildren=True,
+            pillForegroundColor="#000", pillBackgroundColor="#fff")
+        TeamOwnsTemplate.create(team=self.team.id, template=self.template.id)
+        self.parent = CoreVertex.create(title="Parent", templateData="{}")
+        self.child = CoreVertex.create(title="Child", templateData="{}")
+        CoreVertexOwnership.create(
+            team=self.team.id, coreVertex=self.parent.id)
+        CoreVertexInheritsFromTemplate.create(
+            coreVertex=self.parent.id, template=self.template.id)
+        CoreVertexOwnership.create(
+            outv_id=self.parent.id, inv_id=self.child.id,
+            outv_label=CoreVertex.LABEL, inv_label=CoreVertex.LABEL)
+        CoreVertexInheritsFromTemplate.create(
+            coreVertex=self.child.id, template=self.template.id)
+        self.user = User.create(**self.test_user_details)
+        UserAssignedToCoreVertex.create(
+            team=self.team.id, user=self.user.id, role="team_admin")
+        self.headers = self.generate_headers(
+            create_access_token(identity=self.user))
+        self.tree_url = f"/team/{self.team.id}/tree_view"
+
+    def get(self, url, headers=None):
+        response = self.client.get(url, headers=headers or self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json
+
+    def metrics(self, endpoint):
+        return response_cache.stats()["endpoints"].get(
+            endpoint, {"hits": 0, "misses": 0})
+
+    def test_response_ids(self):
+        """ Asserts that every id in the response is collected """
+        self.assertEqual(response_ids(
+            [{"id": "a", "children": [{"id": "b", "name": "id"}]},
+             {"template": {"id": "c"}, "id": None}]), {"a", "b", "c"})
+
+    def test_responses_are_cached(self):
+        """ Asserts that repeated reads are served from the cache, and that
+            each user gets their own responses
+        """
+        tree = self.get(self.tree_url)
+        self.assertEqual(self.get(self.tree_url), tree)
+        self.assertEqual(self.metrics("core.nodes-tree-list-view"),
+                         {"hits": 1, "misses": 1})
+
+        other = User.create(
+            username="Other", email="other@g.com", password="Test",
+            fullName="Other")
+        UserAssignedToCoreVertex.create(
+            team=self.team.id, user=other.id, role="team_member")
+        self.assertEqual(self.get(self.tree_url, self.generate_headers(
+            create_access_token(identity=other))), tree)
+        self.assertEqual(self.metrics("core.nodes-tree-list-view")["misses"],
+                         2)
+
+    def test_writes_invalidate_responses(self):
+        """ Asserts that the cached responses reflect the writes to the
+            vertices they depend on
+        """
+        node_url = f"/coreVertex/{self.child.id}"
+        templates_url = f"/team/{self.team.id}/templates"
+        self.get(self.tree_url)
+        self.get(node_url)
+        self.get(templates_url)
+
+        # A vertex in the response
+        CoreVertex.update({"title": "Renamed"}, vertex_id=self.parent.id)
+        self.assertEqual(self.get(self.tree_url)[0]["title"], "Renamed")
+        self.assertEqual(
+            [i["displayName"] for i in self.get(node_url)["path"]],
+            ["Team", "Renamed"])
+
+        # An edge from a vertex in the response (the child now has children)
+        self.assertNotIn(
+            "children", self.get(self.tree_url)[0]["children"][0])
+        grandchild = CoreVertex.create(title="Grandchild", templateData="{}")
+        CoreVertexOwnership.create(
+            outv_id=self.child.id, inv_id=grandchild.id,
+            outv_label=CoreVertex.LABEL, inv_label=CoreVertex.LABEL)
+        self.assertIn("children", self.get(self.tree_url)[0]["children"][0])
+
+        # The vertex in the url
+        template = Template.create(name="Other", canHaveChildren=False)
+        TeamOwnsTemplate.create(team=self.team.id, template=template.id)
+        self.assertEqual(len(self.get(templates_url)), 2)
+
+        # Unchanged responses are still cached
+        self.get(self.tree_url)
+        hits = self.metrics("core.nodes-tree-list-view")["hits"]
+        self.get(self.tree_url)
+        self.assertEqual(self.metrics("core.nodes-tree-list-view")["hits"],
+                         hits + 1)
+
+    def test_unknown_writes_invalidate_everything(self):
+        """ Asserts that a write with an unknown vertex invalidates every
+            cached response
+        """
+        self.get(self.tree_url)
+        notify_write([None])
+        self.get(self.tree_url)
+        self.assertEqual(self.metrics("core.nodes-tree-list-view"),
+                         {"hits": 0, "misses": 2})
+
+    def test_first_message_on_a_favorite_invalidates_the_inbox(self):
+        """ Asserts that the cached inbox includes a favorited node once
+            another user posts it's first message
+        """
+        UserFavoriteNode.create(outv_id=self.user.id, inv_id=self.child.id,
+                                inv_label=CoreVertex.LABEL)
+        self.assertEqual(self.get("/inbox_nodes"), [])
+        self.assertEqual(self.get("/inbox_nodes"), [])
+
+        author = User.create(
+            username="Author", email="author@g.com", password="Test",
+            fullName="Author")
+        message = Message.create(
+            text="First", sent_at=datetime.datetime.now().isoformat())
+        UserSentMessage.create(user=author.id, message=message.id)
+        NodeHasMessage.create(
+            outv_id=self.child.id, inv_id=message.id,
+            outv_label=CoreVertex.LABEL, inv_label=Message.LABEL)
+
+        self.assertEqual([i["id"] for i in self.get("/inbox_nodes")],
+                         [self.child.id])
+        self.assertEqual(self.metrics("core.list-inbox-nodes"),
+                         {"hits": 1, "misses": 2})
+
+    def test_simple_cache_is_disabled_for_multiple_processes(self):
+        """ Asserts that the "simple" cache is disabled (with a warning) if
+            more than one process serves the app
+        """
+        config = dict(RESPONSE_CACHE_SETTINGS, CACHE_TYPE="simple")
+        cache = ResponseCache()
+        cache.init_app(Flask(__name__), config, processes=1)
+        self.assertTrue(cache.stats()["enabled"])
+
+        cache = ResponseCache()
+        with self.assertLogs("utils.response_cache", "WARNING"):
+            cache.init_app(Flask(__name__), config, processes=4)
+        self.assertFalse(cache.stats()["enabled"])
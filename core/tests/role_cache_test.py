@@ -0,0 +1,176 @@
+from utils.flask_test_case import FlaskTestCase
+from auth.models import *
+from core.models import *
+from core.roles import RoleCache, role_cache
+from db.cache import TTLCache
+from db.engine import client, UnitOfWork
+from flask_caching.backends import SimpleCache
+
+
+class RoleCacheTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) The cache is bounded by it's size and TTL
+        2) Resolved roles are cached between requests
+        3) Assigning, updating and removing a role drops the affected
+            entries
+        4) Moving a node drops the entries of it's whole subtree
+        5) Invalidations reach the other processes through the shared
+            backend, and the cache is disabled for multiple processes
+            without one
+    """
+    def setUp(self):
+        """ A team -> parent -> child tree, with a team_admin user """
+        self.team = Team.create(name="Team")
+        template = Template.create(name="Template", canHaveChildren=True)
+        TeamOwnsTemplate.create(team=self.team.id, template=template.id)
+        self.parent = CoreVertex.create(title="Parent", templateData="{}")
+        self.child = CoreVertex.create(title="Child", templateData="{}")
+        CoreVertexOwnership.create(
+            team=self.team.id, coreVertex=self.parent.id)
+        CoreVertexInheritsFromTemplate.create(
+            coreVertex=self.parent.id, template=template.id)
+        CoreVertexOwnership.create(
+            outv_id=self.parent.id, inv_id=self.child.id,
+            outv_label=CoreVertex.LABEL, inv_label=CoreVertex.LABEL)
+        self.user = User.create(**self.test_user_details)
+        UserAssignedToCoreVertex.create(
+            team=self.team.id, user=self.user.id, role="team_admin")
+
+    def test_cache_is_bounded(self):
+        """ Asserts that the least recently used and expired entries are
+            dropped
+        """
+        now = [0]
+        cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+
+        now[0] = 10
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["size"], 1)
+
+        disabled = RoleCache(maxsize=0)
+        disabled.set("v", "u", {"direct_role": None,
+                                "indirect_roles": []}, ["v"])
+        self.assertIsNone(disabled.get("v", "u"))
+
+    def test_roles_are_cached(self):
+        """ Asserts that the roles are only queried once """
+        expected = {"direct_role": None, "indirect_roles": ["team_admin"]}
+        self.assertEqual(
+            self.child.get_user_permissions(self.user.id), expected)
+        self.assertEqual(
+            self.team.get_user_permissions(self.user.id), "team_admin")
+
+        queries = client.stats()["queries"]
+        roles = self.child.get_user_permissions(self.user.id)
+        self.assertEqual(roles, expected)
+        self.assertEqual(
+            self.team.get_user_permissions(self.user.id), "team_admin")
+        self.assertEqual(client.stats()["queries"], queries)
+
+        # Returned roles are copies
+        roles["indirect_roles"].append("cv_admin")
+        self.assertEqual(
+            self.child.get_user_permissions(self.user.id), expected)
+
+    def test_assignment_changes_invalidate_roles(self):
+        """ Asserts that created, updated and deleted role edges are
+            reflected by the cached roles
+        """
+        other = User.create(username="Other", email="other@g.com",
+                            password="Pass", fullName="Other")
+        self.child.get_user_permissions(self.user.id)
+        self.child.get_user_permissions(other.id)
+        self.parent.get_user_permissions(self.user.id)
+
+        # Only the assigned user's entries under the node are dropped
+        edge = UserAssignedToCoreVertex.create(
+            outv_id=self.user.id, inv_id=self.child.id,
+            inv_label=CoreVertex.LABEL, role="cv_member")
+        self.assertIsNotNone(role_cache.get(self.child.id, other.id))
+        self.assertIsNotNone(role_cache.get(self.parent.id, self.user.id))
+        self.assertEqual(
+            self.child.get_user_permissions(self.user.id)["direct_role"],
+            "cv_member")
+
+        # Updated through the assignees endpoint's query
+        client.submit(
+            f"g.V().has('id', '{self.user.id}').outE('assignedTo')"
+            f".where(inV().has('id', '{self.child.id}'))"
+            ".property('role', 'cv_admin')").all().result()
+        role_cache.invalidate_assignments([(self.user.id, self.child.id)])
+        self.assertEqual(
+            self.child.get_user_permissions(self.user.id)["direct_role"],
+            "cv_admin")
+
+        UserAssignedToCoreVertex.filter(
+            outv_label="user", inv_label=CoreVertex.LABEL,
+            outv_id=self.user.id, inv_id=self.child.id)[0].delete()
+        self.assertIsNone(
+            self.child.get_user_permissions(self.user.id)["direct_role"])
+
+        # Assignments through a unit of work
+        with UnitOfWork() as uow:
+            uow.create_edge(UserAssignedToCoreVertex, other.id,
+                            self.team.id, role="team_member")
+        self.assertEqual(
+            self.child.get_user_permissions(other.id)["indirect_roles"],
+            ["team_member"])
+
+    def test_moving_a_node_invalidates_it_subtree(self):
+        """ Asserts that the roles of a moved node's subtree are resolved
+            through the new path
+        """
+        other_team = Team.create(name="Other Team")
+        self.child.get_user_permissions(self.user.id)
+        self.parent.get_user_permissions(self.user.id)
+
+        edge = CoreVertexOwnership.filter(
+            outv_label=Team.LABEL, inv_label=CoreVertex.LABEL,
+            outv_id=self.team.id, inv_id=self.parent.id)[0]
+        edge.delete()
+        self.assertIsNone(role_cache.get(self.child.id, self.user.id))
+        CoreVertexOwnership.create(
+            team=other_team.id, coreVertex=self.parent.id)
+        self.assertEqual(
+            self.child.get_user_permissions(self.user.id)["indirect_roles"],
+            [])
+
+    def test_invalidations_are_shared_by_the_processes(self):
+        """ Asserts that the entries of a process are dropped by the
+            invalidations of another process sharing the backend, and that
+            roles invalidated while they were resolved aren't cached
+        """
+        shared = SimpleCache()
+        first, second = RoleCache(), RoleCache()
+        first.init_app(shared, processes=2)
+        second.init_app(shared, processes=2)
+        roles = {"direct_role": "cv_admin", "indirect_roles": []}
+        path = [self.team.id, self.parent.id, self.child.id]
+
+        first.set(self.child.id, self.user.id, roles, path,
+                  first.version(self.child.id, self.user.id))
+        self.assertEqual(first.get(self.child.id, self.user.id), roles)
+        second.invalidate_assignments([(self.user.id, self.parent.id)])
+        self.assertIsNone(first.get(self.child.id, self.user.id))
+
+        first.set(self.child.id, self.user.id, roles, path,
+                  first.version(self.child.id, self.user.id))
+        second.invalidate_paths([self.parent.id])
+        self.assertIsNone(first.get(self.child.id, self.user.id))
+
+        version = first.version(self.child.id, self.user.id)
+        second.invalidate_assignments([(self.user.id, self.child.id)])
+        first.set(self.child.id, self.user.id, roles, path, version)
+        self.assertIsNone(first.get(self.child.id, self.user.id))
+
+        disabled = RoleCache()
+        with self.assertLogs("core.roles", "WARNING"):
+            disabled.init_app(None, processes=2)
+        disabled.set(self.child.id, self.user.id, roles, path)
+        self.assertIsNone(disabled.get(self.child.id, self.user.id))
@@ -0,0 +1,127 @@
+from utils.flask_test_case import FlaskTestCase
+from flask_jwt_extended import create_access_token
+from auth.models import *
+from core.models import *
+from core.templates import TemplateCache, template_cache
+from db.engine import client
+
+
+class TemplateCacheTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) A team's templates and their (index ordered) properties are
+            only queried once
+        2) Template and template property writes invalidate the team's
+            cached templates
+        3) Templates loaded while the cache was invalidated aren't stored
+    """
+    def setUp(self):
+        """ A team with a template that has two properties """
+        self.team = Team.create(name="Team")
+        self.template = Template.create(
+            name="Template", canHaveChildren=True,
+            pillForegroundColor="#000", pillBackgroundColor="#fff")
+        TeamOwnsTemplate.create(team=self.team.id, template=self.template.id)
+        self.properties = []
+        for index, name in [(1, "Second"), (0, "First")]:
+            prop = TemplateProperty.create(
+                name=name, fieldType="string", propertyOptions="{}",
+                index=index)
+            TemplateHasProperty.create(
+                template=self.template.id, templateProperty=prop.id)
+            self.properties.append(prop)
+
+    def property_names(self):
+        template = Template.get_template_with_properties(
+            self.template.id, self.team.id)
+        return [i.name for i in template.properties]
+
+    def test_templates_are_cached(self):
+        """ Asserts that the templates are read without any queries once
+            they're cached
+        """
+        self.assertEqual(self.property_names(), ["First", "Second"])
+
+        queries = client.stats()["queries"]
+        self.assertEqual(self.property_names(), ["First", "Second"])
+        self.assertEqual(TeamOwnsTemplate.get_template(
+            "team", self.team.id, self.template.id).name, "Template")
+        self.assertIsNone(TeamOwnsTemplate.get_template(
+            "team", self.team.id, "missing"))
+        self.assertEqual(
+            TemplateHasProperty.get_templates_properties(
+                [self.template.id])[self.template.id][0].name, "First")
+        self.assertEqual(client.stats()["queries"], queries)
+
+        # Every read gets it's own instances
+        Template.get_team_templates(self.team.id)[
+            self.template.id].properties = None
+        self.assertEqual(self.property_names(), ["First", "Second"])
+
+    def test_writes_invalidate_the_templates(self):
+        """ Asserts that template/property writes are reflected by the
+            cached templates
+        """
+        self.property_names()
+        Template.update({"name": "Renamed"}, vertex_id=self.template.id)
+        self.assertEqual(Template.get_template_with_properties(
+            self.template.id, self.team.id).name, "Renamed")
+
+        TemplateProperty.update_properties_index(
+            [self.properties[0].id, self.properties[1].id])
+        self.assertEqual(self.property_names(), ["Second", "First"])
+
+        TemplateProperty.update(
+            {"name": "Renamed"}, vertex_id=self.properties[0].id)
+        self.assertEqual(self.property_names(), ["Renamed", "First"])
+
+        prop = TemplateProperty.create(
+            name="Third", fieldType="string", propertyOptions="{}", index=2)
+        TemplateHasProperty.create(
+            template=self.template.id, templateProperty=prop.id)
+        self.assertEqual(self.property_names(), ["Renamed", "First", "Third"])
+
+        prop.delete()
+        self.assertEqual(self.property_names(), ["Renamed", "First"])
+
+        template = Template.create(name="Other", canHaveChildren=False)
+        TeamOwnsTemplate.create(team=self.team.id, template=template.id)
+        self.assertEqual(len(Template.get_team_templates(self.team.id)), 2)
+
+        Template.filter(id=template.id)[0].delete()
+        self.assertEqual(list(Template.get_team_templates(self.team.id)),
+                         [self.template.id])
+
+    def test_racing_loads_are_not_stored(self):
+        """ Asserts that templates loaded while the cache was invalidated
+            aren't cached
+        """
+        cache = TemplateCache()
+
+        def load(team_id):
+            cache.invalidate_teams([team_id])
+            return {"templates": [], "properties": {}}
+        cache.get("team", load)
+        self.assertIsNone(cache.cache.get("team"))
+
+        cache.get("team", lambda team_id: {
+            "templates": [{"id": "t"}], "properties": {"t": []}})
+        self.assertEqual(cache.team_of("t"), "team")
+        cache.invalidate_templates(["t"])
+        self.assertIsNone(cache.cache.get("team"))
+
+    def test_template_list_is_read_from_the_cache(self):
+        """ Asserts that the templates list endpoint returns the cached
+            templates along with their topics count
+        """
+        user = User.create(**self.test_user_details)
+        UserAssignedToCoreVertex.create(
+            team=self.team.id, user=user.id, role="team_admin")
+        token = create_access_token(user)
+
+        r = self.client.get(f"/team/{self.team.id}/templates",
+                            headers=self.generate_headers(token))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json[0]["name"], "Template")
+        self.assertEqual(r.json[0]["topicsCount"], 0)
+        self.assertEqual([i["name"] for i in r.json[0]["properties"]],
+                         ["First", "Second"])
@@ -14,8 +14,11 @@ from flask_jwt_extended import (
 )
 from utils.general_utils import *
 import json
-from flask_caching import Cache
-from db.engine import client
+from db.engine import (
+    UnitOfWork, g, __, submit_traversal, vertex_key, notify_write
+)
+from core.roles import role_cache
+from utils.response_cache import response_cache
 from utils.s3_engine import S3Engine
 
 
@@ -47,12 +50,13 @@ class ListCreateTeamsView(MethodView):
         if data.errors:
             return jsonify_response(data.errors, 400)
 
-        team = Team.create(
-            name=data.data["name"]
-        )
-        account_edge = auth.AccountOwnsTeam.create(account=account.id, team=team.id)
-        user_edge = auth.UserAssignedToCoreVertex.create(
-            user=user.id, team=team.id, role="team_admin")
+        with UnitOfWork() as uow:
+            team = uow.create(Team, name=data.data["name"],
+                              **initial_counters(Team))
+            uow.create_edge(auth.AccountOwnsTeam, account.id, team)
+            uow.create_edge(auth.UserAssignedToCoreVertex, user.id, team,
+                            role="team_admin")
+        team = team.instance
 
         # Note: We can just return the logged in user as the only member
         # since there will only be one member upon team creation
@@ -88,12 +92,9 @@ class ListCreateCoreVertexView(MethodView):
             return jsonify_response({"error": "Vertex not found"}, 404)
 
         core_vertices = CoreVertexInheritsFromTemplate \
-            .get_all_template_inheritors(template_id)
-
-        schema = CoreVertexListSchema(many=True)
-        response = json.loads(schema.dumps(core_vertices).data)
+            .stream_template_inheritors(template_id)
 
-        return jsonify_response(response, 200)
+        return stream_json_response(core_vertices, CoreVertexListSchema())
 
     @jwt_required
     @permissions.core_vertex_permission_decorator_factory(
@@ -121,14 +122,21 @@ class ListCreateCoreVertexView(MethodView):
             return jsonify_response(
                 {"error": "Template doesn't exist"}, 404)
 
-        core_vertex = CoreVertex.create(
-            title=data["title"], templateData=data["templateData"],
-            content=data["content"])
-        child_edge = CoreVertexOwnership.create(
-            outv_id=vertex_id, inv_id=core_vertex.id,
-            inv_label="coreVertex", outv_label=vertex_type)
-        template_edge = CoreVertexInheritsFromTemplate.create(
-            coreVertex=core_vertex.id, template=template.id)
+        with UnitOfWork() as uow:
+            # The new vertex's materialized path is written along with it
+            core_vertex = uow.create(
+                CoreVertex, title=data["title"],
+                templateData=data["templateData"], content=data["content"],
+                **CoreVertex.child_ancestry(vertex),
+                **initial_counters(CoreVertex))
+            uow.create_edge(CoreVertexOwnership, vertex_id, core_vertex,
+                            inv_label="coreVertex", outv_label=vertex_type)
+            # The template has been confirmed to be owned by the root team
+            # above (which the new CoreVertex can't be looked up through
+            # before it's written)
+            uow.create_edge(CoreVertexInheritsFromTemplate, core_vertex,
+                            template.id, validate=False)
+        core_vertex = core_vertex.instance
 
         response = {
             "id": core_vertex.id,
@@ -168,13 +176,14 @@ class RetrieveUpdateDeleteCoreVertexView(RetrieveUpdateAPIView, DeleteVertexMixi
         overwrite_vertex_type="coreVertex",
         direct_allowed_roles=[],  # TODO: Add roles here
         indirect_allowed_roles=["team_admin", "team_lead"])
+    @response_cache.cached
     def get(self, vertex=None, vertex_id=None, **kwargs):
         """ Returns the object identified by the given vertex id
             - Overridden to add the decorators, and reuse the Vertex
                 instance injected through the permission
         """
-        self.get_object = lambda: vertex.get_core_vertex_with_details(
-            vertex.id, get_jwt_identity())
+        self.get_object = lambda: CoreVertex.get_core_vertex_with_details(
+            vertex.id, get_jwt_identity(), vertex=vertex)
         return super().get()
 
     @jwt_required
@@ -228,46 +237,71 @@ class ChangeCoreVertexParentView(MethodView):
             return jsonify_response({
                 "status": "New parent not specified"
             }, 400)
+        # The new parent can be a team or a coreVertex
+        new_parent_keys = [vertex_key(label, data["newParent"])
+                           for label in (CoreVertex.LABEL, Team.LABEL)]
         # Moving all of the direct children to the existing parent IF
         # the node has been made a child of one of it's older children
-        existing_data_query = f"g.V().has('id', '{vertex.id}')" + \
-            f".project('existingParent', 'newParent', 'directChildren')" + \
-            f".by(inE('{CoreVertexOwnership.LABEL}').outV())" + \
-            f".by(until(has('id', '{data['newParent']}').or().loops().is(30))" + \
-            f".repeat(out('{CoreVertexOwnership.LABEL}')).fold())" + \
-            f".by(outE('{CoreVertexOwnership.LABEL}').inV().fold())"
-        existing_data = client.submit(existing_data_query).all().result()[0]
+        existing_data_query = g.V(vertex_key(CoreVertex.LABEL, vertex.id)) \
+            .project("existingParent", "newParent", "directChildren") \
+            .by(__.inE(CoreVertexOwnership.LABEL).outV()) \
+            .by(__.until(__.or_(__.has("id", data["newParent"]),
+                                __.loops().is_(30)))
+                .repeat(__.out(CoreVertexOwnership.LABEL)).fold()) \
+            .by(__.outE(CoreVertexOwnership.LABEL).inV().fold())
+        existing_data = submit_traversal(
+            existing_data_query).all().result()[0]
         old_parent_id = existing_data["existingParent"]["id"]
         existing_direct_children = [CoreVertex.vertex_to_instance(i) for
                                     i in existing_data["directChildren"]]
         new_parent_is_child = len(existing_data["newParent"]) >= 1
 
-        print("Existing Data", existing_data)
-
         # Updating first level children to have an edge to the old parent
         # if the new parent is a sub-child of the moved node
         if new_parent_is_child:
-            print("NEW PARENT IS CHILD")
-            children_ids = ",".join(
-                [f"'{i.id}'" for i in existing_direct_children])
-            children_relocate_query = f"g.V().has('id', within({children_ids}))" + \
-                f".inE('{CoreVertexOwnership.LABEL}').drop()"
-            client.submit(children_relocate_query).all().result()
-
-            children_relocate_query = f"g.V().has('id', '{old_parent_id}')"
-            for index, child in enumerate(existing_direct_children):
-                children_relocate_query += f".addE('{CoreVertexOwnership.LABEL}')" + \
-                    f".to(g.V().has('id', '{child.id}'))"
-                children_relocate_query += ".outV()"
-            client.submit(children_relocate_query).all().result()
+            # The direct children's parent edges are the node's own edges,
+            # so they're dropped without listing the children's ids
+            children_relocate_query = g.V(
+                vertex_key(CoreVertex.LABEL, vertex.id)) \
+                .outE(CoreVertexOwnership.LABEL).drop()
+            submit_traversal(children_relocate_query).all().result()
+
+            edges, errors = CoreVertexOwnership.bulk_create(
+                [(old_parent_id, child.id)
+                 for child in existing_direct_children],
+                outv_label=existing_data["existingParent"]["label"],
+                inv_label=CoreVertex.LABEL)
+            if errors:
+                # Putting all of the children back under the node instead of
+                # moving it, rather than leaving any of them without a parent
+                for edge in edges:
+                    if edge is not None:
+                        edge.delete()
+                CoreVertexOwnership.bulk_create(
+                    [(vertex.id, child.id)
+                     for child in existing_direct_children],
+                    outv_label=CoreVertex.LABEL, inv_label=CoreVertex.LABEL)
+                return jsonify_response({
+                    "error": "The node's children could not be moved to "
+                             "it's existing parent",
+                    "errors": {existing_direct_children[index].id: str(e)
+                               for index, e in errors.items()}
+                }, 500)
 
         # Removing the existing parent edge, and adding the new edge
-        query = f"g.V().has('id', '{vertex.id}').as('node')" + \
-            f".inE('{CoreVertexOwnership.LABEL}').as('existingEdge')" + \
-            f".inV().addE('{CoreVertexOwnership.LABEL}')" + \
-            f".from(g.V().has('id', '{data['newParent']}'))" + \
-            f".select('existingEdge').drop()"
-        res = client.submit(query).all().result()
+        query = g.V(vertex_key(CoreVertex.LABEL, vertex.id)) \
+            .inE(CoreVertexOwnership.LABEL).as_("existingEdge") \
+            .inV().addE(CoreVertexOwnership.LABEL) \
+            .from_(g.V(*new_parent_keys)) \
+            .select("existingEdge").drop()
+        submit_traversal(query).all().result()
+        # The path of the node's whole subtree has changed
+        CoreVertex.update_ancestry([vertex.id])
+        role_cache.invalidate_paths([vertex.id])
+        refresh_counters([Team, CoreVertex],
+                         [vertex.id, old_parent_id, data["newParent"]],
+                         ["childrenCount"])
+        notify_write([vertex.id, old_parent_id, data["newParent"]])
 
         return jsonify_response({
             "status": "Success"
@@ -286,6 +320,7 @@ class ListCreateTemplatesView(MethodView):
     @permissions.core_vertex_permission_decorator_factory(
         overwrite_vertex_type="team",
         direct_allowed_roles=["team_member", "team_lead", "team_admin"])
+    @response_cache.cached
     def get(self, vertex=None, vertex_type="team", vertex_id=None):
         """ LIST Endpoint for a team's templates """
         if not vertex:
@@ -315,7 +350,8 @@ class ListCreateTemplatesView(MethodView):
         template = Template.create(
             name=data["name"], canHaveChildren=data["canHaveChildren"],
             pillBackgroundColor=data["pillBackgroundColor"],
-            pillForegroundColor=data["pillForegroundColor"])
+            pillForegroundColor=data["pillForegroundColor"],
+            **initial_counters(Template))
         template.properties = None  # This is the vertex's `properties` field being Nulled
         owns_edge = TeamOwnsTemplate.create(team=vertex.id,
                                             template=template.id)
@@ -525,6 +561,7 @@ class RetrieveUpdateDeleteTeamsView(RetrieveUpdateAPIView, DeleteVertexMixin):
     @permissions.core_vertex_permission_decorator_factory(
         overwrite_vertex_type="team",
         direct_allowed_roles=["team_member", "team_lead", "team_admin"])
+    @response_cache.cached
     def get(self, vertex=None, vertex_id=None, **kwargs):
         """ Returns the object identified by the given vertex id """
         return super().get()
@@ -608,6 +645,7 @@ class NodesTreeListView(MethodView):
     @permissions.core_vertex_permission_decorator_factory(
         direct_allowed_roles=["team_member", "team_admin", "team_lead"],  # TODO: Add CV roles here
         indirect_allowed_roles=["team_member", "team_admin", "team_lead"])
+    @response_cache.cached
     def get(self, vertex=None, vertex_type=None, vertex_id=None):
         """ Returns a nested tree-view for the given node's children """
         tree = CoreVertexOwnership.get_children_tree(
@@ -637,6 +675,7 @@ class ListCreateNodesAssignedUsersView(MethodView):
         indirect_allowed_roles=["team_member", "team_admin", "team_lead"],  # TODO: Add CV roles here
         direct_allowed_roles=["team_member", "team_admin", "team_lead",
                               "cv_member", "cv_admin", "cv_lead"])
+    @response_cache.cached
     def get(self, vertex=None, vertex_type=None, vertex_id=None):
         """ Returns all users with their roles currently assigned
             to the given core vertex
@@ -736,11 +775,13 @@ class UpdateDeleteNodesAssignedUsers(MethodView):
             }, 403)
 
         # Updating the role for the target user
-        query = f"g.V().has('{auth.User.LABEL}', 'id', '{target_user.id}')" + \
-            f".outE('{auth.UserAssignedToCoreVertex.LABEL}').as('e')" + \
-            f".inV().has('{vertex.LABEL}', 'id', '{vertex.id}')" + \
-            f".select('e').property('role', '{data['role']}')"
-        result = client.submit(query).all().result()
+        query = g.V(vertex_key(auth.User.LABEL, target_user.id)) \
+            .outE(auth.UserAssignedToCoreVertex.LABEL).as_("e") \
+            .inV().has(vertex.LABEL, "id", vertex.id) \
+            .select("e").property("role", data["role"])
+        result = submit_traversal(query).all().result()
+        role_cache.invalidate_assignments([(target_user.id, vertex.id)])
+        notify_write([target_user.id, vertex.id])
 
         return jsonify_response({
             "role": data['role']
@@ -962,6 +1003,7 @@ class ListCreateNodeMessagesView(MethodView):
         sent_at = dt.now().isoformat()
         message = Message.create(text=data["text"], sent_at=sent_at)
         author_edge = UserSentMessage.create(user=user_id, message=message.id)
+        message.author = user
         node_edge = NodeHasMessage.create(
             outv_label=vertex_type, inv_label="message",
             outv_id=vertex.id, inv_id=message.id)
@@ -999,12 +1041,16 @@ class InboxMessagesListView(MethodView):
         favorites
     """
     @jwt_required
+    @response_cache.cached
     def get(self):
         """ Returns a list of nodes + last message details for the nodes
             the user has in his favorites
         """
         user_id = get_jwt_identity()
-        nodes = UserFavoriteNode.get_inbox_nodes(user_id)
+        nodes, favorite_ids = UserFavoriteNode.get_inbox_nodes(user_id)
+        # The favorites without messages aren't in the response, but will
+        # be once a message is posted on them
+        response_cache.tag(favorite_ids)
 
         schema = InboxNodesSchema(many=True)
         response = json.loads(schema.dumps(nodes).data)
@@ -0,0 +1,187 @@
+""" Provides the interface shared by all of the graph backends that the
+    models can submit their queries to, and the loader used to select the
+    backend through the DATABASE_SETTINGS
+"""
+import threading
+import weakref
+import queue
+import os
+
+
+def iterate_batches(result_set, batch_size=None, poll_interval=0.05):
+    """ Yields the result batches of the gremlin ResultSet as they arrive
+        (without waiting for the whole response), split into lists of at
+        most `batch_size` results; the server's error (if any) is raised
+        once all of the received batches were yielded
+    """
+    while True:
+        try:
+            batch = result_set.stream.get(timeout=poll_interval)
+        except queue.Empty:
+            if result_set.done.done() and result_set.stream.empty():
+                break
+            continue
+
+        if not batch_size:
+            yield batch
+            continue
+        for start in range(0, len(batch), batch_size):
+            yield batch[start:start + batch_size]
+
+    error = result_set.done.exception()
+    if error is not None:
+        raise error
+
+
+class GraphBackend:
+    """ Base class for the backends behind `db.engine.client`.
+        A backend receives Gremlin scripts (with their bindings) and returns
+        a gremlin ResultSet, so that all of the callers can keep reading the
+        results through `.all().result()`, `.one()` and `.next()`
+    """
+    # The name used to select this backend through the settings
+    name = None
+
+    def submit(self, message, bindings=None):
+        """ Submits the message and returns a gremlin ResultSet """
+        raise NotImplementedError
+
+    def stream(self, message, bindings=None, batch_size=None):
+        """ Submits the message and yields the results in batches (lists) of
+            at most `batch_size` results as they arrive
+        """
+        yield from iterate_batches(
+            self.submit(message, bindings), batch_size)
+
+    def warmup(self, connections=None):
+        """ Opens `connections` connections (all of them by default) ahead
+            of the first queries; returns the number of open connections
+        """
+        return 0
+
+    def stats(self):
+        """ Returns a dictionary with stats about the backend """
+        return {}
+
+    def close(self):
+        """ Releases all of the resources held by the backend """
+        pass
+
+
+def load_backend(settings):
+    """ Returns the backend instance selected by the `backend` key of the
+        given DATABASE_SETTINGS
+            - `gremlin` (default): A pooled connection to a Gremlin server
+            - `memory`: An in-process graph (for development/tests)
+        The backend is wrapped with the throttling retries/limiter if the
+        `throttle_queries` setting is enabled, and with the query
+        instrumentation (recording each query once, including it's retries)
+        if the `instrument_queries` setting is enabled
+    """
+    backend = settings.get("backend", "gremlin")
+
+    if backend == "memory":
+        from db.memory import MemoryGraphBackend
+        instance = MemoryGraphBackend.from_settings(settings)
+    elif backend == "gremlin":
+        from db.connection import ConnectionManager
+        instance = ConnectionManager.from_settings(settings)
+    else:
+        raise ValueError(f"Unrecognized database backend `{backend}`")
+
+    # The in-memory graph doesn't have a request rate to be throttled by
+    if settings.get("throttle_queries", False) and backend != "memory":
+        from db.throttling import ThrottledBackend
+        instance = ThrottledBackend.from_settings(instance, settings)
+
+    if settings.get("instrument_queries", False):
+        from db.instrumentation import InstrumentedBackend
+        instance = InstrumentedBackend.from_settings(instance, settings)
+
+    return instance
+
+
+class LazyBackend(GraphBackend):
+    """ Creates the backend (through `factory`) upon it's first use in each
+        process, so that importing the models doesn't open any connections,
+        and forked processes (i.e. the workers of a pre-fork server) never
+        share the websockets opened by their parent.
+        The backend inherited from the parent process is discarded (without
+        being closed, as it's sockets are still the parent's) right after a
+        fork, or explicitly through `after_fork` (i.e. from the server's
+        post-fork hook); `warmup` creates the backend and opens it's
+        connections ahead of the first queries.
+        All other attributes are looked up on the created backend
+    """
+    def __init__(self, factory):
+        self.factory = factory
+        self._backend = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        if hasattr(os, "register_at_fork"):
+            reference = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: LazyBackend.forked(
+                reference))
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(lambda: load_backend(settings))
+
+    @staticmethod
+    def forked(reference):
+        backend = reference()
+        if backend is not None:
+            backend.after_fork()
+
+    @property
+    def initialized(self):
+        """ Whether the backend was created by the current process """
+        return self._backend is not None and self._pid == os.getpid()
+
+    @property
+    def backend(self):
+        """ Returns the current process' backend, creating it if needed """
+        if self.initialized:
+            return self._backend
+        with self._lock:
+            if not self.initialized:
+                self._backend = self.factory()
+                self._pid = os.getpid()
+            return self._backend
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def __getattr__(self, attribute):
+        return getattr(self.backend, attribute)
+
+    def submit(self, message, bindings=None):
+        return self.backend.submit(message, bindings)
+
+    def stream(self, message, bindings=None, batch_size=None):
+        return self.backend.stream(message, bindings, batch_size)
+
+    def warmup(self, connections=None):
+        return self.backend.warmup(connections)
+
+    def stats(self):
+        return self.backend.stats()
+
+    def after_fork(self):
+        """ Discards the backend inherited from the parent process; the lock
+            is replaced as well, as it may have been held by one of the
+            parent's other threads while forking
+        """
+        self._lock = threading.Lock()
+        self._backend = None
+        self._pid = None
+
+    def close(self):
+        """ Closes the backend if it was created by the current process """
+        with self._lock:
+            if self.initialized:
+                self._backend.close()
+            self._backend = None
+            self._pid = None
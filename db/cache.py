@@ -0,0 +1,84 @@
+""" Provides the process-wide caches shared between requests (unlike the
+    identity map and the DataLoaders, which only live for a single request).
+    Cached values are only shared by the threads of a single process, so
+    every cache is bounded by a TTL, which also bounds how long a value
+    written through another process (i.e. another gunicorn worker) can be
+    served after it's changed
+"""
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache:
+    """ A thread-safe LRU cache of at most `maxsize` values, each of which
+        expires `ttl` seconds after it was set; a `maxsize` of 0 disables
+        the cache (nothing is ever stored)
+    """
+    def __init__(self, maxsize=1024, ttl=60, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        # key -> (expires_at, value), ordered by the last use
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        """ Returns the value of the key if it's set and hasn't expired """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (self.clock() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def pop(self, key):
+        """ Removes the key (if set), returning whether it was set """
+        with self.lock:
+            removed = self.entries.pop(key, None) is not None
+            self.invalidations += removed
+            return removed
+
+    def discard_if(self, predicate):
+        """ Removes every (unexpired or not) entry for which
+            `predicate(key, value)` is true, returning the number of removed
+            entries
+        """
+        with self.lock:
+            keys = [key for key, (_, value) in self.entries.items()
+                    if predicate(key, value)]
+            for key in keys:
+                del self.entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations
+            }
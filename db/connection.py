@@ -0,0 +1,378 @@
+""" Provides the ConnectionManager used by the models to submit queries
+    through a pool of health-checked Gremlin connections
+"""
+from gremlin_python.driver.client import Client
+from gremlin_python.driver.protocol import GremlinServerError
+from gremlin_python.driver.request import RequestMessage
+from db.backends import GraphBackend, iterate_batches
+from db.serialization import load_serializer
+from db.exceptions import (
+    DatabaseConnectionException,
+    ConnectionPoolTimeoutException
+)
+from contextlib import contextmanager
+from collections import deque
+import threading
+import random
+import queue
+import time
+
+
+def percentile(values, percent):
+    """ Returns the given percentile (0-100) of the values using the
+        nearest-rank method; None if there are no values
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(percent / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class PooledConnection:
+    """ A single Gremlin Client (with a single websocket) that is handed out
+        by the ConnectionManager to one query at a time
+    """
+    def __init__(self, client):
+        self.client = client
+        self.last_used = time.monotonic()
+        self.broken = False
+
+    def close(self):
+        """ Closes the underlying client, ignoring any transport errors """
+        try:
+            self.client.close()
+        except Exception:
+            pass
+
+
+class ConnectionManager(GraphBackend):
+    """ Manages a fixed-size pool of Gremlin connections that are shared by
+        all of the threads serving requests.
+            - `warmup` connections are opened upon initialization (all of
+                them by default), and the rest are opened on demand
+            - Idle connections are health-checked before being reused
+            - Broken connections are re-opened with a jittered exponential
+                backoff
+            - Stats (in-use, waiting, acquire times) are kept for the pool
+        The manager exposes the same `submit` method as the Gremlin Client,
+        so it can be used in place of it
+    """
+    name = "gremlin"
+
+    HEALTH_CHECK_QUERY = "g.inject(0)"
+    # The number of recent acquire times kept for the percentile stats
+    ACQUIRE_SAMPLES = 1024
+
+    def __init__(self, host, traversal_source, username="", password="",
+                 pool_size=4, max_workers=None, acquire_timeout=30,
+                 health_check_interval=60, reconnect_attempts=5,
+                 reconnect_backoff=0.5, reconnect_backoff_max=10,
+                 serializer="graphson2", warmup=None, client_factory=None):
+        self.host = host
+        self.traversal_source = traversal_source
+        self.username = username
+        self.password = password
+        self.pool_size = pool_size
+        self.max_workers = max_workers
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self.reconnect_attempts = reconnect_attempts
+        self.reconnect_backoff = reconnect_backoff
+        self.reconnect_backoff_max = reconnect_backoff_max
+        # The name of the message serializer (see db.serialization)
+        self.serializer = serializer
+        self.client_factory = client_factory or self.create_client
+
+        self._lock = threading.Lock()
+        # LIFO so that the most recently used (warm) connection is reused
+        self._idle = queue.LifoQueue()
+        self._acquire_times = deque(maxlen=self.ACQUIRE_SAMPLES)
+        self._opened = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._acquired = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._failed_health_checks = 0
+
+        self.warmup(warmup)
+
+    @classmethod
+    def from_settings(cls, settings, **kwargs):
+        """ Returns a ConnectionManager configured through the given
+            DATABASE_SETTINGS dictionary
+        """
+        options = {
+            "username": settings["username"],
+            "password": settings["password"]
+        }
+        for key in ["pool_size", "max_workers", "acquire_timeout",
+                    "health_check_interval", "reconnect_attempts",
+                    "reconnect_backoff", "reconnect_backoff_max",
+                    "serializer"]:
+            if key in settings:
+                options[key] = settings[key]
+        if "warmup_connections" in settings:
+            options["warmup"] = settings["warmup_connections"]
+        options.update(kwargs)
+
+        return cls(settings["host"], settings["traversal_source"], **options)
+
+    def create_client(self):
+        """ Returns a new Gremlin Client holding a single connection """
+        return Client(
+            self.host,
+            self.traversal_source,
+            pool_size=1,
+            max_workers=self.max_workers,
+            username=self.username,
+            password=self.password,
+            message_serializer=load_serializer(self.serializer)
+        )
+
+    def backoff(self, attempt):
+        """ Returns the number of seconds to wait before the given reconnect
+            attempt; a random value up to the (capped) exponential backoff
+        """
+        ceiling = min(self.reconnect_backoff_max,
+                      self.reconnect_backoff * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def connect(self):
+        """ Returns a new PooledConnection, retrying with a jittered backoff
+            if the connection can't be established
+        """
+        error = None
+        for attempt in range(max(self.reconnect_attempts, 1)):
+            if attempt:
+                time.sleep(self.backoff(attempt - 1))
+            try:
+                return PooledConnection(self.client_factory())
+            except Exception as e:
+                error = e
+
+        raise DatabaseConnectionException(
+            f"Could not connect to the database after "
+            f"{self.reconnect_attempts} attempts: {error}")
+
+    def reserve(self):
+        """ Reserves a slot for a new connection; returns False if the pool
+            is already full
+        """
+        with self._lock:
+            if self._opened >= self.pool_size:
+                return False
+            self._opened += 1
+            return True
+
+    def open_reserved(self):
+        """ Returns a new connection for a reserved slot; the slot is freed
+            if the connection can't be established
+        """
+        try:
+            return self.connect()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def warmup(self, connections=None):
+        """ Opens new (idle) connections until `connections` of them (the
+            whole pool by default) are open; returns the number of open
+            connections
+        """
+        target = self.pool_size if connections is None else \
+            min(connections, self.pool_size)
+        while self._opened < target and self.reserve():
+            self._idle.put_nowait(self.open_reserved())
+        return self._opened
+
+    def take(self):
+        """ Returns an idle connection; opening a new one if none are idle
+            and the pool isn't full yet, or otherwise waiting (up to the
+            `acquire_timeout`) for one to be released
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        if self.reserve():
+            return self.open_reserved()
+        return self._idle.get(timeout=self.acquire_timeout)
+
+    def reconnect(self, connection):
+        """ Closes the given connection and returns a new one in it's place """
+        connection.close()
+        with self._lock:
+            self._reconnects += 1
+        return self.connect()
+
+    def is_healthy(self, connection):
+        """ Runs a cheap query through the connection to confirm that the
+            connection is still usable
+        """
+        try:
+            connection.client.submit(self.HEALTH_CHECK_QUERY).all().result(
+                timeout=self.acquire_timeout)
+        except Exception:
+            with self._lock:
+                self._failed_health_checks += 1
+            return False
+        return True
+
+    def prepare(self, connection):
+        """ Returns a usable connection in place of the given (idle)
+            connection; re-opening it if it's broken or fails the health
+            check after being idle for too long
+        """
+        if connection.broken:
+            return self.reconnect(connection)
+
+        idle_time = time.monotonic() - connection.last_used
+        if self.health_check_interval is not None and \
+                idle_time >= self.health_check_interval and \
+                not self.is_healthy(connection):
+            return self.reconnect(connection)
+
+        return connection
+
+    @contextmanager
+    def acquire(self):
+        """ Context manager that checks a connection out of the pool for the
+            duration of the block and returns it to the pool afterwards
+            Raises a ConnectionPoolTimeoutException if no connection becomes
+            available within the `acquire_timeout`
+        """
+        start = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        try:
+            connection = self.take()
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise ConnectionPoolTimeoutException(
+                f"No database connection became available within "
+                f"{self.acquire_timeout} seconds")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        with self._lock:
+            self._in_use += 1
+            self._acquired += 1
+            self._acquire_times.append(time.monotonic() - start)
+
+        try:
+            connection = self.prepare(connection)
+        except Exception:
+            # The slot is handed back as broken, so that the next acquire
+            # tries to reconnect it
+            connection.broken = True
+            self.release(connection)
+            raise
+
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def release(self, connection):
+        """ Returns the connection back to the pool """
+        connection.last_used = time.monotonic()
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put_nowait(connection)
+
+    def submit(self, message, bindings=None):
+        """ Submits the message (with it's bindings) through a pooled
+            connection and returns the gremlin ResultSet.
+            The connection is held until the server has sent the entire
+            response; server errors are raised when the results are read,
+            as with the Gremlin Client
+        """
+        with self.acquire() as connection:
+            try:
+                result_set = connection.client.submit(message, bindings)
+                error = result_set.done.exception()
+            except Exception:
+                connection.broken = True
+                raise
+
+            # Errors other than the server's own responses mean that the
+            # connection itself can't be trusted anymore
+            if error is not None and \
+                    not isinstance(error, GremlinServerError):
+                connection.broken = True
+
+        return result_set
+
+    def stream(self, message, bindings=None, batch_size=None):
+        """ Submits the message through a pooled connection and yields the
+            results in batches as they arrive from the server; the
+            `batch_size` is also sent to the server as the request's
+            `batchSize`.
+            The connection is held until the entire response was received,
+            even if the iteration is stopped early
+        """
+        if batch_size:
+            args = {
+                "gremlin": message,
+                "aliases": {"g": self.traversal_source},
+                "batchSize": batch_size
+            }
+            if bindings:
+                args["bindings"] = bindings
+            message, bindings = RequestMessage(
+                processor="", op="eval", args=args), None
+
+        with self.acquire() as connection:
+            try:
+                result_set = connection.client.submitAsync(
+                    message, bindings=bindings).result()
+            except Exception:
+                connection.broken = True
+                raise
+
+            try:
+                yield from iterate_batches(result_set, batch_size)
+            finally:
+                error = result_set.done.exception()
+                if error is not None and \
+                        not isinstance(error, GremlinServerError):
+                    connection.broken = True
+
+    def stats(self):
+        """ Returns a dictionary with the current state of the pool """
+        with self._lock:
+            acquire_times = list(self._acquire_times)
+            stats = {
+                "pool_size": self.pool_size,
+                "open": self._opened,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "waiting": self._waiting,
+                "acquired": self._acquired,
+                "timeouts": self._timeouts,
+                "reconnects": self._reconnects,
+                "failed_health_checks": self._failed_health_checks
+            }
+
+        for name, percent in [("p50", 50), ("p99", 99)]:
+            value = percentile(acquire_times, percent)
+            stats[f"acquire_{name}_ms"] = value * 1000 \
+                if value is not None else None
+
+        return stats
+
+    def close(self):
+        """ Closes all of the idle connections in the pool """
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            with self._lock:
+                self._opened -= 1
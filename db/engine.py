@@ -1,15 +1,154 @@
-from gremlin_python.driver import serializer
-from gremlin_python.driver.client import Client
+from db.backends import LazyBackend
+from db.exceptions import CustomValidationFailedException
+from db.pagination import Page, encode_cursor, decode_cursor
+from db.instances import CompactInstanceMixin
+from db.identity import identity_map
+# The traversal builder; models build their queries as `g.V()...`
+# traversals and submit them through `submit_traversal`
+from db.traversal import g, __, ScriptTranslator, submit as submit_traversal
 from settings import DATABASE_SETTINGS
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import uuid
 
 
-client = Client(
-    DATABASE_SETTINGS["host"],
-    DATABASE_SETTINGS["traversal_source"],
-    username=DATABASE_SETTINGS["username"],
-    password=DATABASE_SETTINGS["password"],
-    message_serializer=serializer.GraphSONSerializersV2d0()
-)
+# Shared by all of the models and views; exposes the same `submit` method
+# as the gremlin Client, backed by either a pool of connections or the
+# in-memory graph (see db.backends). The backend is only created upon the
+# first query of each process; pre-fork servers can call
+# `client.after_fork()` and `client.warmup()` from their post-fork hook
+client = LazyBackend.from_settings(DATABASE_SETTINGS)
+
+
+def get_slow_query_log():
+    """ Returns the log of the queries slower than the `slow_query_ms`
+        setting (None if the queries aren't instrumented); the threshold
+        can be changed at runtime through it's `threshold_ms`
+    """
+    return getattr(client, "slow_queries", None)
+
+
+def vertex_key(label, vertex_id):
+    """ Returns the partition-qualified `[partition_key_value, id]` id of a
+        vertex, which CosmosDB looks up with a single-partition point read
+        (rather than checking every partition for the id, as
+        `has(label, 'id', ...)` does); every vertex is written with it's
+        label as the value of the partition key (see `generate_create_query`)
+    """
+    return [label, str(vertex_id)]
+
+
+# The starts of an edge's counter updates (see `Edge.counter_steps`) when
+# the traversal is at the written edge
+EDGE_ENDS = {"outV": "__.outV()", "inV": "__.inV()"}
+
+
+# The functions called with the ids of the written vertices (see
+# `notify_write`); i.e. the response cache's invalidation
+WRITE_LISTENERS = []
+
+
+def on_write(listener):
+    """ Registers the listener to be called with the ids of the vertices
+        written through the models; usable as a decorator
+    """
+    WRITE_LISTENERS.append(listener)
+    return listener
+
+
+def notify_write(vertex_ids):
+    """ Calls the write listeners with the set of the given vertex ids;
+        called for the vertices updated or deleted (or with an edge created
+        or deleted) through the models, and by the views that write through
+        raw queries. A None id means that a written vertex isn't known
+    """
+    vertex_ids = set(vertex_ids)
+    if not vertex_ids:
+        return
+    for listener in WRITE_LISTENERS:
+        listener(vertex_ids)
+
+
+def run_chunks(function, chunks, parallelism):
+    """ Calls the function with each of the chunks, running up to
+        `parallelism` calls at the same time, and returns the results in
+        the same order as the chunks
+    """
+    if len(chunks) <= 1 or parallelism <= 1:
+        return [function(chunk) for chunk in chunks]
+
+    with ThreadPoolExecutor(
+            max_workers=min(parallelism, len(chunks))) as executor:
+        return list(executor.map(function, chunks))
+
+
+class QueryTemplateCache:
+    """ Stores the Gremlin script templates generated for a single
+        Vertex/Edge class, keyed by the "shape" of the query (the operation
+        and the property names involved).
+        Values are never part of a template - they're sent to the server
+        separately as `bindings` so that the same script string is reused
+        (and its compiled plan cached server-side) for every call with the
+        same shape
+    """
+    def __init__(self):
+        self._templates = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        """ Returns the template stored against the given key, generating
+            (and storing) it through the `build` callable if it doesn't
+            exist yet
+        """
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self.hits += 1
+                return template
+            template = build()
+            self._templates[key] = template
+            self.misses += 1
+
+        return template
+
+    def clear(self):
+        """ Removes all of the stored templates """
+        with self._lock:
+            self._templates.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._templates)
+
+
+class QueryTemplateMixin:
+    """ Mixin that gives every Vertex/Edge class it's own (non-inherited)
+        QueryTemplateCache through the `query_templates` classmethod
+    """
+    @classmethod
+    def query_templates(cls):
+        """ Returns the QueryTemplateCache belonging to this class """
+        if "_query_templates" not in cls.__dict__:
+            cls._query_templates = QueryTemplateCache()
+        return cls._query_templates
+
+    @staticmethod
+    def property_bindings(data, prefix="p"):
+        """ Returns a (steps, bindings) tuple for the given property data;
+            `steps` is a list of (key, binding_name) pairs in the same order
+            as the data and `bindings` maps the binding names to the values
+            NOTE: Values are converted to strings, matching the way the
+                values have always been written into the query strings
+        """
+        steps, bindings = [], {}
+        for index, (key, value) in enumerate(data.items()):
+            name = f"{prefix}{index}"
+            steps.append((key, name))
+            bindings[name] = str(value)
+        return steps, bindings
 
 
 class PropertyValidationMixin:
@@ -48,7 +187,8 @@ class PropertyValidationMixin:
         return data
 
 
-class Vertex(PropertyValidationMixin):
+class Vertex(PropertyValidationMixin, QueryTemplateMixin,
+             CompactInstanceMixin):
     """ Base Vertex class that provides all methods required
         for a Vertex of this Vertex's label
     """
@@ -57,6 +197,15 @@ class Vertex(PropertyValidationMixin):
     # A dictionary with the schema of {'property_name': <property_type>}
     # Ex: {'name': str}
     properties = {}
+    # The default number of vertices created by each `bulk_create` query, and
+    # the number of those queries that can be running at the same time
+    BULK_CHUNK_SIZE = 100
+    BULK_PARALLELISM = DATABASE_SETTINGS.get("pool_size", 4)
+    # The number of vertices looked up by each `get_many` query; keeps the
+    # scripts (and their bindings) within the server's limits
+    GET_MANY_CHUNK_SIZE = 100
+    # The partition key property is returned along with every vertex
+    COMPACT_SLOTS = ("id", DATABASE_SETTINGS["partition_key"])
 
     def __init__(self, **kwargs):
         """ Initializes the Vertex instances by setting attributes present
@@ -69,14 +218,48 @@ class Vertex(PropertyValidationMixin):
     @classmethod
     def vertex_to_instance(cls, vertex):
         """ Receives a gremlin client vertex response as input, and generates
-            a Vertex instance based off of that
+            a (compact) Vertex instance based off of that
         """
-        instance = cls()
-        instance.id = vertex["id"]
+        instance = cls.new_compact(vertex["id"])
         for field, value in vertex.get("properties", {}).items():
             setattr(instance, field, value[0]["value"])
         return instance
 
+    @classmethod
+    def projection_to_instance(cls, result, fields):
+        """ Generates a partial Vertex instance from a result of the
+            `generate_projection_query` steps, holding only the given fields
+        """
+        instance = cls.new_partial(result["id"], fields)
+        for field, values in result["properties"].items():
+            setattr(instance, field, values[0])
+        return instance
+
+    @classmethod
+    def result_to_instance(cls, result, fields=None):
+        """ Generates the instance of either a full or a projected vertex """
+        if fields is None:
+            return cls.vertex_to_instance(result)
+        return cls.projection_to_instance(result, fields)
+
+    @staticmethod
+    def generate_projection_query(fields):
+        """ Returns the steps projecting the vertices onto their id, label
+            and the values of the given property fields, i.e:
+                {"id": ..., "label": ..., "properties": {field: [value]}}
+        """
+        keys = ", ".join(f"'{field}'" for field in fields)
+        return ".project('id', 'label', 'properties')" + \
+            f".by(id()).by(label()).by(valueMap({keys}))"
+
+    @staticmethod
+    def projection_traversal(traversal, fields):
+        """ Adds the steps of `generate_projection_query` to the given
+            (builder) traversal
+        """
+        return traversal.project("id", "label", "properties") \
+            .by(__.id()).by(__.label()).by(__.valueMap(*fields))
+
     @classmethod
     def custom_validation(self, data):
         """ A Validation method meant to be overridden by specific vertex
@@ -92,14 +275,12 @@ class Vertex(PropertyValidationMixin):
         validated_data = cls.validate_input(data)
         validated_data = cls.custom_validation(data)
 
-        query = f"g.addV('{cls.LABEL}')" + \
-            f".property('{DATABASE_SETTINGS['partition_key']}', " + \
-            f"'{cls.LABEL}')"
-
-        for key, value in validated_data.items():
-            query += f".property('{key}', '{value}')"
+        steps, bindings = cls.property_bindings(validated_data)
+        query = cls.query_templates().get(
+            ("create", tuple(key for key, _ in steps)),
+            lambda: cls.generate_create_query(steps))
 
-        created_vertex = client.submit(query).one()
+        created_vertex = client.submit(query, bindings).one()
 
         # Creating and returning the account object created from this query
         vertex_instance = cls.vertex_to_instance(created_vertex[0])
@@ -107,40 +288,364 @@ class Vertex(PropertyValidationMixin):
         return vertex_instance
 
     @classmethod
-    def filter(cls, wildcard_properties=[], limit=None, **properties):
+    def bulk_create(cls, rows, chunk_size=None, parallelism=None):
+        """ Creates a vertex for each of the property dictionaries in `rows`
+            and returns the created instances in the same order.
+            All of the rows are validated before anything is written; the
+            rows are then written in chunks of `chunk_size` vertices (one
+            query per chunk), with up to `parallelism` chunks in flight
+            NOTE: Chunks are written independently - if a chunk fails, the
+                chunks that were already written are not rolled back
+        """
+        chunk_size = chunk_size or cls.BULK_CHUNK_SIZE
+        parallelism = parallelism or cls.BULK_PARALLELISM
+
+        validated_rows = []
+        for data in rows:
+            validated_data = cls.validate_input(data)
+            validated_data = cls.custom_validation(data)
+            validated_rows.append(validated_data)
+
+        chunks = [validated_rows[i:i + chunk_size]
+                  for i in range(0, len(validated_rows), chunk_size)]
+        results = run_chunks(cls.create_chunk, chunks, parallelism)
+
+        return [instance for chunk in results for instance in chunk]
+
+    @classmethod
+    def create_chunk(cls, rows):
+        """ Creates all of the (validated) rows through a single query and
+            returns the instances in the same order as the rows
+        """
+        shapes, bindings = [], {}
+        for index, data in enumerate(rows):
+            steps, row_bindings = cls.property_bindings(
+                data, prefix=f"r{index}_p")
+            shapes.append(tuple(key for key, _ in steps))
+            bindings.update(row_bindings)
+
+        query = cls.query_templates().get(
+            ("bulk_create", tuple(shapes)),
+            lambda: cls.generate_bulk_create_query(shapes))
+
+        created_vertices = client.submit(query, bindings).all().result()
+
+        return [cls.vertex_to_instance(i) for i in created_vertices]
+
+    @classmethod
+    def generate_bulk_create_query(cls, shapes):
+        """ Returns the Gremlin Query template used for creating a vertex
+            for each of the given property name tuples; each vertex is
+            created in it's own `union` branch, which keeps the results in
+            the same order as the shapes
+        """
+        branches = []
+        for index, keys in enumerate(shapes):
+            steps = [(key, f"r{index}_p{i}") for i, key in enumerate(keys)]
+            branches.append(cls.generate_create_query(steps, source="__"))
+
+        return f"g.inject(0).union({', '.join(branches)})"
+
+    @classmethod
+    def generate_create_query(cls, steps, source="g"):
+        """ Returns the Gremlin Query template used for creating a vertex
+            with the given (key, binding_name) property steps
+        """
+        query = f"{source}.addV('{cls.LABEL}')" + \
+            f".property('{DATABASE_SETTINGS['partition_key']}', " + \
+            f"'{cls.LABEL}')"
+
+        for key, name in steps:
+            query += f".property('{key}', {name})"
+
+        return query
+
+    @classmethod
+    def generate_filter_query(cls, steps, wildcards={}, limit=False,
+                              order_by=None, descending=False, after=False,
+                              point_read=False):
+        """ Returns the Gremlin Query template used for filtering vertices
+            by the given (key, binding_name) property steps
+            Wildcard values are raw gremlin predicates and are the only
+            values that are written into the query itself
+            If `order_by` is given, the vertices are sorted by it (and their
+            id, to break ties); with `after`, only the vertices sorted after
+            the `after_value`/`after_id` bindings are returned
+            With `point_read`, the vertex is looked up through the
+            `vertex_key` binding (see `vertex_key`) instead of by it's label
+        """
+        if point_read:
+            query = "g.V(vertex_key)"
+        else:
+            query = f"g.V().hasLabel('{cls.LABEL}')"
+
+        for key, name in steps:
+            if key in wildcards:
+                query += f".has('{key}', {wildcards[key]})"
+            else:
+                query += f".has('{key}', {name})"
+
+        if order_by:
+            predicate = "lt" if descending else "gt"
+            order = "decr" if descending else "incr"
+            if order_by == "id":
+                if after:
+                    query += f".has('id', {predicate}(after_id))"
+                query += f".order().by('id', {order})"
+            else:
+                # Vertices without the property can't be sorted
+                query += f".has('{order_by}')"
+                if after:
+                    query += f".or(has('{order_by}', " + \
+                        f"{predicate}(after_value)), " + \
+                        f"has('{order_by}', after_value)" + \
+                        f".has('id', {predicate}(after_id)))"
+                query += f".order().by('{order_by}', {order})" + \
+                    f".by('id', {order})"
+
+        if limit:
+            query += ".limit(max_results)"
+
+        return query
+
+    @classmethod
+    def filter(cls, wildcard_properties=[], limit=None, order_by=None,
+               descending=False, cursor=None, fields=None, **properties):
         """ Returns all vertices matching the given properties
             NOTE: More complicated queries must be formulated manually.
             Wildcard properties can be sent in as TextP.startingWith('val'),
             and they must be part of the `wildcard_properties` array
+
+            Keyset pagination: if `order_by` (a property name or "id") is
+            given, the vertices are sorted by it and a `Page` of at most
+            `limit` vertices is returned; it's `cursor` can be passed back
+            in to get the next page (and is None on the last page).
+            Vertices that don't have the `order_by` property are skipped
+
+            If `fields` (a list of property names) is given, only those
+            properties are fetched, and reading any other property of the
+            returned (partial) instances raises a FieldNotLoadedException
+
+            Lookups of a single id (`filter(id=...)`) go through the
+            request's identity map, returning the already-loaded instance
+            if the vertex has been loaded during the request.
+            Any (non-wildcard) `id` filter is sent as a point read of the
+            vertex's partition
         """
-        query = f"g.V().hasLabel('{cls.LABEL}')"
+        identity = identity_map()
+        lookup = identity is not None and list(properties) == ["id"] and \
+            not (wildcard_properties or limit or order_by or cursor)
+        if lookup:
+            instance = identity.get(cls.LABEL, properties["id"])
+            if instance is not None:
+                return [instance]
 
-        for key, value in properties.items():
-            if key in wildcard_properties:
-                query += f".has('{key}', {value})"
+        if fields is not None and order_by not in (None, "id"):
+            # The ordered property is needed for building the cursor
+            fields = list(fields) + [order_by] if order_by not in fields \
+                else fields
+
+        if order_by and limit:
+            # Fetching an extra vertex to know whether there's a next page
+            query, bindings = cls.filter_query(
+                wildcard_properties, int(limit) + 1, properties,
+                order_by=order_by, descending=descending, cursor=cursor,
+                fields=fields)
+        else:
+            query, bindings = cls.filter_query(
+                wildcard_properties, limit, properties,
+                order_by=order_by, descending=descending, cursor=cursor,
+                fields=fields)
+
+        results = client.submit(query, bindings).all().result()
+
+        if not order_by:
+            # Converting each vertex to a Vertex instance
+            instances = [cls.result_to_instance(i, fields) for i in results]
+            # Partial instances aren't mapped, as later lookups of the
+            # vertex might need the rest of it's properties
+            if lookup and instances and fields is None:
+                identity.add(cls.LABEL, instances[0])
+            return instances
+
+        next_cursor = None
+        if limit and len(results) > int(limit):
+            results = results[:int(limit)]
+            last = results[-1]
+            if order_by == "id":
+                value = last["id"]
+            elif fields is not None:
+                value = last["properties"][order_by][0]
             else:
-                query += f".has('{key}', '{value}')"
+                value = last["properties"][order_by][0]["value"]
+            next_cursor = encode_cursor(
+                order_by, descending, value, last["id"])
+
+        return Page([cls.result_to_instance(i, fields) for i in results],
+                    cursor=next_cursor)
+
+    @classmethod
+    def stream_filter(cls, wildcard_properties=[], limit=None,
+                      batch_size=None, order_by=None, descending=False,
+                      cursor=None, fields=None, **properties):
+        """ Same as `filter`, but yields the vertices as instances while the
+            result batches (of at most `batch_size` vertices) arrive, rather
+            than building the whole list first
+        """
+        query, bindings = cls.filter_query(
+            wildcard_properties, limit, properties,
+            order_by=order_by, descending=descending, cursor=cursor,
+            fields=fields)
 
+        for batch in client.stream(query, bindings, batch_size=batch_size):
+            for vertex in batch:
+                yield cls.result_to_instance(vertex, fields)
+
+    @classmethod
+    def get_many(cls, vertex_ids, fields=None, chunk_size=None,
+                 parallelism=None):
+        """ Returns a dictionary with the {id: instance} of each of the given
+            vertex ids that exist (in the order of the ids); the ids are
+            deduplicated and looked up in chunks of `chunk_size` ids (one
+            query of point reads per chunk), with up to `parallelism` chunks
+            in flight.
+            Like `filter(id=...)`, the vertices already loaded during the
+            request are taken from the request's identity map (and the
+            loaded vertices are added to it), unless only `fields` are loaded
+        """
+        chunk_size = chunk_size or cls.GET_MANY_CHUNK_SIZE
+        parallelism = parallelism or cls.BULK_PARALLELISM
+        vertex_ids = list(dict.fromkeys(vertex_ids))
+
+        identity = identity_map() if fields is None else None
+        instances, missing = {}, []
+        for vertex_id in vertex_ids:
+            instance = identity.get(cls.LABEL, vertex_id) \
+                if identity is not None else None
+            if instance is not None:
+                instances[vertex_id] = instance
+            else:
+                missing.append(vertex_id)
+
+        def get_chunk(chunk):
+            query, bindings = cls.get_many_query(chunk, fields)
+            return client.submit(query, bindings).all().result()
+
+        chunks = [missing[i:i + chunk_size]
+                  for i in range(0, len(missing), chunk_size)]
+        for results in run_chunks(get_chunk, chunks, parallelism):
+            for result in results:
+                instance = cls.result_to_instance(result, fields)
+                instances[instance.id] = instance
+                if identity is not None:
+                    identity.add(cls.LABEL, instance)
+
+        return {i: instances[i] for i in vertex_ids if i in instances}
+
+    @classmethod
+    def get_many_query(cls, vertex_ids, fields=None):
+        """ Returns the (query, bindings) tuple looking the given vertices
+            up through their partition-qualified ids (see `vertex_key`);
+            the template only depends on the number of ids
+        """
+        bindings = {f"v{index}": vertex_key(cls.LABEL, vertex_id)
+                    for index, vertex_id in enumerate(vertex_ids)}
+
+        def build():
+            query = f"g.V({', '.join(bindings)}).hasLabel('{cls.LABEL}')"
+            if fields is not None:
+                query += cls.generate_projection_query(fields)
+            return query
+
+        query = cls.query_templates().get(
+            ("get_many", len(bindings),
+             None if fields is None else tuple(fields)), build)
+        return query, bindings
+
+    @classmethod
+    def filter_query(cls, wildcard_properties, limit, properties,
+                     order_by=None, descending=False, cursor=None,
+                     fields=None):
+        """ Returns the (query, bindings) tuple used for filtering vertices
+            by the given properties (projected onto the `fields`, if given)
+        """
+        steps, bindings = cls.property_bindings(properties)
+        wildcards = {key: properties[key] for key, _ in steps
+                     if key in wildcard_properties}
+        for key, name in steps:
+            if key in wildcards:
+                bindings.pop(name)
+
+        point_read = "id" in properties and "id" not in wildcards
+        if point_read:
+            bindings["vertex_key"] = vertex_key(cls.LABEL, properties["id"])
+            for key, name in steps:
+                if key == "id":
+                    bindings.pop(name)
+            steps = [(key, name) for key, name in steps if key != "id"]
         if limit:
-            query += f".limit({limit})"
+            bindings["max_results"] = int(limit)
+        if cursor:
+            value, vertex_id = decode_cursor(cursor, order_by, descending)
+            bindings["after_id"] = vertex_id
+            if order_by != "id":
+                bindings["after_value"] = value
 
-        results = client.submit(query).all().result()
+        def build():
+            query = cls.generate_filter_query(
+                steps, wildcards=wildcards, limit=bool(limit),
+                order_by=order_by, descending=descending,
+                after=bool(cursor), point_read=point_read)
+            if fields is not None:
+                query += cls.generate_projection_query(fields)
+            return query
 
-        # Converting each vertex to a Vertex instance
-        instances = [cls.vertex_to_instance(i) for i in results]
+        if wildcards:
+            # Wildcard predicates are part of the script, which makes the
+            # script unique to the values - so it isn't worth caching
+            query = build()
+        elif fields is None:
+            query = cls.query_templates().get(
+                ("filter", point_read, tuple(key for key, _ in steps),
+                 bool(limit), order_by, descending, bool(cursor)), build)
+        else:
+            query = cls.query_templates().get(
+                ("filter", point_read, tuple(key for key, _ in steps),
+                 bool(limit), order_by, descending, bool(cursor),
+                 tuple(fields)), build)
 
-        return instances
+        return query, bindings
 
     def delete(self):
         """ Deletes this instance of the Vertex from the database """
         assert self.id, "Instance has not been initialized!"
 
-        query = f"g.V().has('{self.LABEL}', 'id', '{self.id}').drop()"
-        res = client.submit(query).all().result()
+        query = self.query_templates().get(
+            ("delete",), lambda: "g.V(vertex_key).drop()")
+        res = client.submit(query, {
+            "vertex_key": vertex_key(self.LABEL, self.id)
+        }).all().result()
+
+        identity = identity_map()
+        if identity is not None:
+            identity.discard(self.LABEL, self.id)
+        notify_write([self.id])
 
         self.id = None
         return res
 
+    @classmethod
+    def generate_update_query(cls, steps):
+        """ Returns the Gremlin Query template used for updating the
+            given (key, binding_name) property steps of the single vertex
+            identified by the `vertex_key` binding
+        """
+        query = "g.V(vertex_key)"
+        for key, name in steps:
+            query += f".property('{key}', {name})"
+
+        return query
+
     @classmethod
     def update(cls, validated_data={}, vertex_id=None):
         """ Updates the properties of the initialized vertex (this instance)
@@ -154,11 +659,18 @@ class Vertex(PropertyValidationMixin):
         assert "id" not in validated_data, "Can not update Vertex ID!"
         assert vertex_id, "No vertex identifier provided!"
 
-        query = f"g.V().has('{cls.LABEL}', 'id', '{vertex_id}')"
-        for key, value in validated_data.items():
-            query += f".property('{key}', '{value}')"
+        steps, bindings = cls.property_bindings(validated_data)
+        bindings["vertex_key"] = vertex_key(cls.LABEL, vertex_id)
+        query = cls.query_templates().get(
+            ("update", tuple(key for key, _ in steps)),
+            lambda: cls.generate_update_query(steps))
+
+        res = client.submit(query, bindings).all().result()
 
-        res = client.submit(query).all().result()
+        identity = identity_map()
+        if identity is not None:
+            identity.discard(cls.LABEL, vertex_id)
+        notify_write([vertex_id])
 
         # An empty list means that the query ran unsuccessfully
         # (i.e. nonexistent vertex)
@@ -168,12 +680,18 @@ class Vertex(PropertyValidationMixin):
         return cls.vertex_to_instance(res[0])
 
 
-class Edge(PropertyValidationMixin):
+class Edge(PropertyValidationMixin, QueryTemplateMixin,
+           CompactInstanceMixin):
     """ Represents a connection between two Vertices (Vertex Instances) """
     # Need to be overridden on all inheriting classes
     LABEL = ""
     OUTV_LABEL = ""
     INV_LABEL = ""
+    # The default number of edges created by each `bulk_create` query, and
+    # the number of those queries that can be running at the same time
+    BULK_CHUNK_SIZE = 100
+    BULK_PARALLELISM = DATABASE_SETTINGS.get("pool_size", 4)
+    COMPACT_SLOTS = ("id", "outV", "inV", "outVLabel")
 
     def __init__(self, *args, outv_label=None, inv_label=None, **kwargs):
         """ Modifiess the inv label attribute for this instance
@@ -186,11 +704,12 @@ class Edge(PropertyValidationMixin):
     @classmethod
     def edge_to_instance(cls, edge):
         """ Receives a Gremlin Edge response as input and generates an Edge
-            Instance based off of it
+            (compact) Instance based off of it
         """
-        instance = cls(inv_label=cls.INV_LABEL)
-        instance.id = edge["id"]
+        instance = cls.new_compact(edge["id"])
         instance.outV, instance.inV = edge.get("outV"), edge.get("inV")
+        # Used for looking the edge up through it's out vertex's partition
+        instance.outVLabel = edge.get("outVLabel")
         for field, value in edge.get("properties", {}).items():
             setattr(instance, field, value)
 
@@ -205,14 +724,176 @@ class Edge(PropertyValidationMixin):
         return data
 
     @classmethod
-    def generate_create_query(cls, outv_label=None, inv_label=None,
-                              outv_id=None, inv_id=None):
-        """ Returns a formatted Gremlin Query string that can be used
-            as a base for an edge Create query (before adding properties)
+    def bulk_custom_validation(cls, rows, outv_label=None, inv_label=None):
+        """ Validates all of the (index, outv_id, inv_id, data) rows of a
+            `bulk_create` as a set, and returns a dictionary with the
+            {index: exception} of every row that failed validation.
+            By default, every row is passed through `custom_validation`;
+            models whose validation queries the database should override
+            this with a single (batched) lookup per validation rule
         """
-        return f"g.V().has('{outv_label}', 'id', '{outv_id}')" + \
-            f".addE('{cls.LABEL}')" + \
-            f".to(g.V().has('{inv_label}', 'id', '{inv_id}'))"
+        errors = {}
+        for index, outv_id, inv_id, data in rows:
+            try:
+                cls.custom_validation(
+                    data, outv_id=outv_id, inv_id=inv_id,
+                    outv_label=outv_label, inv_label=inv_label)
+            except CustomValidationFailedException as e:
+                errors[index] = e
+        return errors
+
+    @classmethod
+    def after_write(cls, pairs):
+        """ Called with the (outv_id, inv_id) pairs of the edges of this
+            model that have been created or deleted (through `create`,
+            `bulk_create`, `delete` or a UnitOfWork); meant to be overridden
+            by models whose edges are cached outside of the request (i.e.
+            the user roles); the ids are None if they aren't known
+        """
+
+    @classmethod
+    def counter_updates(cls):
+        """ Returns the (end, traversal) tuples of the counters that count
+            this model's edges (i.e. a node's `messagesCount`); each
+            traversal is run from the edge's `outV` or `inV` vertex in the
+            same query that creates (or drops) the edge, updating the
+            counters through `property` steps. Meant to be overridden by
+            models whose edges are counted
+        """
+        return ()
+
+    @classmethod
+    def counter_steps(cls, ends):
+        """ Returns the script of the `sideEffect` steps running each of
+            the `counter_updates` from the given {end: script} starts;
+            i.e. {"outV": "__.outV()", "inV": "__.inV()"}
+        """
+        script = ""
+        for end, traversal in cls.counter_updates():
+            translator = ScriptTranslator()
+            steps = translator.instructions(traversal)
+            assert not translator.bindings, \
+                "Counter updates can't have bound values!"
+            script += f".sideEffect({ends[end]}{steps})"
+        return script
+
+    @staticmethod
+    def within_bindings(values, prefix):
+        """ Returns a (predicate, bindings) tuple for matching any of the
+            given values through a `within` predicate with a binding per
+            value; i.e. ("within(id0, id1)", {"id0": .., "id1": ..})
+        """
+        bindings = {f"{prefix}{i}": value for i, value in enumerate(values)}
+        return f"within({', '.join(bindings)})", bindings
+
+    @classmethod
+    def vertices_with_edges(cls, vertex_ids, vertex_label, direction="in"):
+        """ Returns the set of ids, out of the given vertex ids, that have
+            at least one edge of this class in the given direction (in|out)
+        """
+        if not vertex_ids:
+            return set()
+        within, bindings = cls.within_bindings(list(set(vertex_ids)), "v")
+        query = f"g.V().has('{vertex_label}', 'id', {within})" + \
+            f".where({direction}E('{cls.LABEL}')).id()"
+
+        return set(client.submit(query, bindings).all().result())
+
+    @classmethod
+    def related_vertices(cls, vertex_ids, vertex_label, direction="out"):
+        """ Returns a dictionary with the {vertex_id: [vertex, ...]} of the
+            vertices adjacent to each of the given vertices through this
+            class's edges in the given direction (in|out); all of the
+            vertices are looked up through point reads in a single query
+        """
+        if not vertex_ids:
+            return {}
+        step = __.out if direction == "out" else __.in_
+        query = g.V(*[vertex_key(vertex_label, i) for i in vertex_ids]) \
+            .project("id", "related") \
+            .by(__.id()) \
+            .by(step(cls.LABEL).fold())
+
+        return {i["id"]: i["related"]
+                for i in submit_traversal(query).all().result()}
+
+    @classmethod
+    def existing_edge_pairs(cls, pairs, outv_label=None, inv_label=None):
+        """ Returns the set of (outv_id, inv_id) pairs, out of the given
+            pairs, that already have an edge of this class between them
+        """
+        if not pairs:
+            return set()
+        OUTV_LABEL = outv_label or cls.OUTV_LABEL
+        INV_LABEL = inv_label or cls.INV_LABEL
+
+        out_within, bindings = cls.within_bindings(
+            list({out_v for out_v, _ in pairs}), "o")
+        in_within, in_bindings = cls.within_bindings(
+            list({in_v for _, in_v in pairs}), "i")
+        bindings.update(in_bindings)
+
+        query = f"g.V().has('{OUTV_LABEL}', 'id', {out_within})" + \
+            f".outE('{cls.LABEL}').as('e')" + \
+            f".inV().has('{INV_LABEL}', 'id', {in_within})" + \
+            ".select('e')"
+        edges = client.submit(query, bindings).all().result()
+
+        return {(i["outV"], i["inV"]) for i in edges} & set(pairs)
+
+    @classmethod
+    def generate_create_query(cls, steps=()):
+        """ Returns the Gremlin Query template used for creating an edge
+            with the given (key, binding_name) property steps; the out/in
+            vertices are identified through the `outv_key` and `inv_key`
+            bindings (see `vertex_key`)
+        """
+        query = f"g.V(outv_key).addE('{cls.LABEL}').to(g.V(inv_key))"
+
+        for key, name in steps:
+            query += f".property('{key}', {name})"
+
+        return query + cls.counter_steps(EDGE_ENDS)
+
+    @classmethod
+    def generate_delete_query(cls, point_read):
+        """ Returns the Gremlin Query template used for dropping the edge
+            identified by the `edge_id` binding; looked up through the
+            `outv_key` binding if `point_read` is set.
+            The edges of counted models are dropped in a side effect, so
+            that their vertices' counters can be updated afterwards
+        """
+        query = f"g.V(outv_key).outE('{cls.LABEL}')" if point_read else \
+            "g.E()"
+        query += ".has('id', edge_id)"
+        if not cls.counter_updates():
+            return query + ".drop()"
+
+        return query + ".as('e').outV().as('outv')" + \
+            ".select('e').inV().as('inv')" + \
+            ".select('e').sideEffect(__.drop())" + \
+            cls.counter_steps(
+                {"outV": "__.select('outv')", "inV": "__.select('inv')"}) + \
+            ".count()"
+
+    @classmethod
+    def generate_filter_query(cls, steps, between_vertices=False):
+        """ Returns the Gremlin Query template used for filtering edges by
+            the given (key, binding_name) property steps, optionally
+            between the two vertices identified by the `outv_key`,
+            `inv_label` and `inv_id` bindings
+        """
+        if between_vertices:
+            query = f"g.V(outv_key).outE('{cls.LABEL}').as('e')" + \
+                ".inV().has(inv_label, 'id', inv_id)" + \
+                ".select('e')"
+        else:
+            query = f"g.E().hasLabel('{cls.LABEL}')"
+
+        for key, name in steps:
+            query += f".has('{key}', {name})"
+
+        return query
 
     @classmethod
     def create(cls,
@@ -237,58 +918,419 @@ class Edge(PropertyValidationMixin):
             validated_data, outv_id=out_v, inv_id=in_v,
             outv_label=OUTV_LABEL, inv_label=INV_LABEL)
 
-        query = cls.generate_create_query(
-            outv_label=OUTV_LABEL, inv_label=INV_LABEL,
-            outv_id=out_v, inv_id=in_v
-        )
-
-        for key, value in validated_data.items():
-            query += f".property('{key}', '{value}')"
+        steps, bindings = cls.property_bindings(validated_data)
+        bindings.update({
+            "outv_key": vertex_key(OUTV_LABEL, out_v),
+            "inv_key": vertex_key(INV_LABEL, in_v)
+        })
+        query = cls.query_templates().get(
+            ("create", tuple(key for key, _ in steps)),
+            lambda: cls.generate_create_query(steps))
 
-        edge = client.submit(query).all().result()[0]
+        edge = client.submit(query, bindings).all().result()[0]
         instance = cls.edge_to_instance(edge)
+        cls.after_write([(out_v, in_v)])
+        notify_write([out_v, in_v])
 
         return instance
 
+    @classmethod
+    def bulk_create(cls, rows, outv_label=None, inv_label=None,
+                    chunk_size=None, parallelism=None):
+        """ Creates an edge for each of the (outv_id, inv_id[, data]) rows
+            and returns an (edges, errors) tuple;
+                `edges` has the created instance for each row (in the same
+                    order as the rows), or None for rows that failed
+                `errors` is a dictionary with the {row_index: exception}
+                    of each of the failed rows
+            The rows are validated as a set (see `bulk_custom_validation`)
+            before the valid rows are written in chunks of `chunk_size`
+            edges (one query per chunk), with up to `parallelism` chunks
+            in flight
+        """
+        OUTV_LABEL = outv_label or cls.OUTV_LABEL
+        INV_LABEL = inv_label or cls.INV_LABEL
+        chunk_size = chunk_size or cls.BULK_CHUNK_SIZE
+        parallelism = parallelism or cls.BULK_PARALLELISM
+
+        rows = list(rows)
+        edges = [None] * len(rows)
+        errors = {}
+
+        validated_rows = []
+        for index, (out_v, in_v, *data) in enumerate(rows):
+            try:
+                validated_data = cls.validate_input(data[0] if data else {})
+            except ValueError as e:
+                errors[index] = e
+                continue
+            validated_rows.append((index, out_v, in_v, validated_data))
+
+        errors.update(cls.bulk_custom_validation(
+            validated_rows, outv_label=OUTV_LABEL, inv_label=INV_LABEL))
+        validated_rows = [i for i in validated_rows if i[0] not in errors]
+
+        def create_chunk(chunk):
+            return cls.create_chunk(chunk, OUTV_LABEL, INV_LABEL)
+
+        chunks = [validated_rows[i:i + chunk_size]
+                  for i in range(0, len(validated_rows), chunk_size)]
+        results = run_chunks(create_chunk, chunks, parallelism)
+
+        for chunk, created in zip(chunks, results):
+            for (index, out_v, in_v, _), edge in zip(chunk, created):
+                if edge:
+                    edges[index] = cls.edge_to_instance(edge[0])
+                else:
+                    errors[index] = CustomValidationFailedException(
+                        f"Could not find the `{OUTV_LABEL}` ({out_v}) or "
+                        f"the `{INV_LABEL}` ({in_v}) vertex")
+
+        written = [(edge.outV, edge.inV) for edge in edges if edge]
+        if written:
+            cls.after_write(written)
+            notify_write(i for pair in written for i in pair)
+
+        return edges, errors
+
+    @classmethod
+    def create_chunk(cls, rows, outv_label, inv_label):
+        """ Creates the edges for all of the validated (index, outv_id,
+            inv_id, data) rows through a single query, and returns a list
+            with the created edge (as a single item list) for each row, or
+            an empty list if the row's vertices weren't found
+        """
+        shapes, bindings = [], {}
+        for row, (_, out_v, in_v, data) in enumerate(rows):
+            steps, row_bindings = cls.property_bindings(
+                data, prefix=f"r{row}_p")
+            shapes.append(tuple(key for key, _ in steps))
+            bindings.update(row_bindings)
+            bindings.update({
+                f"r{row}_outv_key": vertex_key(outv_label, out_v),
+                f"r{row}_inv_key": vertex_key(inv_label, in_v)
+            })
+
+        query = cls.query_templates().get(
+            ("bulk_create", tuple(shapes)),
+            lambda: cls.generate_bulk_create_query(shapes))
+
+        return client.submit(query, bindings).all().result()
+
+    @classmethod
+    def generate_bulk_create_query(cls, shapes):
+        """ Returns the Gremlin Query template used for creating an edge for
+            each of the given property name tuples; each edge is created in
+            it's own folded `union` branch, so that every row has exactly
+            one (possibly empty) result in the same order as the shapes
+        """
+        branches = []
+        for row, keys in enumerate(shapes):
+            # Both vertices are looked up in the branch (rather than with a
+            # nested `to(g.V()...)`), so a missing vertex empties the branch
+            # instead of failing the whole query
+            branch = f"__.V(r{row}_outv_key).as('outv')" + \
+                f".V(r{row}_inv_key).addE('{cls.LABEL}').from('outv')"
+            for i, key in enumerate(keys):
+                branch += f".property('{key}', r{row}_p{i})"
+            branches.append(
+                branch + cls.counter_steps(EDGE_ENDS) + ".fold()")
+
+        return f"g.inject(0).union({', '.join(branches)})"
+
     @classmethod
     def filter(cls, outv_id=None, inv_id=None,
                outv_label=None, inv_label=None, **properties):
         """ Returns all edges matching the given properties between the
             given out and in vertices
         """
+        query, bindings = cls.filter_query(
+            outv_id, inv_id, outv_label, inv_label, properties)
+
+        results = client.submit(query, bindings).all().result()
+
+        # Converting each edge to an `Edge` class instance
+        instances = [cls.edge_to_instance(i) for i in results]
+
+        return instances
+
+    @classmethod
+    def stream_filter(cls, outv_id=None, inv_id=None,
+                      outv_label=None, inv_label=None, batch_size=None,
+                      **properties):
+        """ Same as `filter`, but yields the edges as instances while the
+            result batches (of at most `batch_size` edges) arrive, rather
+            than building the whole list first
+        """
+        query, bindings = cls.filter_query(
+            outv_id, inv_id, outv_label, inv_label, properties)
+
+        for batch in client.stream(query, bindings, batch_size=batch_size):
+            for edge in batch:
+                yield cls.edge_to_instance(edge)
+
+    @classmethod
+    def filter_query(cls, outv_id, inv_id, outv_label, inv_label,
+                     properties):
+        """ Returns the (query, bindings) tuple used for filtering edges by
+            the given properties (and out/in vertices)
+        """
         OUTV_LABEL = outv_label or cls.OUTV_LABEL
         INV_LABEL = inv_label or cls.INV_LABEL
 
         # Filtering by the out and in vertices if provided, otherwise just
         # the properties
-        if outv_id and inv_id:
-            query = f"g.V().has('{OUTV_LABEL}', 'id', '{outv_id}')" + \
-                f".outE('{cls.LABEL}').as('e')" + \
-                f".inV().has('{INV_LABEL}', 'id', '{inv_id}')" + \
-                f".select('e')"
-        else:
-            query = f"g.E().hasLabel('{cls.LABEL}')"
+        steps, bindings = cls.property_bindings(properties)
+        between_vertices = bool(outv_id and inv_id)
+        if between_vertices:
+            bindings.update({
+                "outv_key": vertex_key(OUTV_LABEL, outv_id),
+                "inv_label": INV_LABEL, "inv_id": inv_id
+            })
 
-        for key, value in properties.items():
-            query += f".has('{key}', '{value}')"
+        query = cls.query_templates().get(
+            ("filter", tuple(key for key, _ in steps), between_vertices),
+            lambda: cls.generate_filter_query(steps, between_vertices))
 
-        results = client.submit(query).all().result()
-
-        # Converting each edge to an `Edge` class instance
-        instances = [cls.edge_to_instance(i) for i in results]
-
-        return instances
+        return query, bindings
 
     def delete(self):
         """ Drops this edge through the ID of the initialized instance
+            Edges are stored in their out vertex's partition, so edges
+            loaded from a response (with the out vertex's id and label) are
+            looked up through a point read of that vertex
             TODO: This currently deletes just the vertex and leaves hanging vertices
                 if there are any edges.
                 Raise an error if vertex as any outgoing edges
         """
         assert self.id, "Instance has not been initialized!"
 
-        query = f"g.E().has('id', '{self.id}').drop()"
-        res = client.submit(query).all().result()
+        out_v = getattr(self, "outV", None)
+        out_label = getattr(self, "outVLabel", None)
+        point_read = bool(out_v and out_label)
+        query = self.query_templates().get(
+            ("delete", point_read),
+            lambda: self.generate_delete_query(point_read))
+        bindings = {"edge_id": self.id}
+        if point_read:
+            bindings["outv_key"] = vertex_key(out_label, out_v)
+        res = client.submit(query, bindings).all().result()
+        in_v = getattr(self, "inV", None)
+        self.after_write([(out_v, in_v)])
+        notify_write([out_v, in_v])
 
         self.id = None
         return res
+
+
+class PendingWrite:
+    """ A vertex/edge created (or a vertex updated) through a UnitOfWork;
+        `instance` holds the written Vertex/Edge instance once the unit of
+        work is committed.
+        Vertices get their ids up front, so that they can be referenced
+        (and validated against) before the commit
+    """
+    def __init__(self, model, step, vertex_id=None):
+        self.model = model
+        self.step = step
+        self.id = vertex_id
+        self.instance = None
+
+
+class UnitOfWork:
+    """ Collects the vertex/edge creates and vertex property updates made
+        through it and writes all of them through a single chained
+        traversal on `commit` (or when the `with` block exits without an
+        exception), i.e:
+            with UnitOfWork() as uow:
+                user = uow.create(User, **data)
+                account = uow.create(Account, title="...")
+                uow.create_edge(UserHoldsAccount, user, account)
+            user.instance  # The created User
+
+        Existing vertices (referenced by id) are looked up at the start of
+        the traversal, so nothing is written if any of them doesn't exist;
+        new objects reference each other through step labels.
+        Edges are validated through the edge classes'
+        `bulk_custom_validation` (one call per edge class) before the
+        traversal is submitted; edges between two vertices created in the
+        same unit of work are skipped, as nothing in the database can
+        relate to them yet
+    """
+    # Shared by all units of work, keyed by the shape of the traversal
+    templates = QueryTemplateCache()
+
+    def __init__(self):
+        self.references = {}
+        self.operations = []
+        self.bindings = {}
+        self.pending = []
+        self.validations = {}
+        self.committed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        return False
+
+    def reference(self, vertex, label):
+        """ Returns the step label of the given PendingWrite or existing
+            vertex id (adding a lookup for the id if it's a new reference)
+        """
+        if isinstance(vertex, PendingWrite):
+            return vertex.step
+
+        assert isinstance(vertex, str)
+        if (label, vertex) not in self.references:
+            step = f"r{len(self.references)}"
+            self.references[(label, vertex)] = step
+            self.bindings[f"{step}_key"] = vertex_key(label, vertex)
+        return self.references[(label, vertex)]
+
+    def add_operation(self, model, step, shape, data, vertex_id=None):
+        """ Adds the operation's property bindings and returns it's
+            PendingWrite
+        """
+        steps, bindings = model.property_bindings(data, prefix=f"{step}_p")
+        self.bindings.update(bindings)
+        self.operations.append(shape + (tuple(key for key, _ in steps),))
+
+        pending = PendingWrite(model, step, vertex_id)
+        self.pending.append(pending)
+        return pending
+
+    def create(self, model, **data):
+        """ Validates and adds the creation of a `model` vertex """
+        validated_data = model.validate_input(data)
+        validated_data = model.custom_validation(data)
+
+        step = f"n{len(self.operations)}"
+        vertex_id = str(uuid.uuid4())
+        self.bindings[f"{step}_id"] = vertex_id
+        return self.add_operation(
+            model, step, ("addV", model, step), validated_data, vertex_id)
+
+    def update(self, model, vertex, **validated_data):
+        """ Adds the update of the given (existing/pending) vertex's
+            properties
+            NOTE: As with `Vertex.update`, the data is assumed to have been
+                validated already!
+        """
+        target = self.reference(vertex, model.LABEL)
+        step = f"u{len(self.operations)}"
+        return self.add_operation(
+            model, step, ("update", model, step, target), validated_data,
+            vertex.id if isinstance(vertex, PendingWrite) else vertex)
+
+    def create_edge(self, model, outv, inv, outv_label=None, inv_label=None,
+                    validate=True, **data):
+        """ Validates and adds the creation of a `model` edge between the
+            given vertices, which can either be PendingWrites or the ids of
+            existing vertices.
+            `validate=False` skips the edge class's custom validation, for
+            edges whose rules have already been checked by the caller
+        """
+        OUTV_LABEL = outv_label or model.OUTV_LABEL
+        INV_LABEL = inv_label or model.INV_LABEL
+        validated_data = model.validate_input(data)
+
+        step = f"e{len(self.operations)}"
+        out_step = self.reference(outv, OUTV_LABEL)
+        in_step = self.reference(inv, INV_LABEL)
+
+        if validate and not (isinstance(outv, PendingWrite) and
+                             isinstance(inv, PendingWrite)):
+            self.validations.setdefault((model, OUTV_LABEL, INV_LABEL), []) \
+                .append((len(self.operations), getattr(outv, "id", outv),
+                         getattr(inv, "id", inv), validated_data))
+
+        return self.add_operation(
+            model, step, ("addE", model, step, out_step, in_step),
+            validated_data)
+
+    def generate_query(self, references, operations):
+        """ Returns the traversal writing all of the operations; the
+            references are looked up first, followed by the operations in
+            the order they were added, selecting the written elements
+        """
+        query = "g"
+        for step in references:
+            query += f".V({step}_key).as('{step}')"
+
+        for operation in operations:
+            kind, model, step = operation[:3]
+            steps = [(key, f"{step}_p{index}")
+                     for index, key in enumerate(operation[-1])]
+            if kind == "addV":
+                query += model.generate_create_query(
+                    [("id", f"{step}_id")] + steps, source="")
+            elif kind == "update":
+                query += f".select('{operation[3]}')" + "".join(
+                    f".property('{key}', {name})" for key, name in steps)
+            else:
+                query += f".addE('{model.LABEL}')" + \
+                    f".from('{operation[3]}').to('{operation[4]}')" + \
+                    "".join(f".property('{key}', {name})"
+                            for key, name in steps) + \
+                    model.counter_steps(EDGE_ENDS)
+            query += f".as('{step}')"
+
+        labels = ", ".join(f"'{operation[2]}'" for operation in operations)
+        return query + f".select({labels})"
+
+    def validate(self):
+        """ Runs the batched custom validation of the added edges, raising
+            the first failure (if any)
+        """
+        for (model, outv_label, inv_label), rows in self.validations.items():
+            errors = model.bulk_custom_validation(
+                rows, outv_label=outv_label, inv_label=inv_label)
+            if errors:
+                raise errors[min(errors)]
+
+    def commit(self):
+        """ Validates and writes all of the added operations, setting the
+            `instance` of each of the returned PendingWrites
+        """
+        assert not self.committed, "Unit of work already committed!"
+        self.committed = True
+        if not self.operations:
+            return
+
+        self.validate()
+
+        references = list(self.references.values())
+        query = self.templates.get(
+            (tuple(references), tuple(self.operations)),
+            lambda: self.generate_query(references, self.operations))
+        result = client.submit(query, self.bindings).all().result()
+
+        # An empty result means that one of the referenced vertices doesn't
+        # exist (in which case nothing has been written)
+        if not result:
+            raise CustomValidationFailedException(
+                "One of the referenced vertices doesn't exist!")
+
+        written = result[0] if len(self.pending) > 1 else \
+            {self.pending[0].step: result[0]}
+        identity = identity_map()
+        edges = {}
+        for pending in self.pending:
+            element = written[pending.step]
+            if issubclass(pending.model, Edge):
+                pending.instance = pending.model.edge_to_instance(element)
+                edges.setdefault(pending.model, []).append(
+                    (pending.instance.outV, pending.instance.inV))
+            else:
+                pending.instance = pending.model.vertex_to_instance(element)
+                if identity is not None:
+                    identity.discard(pending.model.LABEL, pending.id)
+
+        for model, pairs in edges.items():
+            model.after_write(pairs)
+        notify_write(
+            [pending.id for pending in self.pending if pending.id] +
+            [i for pairs in edges.values() for pair in pairs for i in pair])
@@ -24,3 +24,43 @@ class ObjectCanNotBeDeletedException(DatabaseException):
     """
     def __init__(self, message):
         super().__init__(message)
+
+
+class DatabaseConnectionException(DatabaseException):
+    """ Raised when a connection to the database could not be established
+        (or re-established) after all of the reconnect attempts
+    """
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class ConnectionPoolTimeoutException(DatabaseException):
+    """ Raised when no pooled connection became available within the
+        configured acquire timeout
+    """
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class InvalidCursorException(DatabaseException):
+    """ Raised when a pagination cursor can't be decoded, or was created for
+        a different ordering than the one requested
+    """
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class RequestThrottledException(DatabaseException):
+    """ Raised when a query could not be submitted within the configured
+        wait time because of the (adaptive) request rate limit
+    """
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class FieldNotLoadedException(DatabaseException, AttributeError):
+    """ Raised when reading a property of a partial instance (built from a
+        query with a `fields` projection) that wasn't part of the fields
+    """
+    def __init__(self, message):
+        super().__init__(message)
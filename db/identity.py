@@ -0,0 +1,56 @@
+""" Provides the request-scoped identity map of the vertices loaded through
+    `Vertex.filter(id=...)`, which is kept on the Flask app context (`g`) so
+    that repeated id lookups within a single request (i.e. the permission
+    decorators and then the view) return the already-loaded instance
+    instead of querying the database again
+"""
+from flask import g, has_app_context
+
+
+class IdentityMap:
+    """ Maps the (label, id) of loaded vertices to their instances """
+    def __init__(self):
+        self.instances = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, label, vertex_id):
+        """ Returns the loaded instance of the vertex, or None """
+        instance = self.instances.get((label, vertex_id))
+        if instance is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return instance
+
+    def add(self, label, instance):
+        self.instances[(label, instance.id)] = instance
+
+    def discard(self, label, vertex_id):
+        """ Removes the vertex (if loaded); used whenever it's written to """
+        self.instances.pop((label, vertex_id), None)
+
+    def clear(self):
+        self.instances.clear()
+
+
+def identity_map():
+    """ Returns the IdentityMap of the current app context (creating it on
+        first use), or None if there's no app context (i.e. scripts or the
+        worker threads of `run_chunks`), in which case nothing is mapped
+    """
+    if not has_app_context():
+        return None
+    if "identity_map" not in g:
+        g.identity_map = IdentityMap()
+    return g.identity_map
+
+
+def clear_identity_map(exception=None):
+    """ Clears the identity map of the current app context; registered as a
+        teardown_request function, as an app context can outlive a single
+        request (i.e. when it's pushed by the test cases)
+    """
+    identity = g.get("identity_map") if has_app_context() else None
+    if identity is not None:
+        identity.clear()
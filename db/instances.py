@@ -0,0 +1,105 @@
+""" Provides the compact instances returned by `Vertex.vertex_to_instance`
+    and `Edge.edge_to_instance`.
+    For every model class a subclass is generated (once) with a slot for
+    each of the properties in it's `properties` schema (along with the
+    model's `COMPACT_SLOTS`), so building thousands of instances from a
+    response doesn't allocate a `__dict__` per instance; a `__dict__` is
+    only created for instances that get attributes outside of the slots.
+    Every slot takes up space whether it's set or not, so only the
+    attributes set on (almost) every instance get one.
+    Partial instances (built from the projected `fields` of a query) raise
+    a FieldNotLoadedException when any other property is read
+"""
+from db.exceptions import FieldNotLoadedException
+from db.loader import Relationship
+
+
+def restore_instance(model, state):
+    """ Re-creates a (pickled) compact instance of the given model class """
+    instance = model.new_compact()
+    for name, value in state.items():
+        setattr(instance, name, value)
+    return instance
+
+
+class CompactInstanceMixin:
+    """ Mixin for the Vertex/Edge classes that generates their compact
+        instance classes through the `compact_class` classmethod.
+        Inheriting classes can extend the `COMPACT_SLOTS` with attributes
+        that aren't part of the properties schema but are set on every
+        instance (i.e. the partition key, or an edge's vertices)
+    """
+    COMPACT_SLOTS = ("id",)
+    # Only set on partial instances (see `new_partial`)
+    _fields = None
+
+    @classmethod
+    def compact_class(cls):
+        """ Returns the compact instance class generated for this class """
+        compact = cls.__dict__.get("_compact_class")
+        if compact is not None:
+            return compact
+
+        slots = tuple(cls.COMPACT_SLOTS) + tuple(
+            name for name in cls.properties if name not in cls.COMPACT_SLOTS)
+        compact = type(cls.__name__, (cls,), {
+            "__slots__": slots,
+            "__module__": cls.__module__,
+            "__qualname__": cls.__qualname__,
+            "__getattr__": CompactInstanceMixin.compact_getattr,
+            "__reduce__": CompactInstanceMixin.compact_reduce,
+            "_model": cls,
+            # Sharing the templates with the model class
+            "_query_templates": cls.query_templates()
+        })
+        cls._compact_class = compact
+        return compact
+
+    @classmethod
+    def new_compact(cls, instance_id=None):
+        """ Returns an (empty) compact instance with the given id; the
+            instance's `__init__` isn't called
+        """
+        compact = cls.__dict__.get("_compact_class") or cls.compact_class()
+        instance = compact.__new__(compact)
+        instance.id = instance_id
+        return instance
+
+    @classmethod
+    def new_partial(cls, instance_id, fields):
+        """ Returns an (empty) compact instance with the given id, that only
+            holds the given properties
+        """
+        instance = cls.new_compact(instance_id)
+        instance._fields = frozenset(fields)
+        return instance
+
+    def compact_getattr(self, name):
+        """ Only called if the regular attribute lookup failed; raises a
+            FieldNotLoadedException for the properties that weren't loaded
+            into partial instances, and loads the (unset) slots of the
+            model's relationships (see db.loader.Relationship)
+        """
+        relationship = getattr(self._model, name, None)
+        if isinstance(relationship, Relationship):
+            return relationship.load(self)
+        if not name.startswith("_") and name in self._model.properties:
+            fields = self._fields
+            if fields is not None and name not in fields:
+                raise FieldNotLoadedException(
+                    f"`{name}` was not loaded for this "
+                    f"{self._model.__name__}; only {sorted(fields)} were")
+        raise AttributeError(
+            f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def compact_reduce(self):
+        """ Pickles compact instances through their model class, as the
+            generated class can't be looked up by it's name
+        """
+        state = dict(getattr(self, "__dict__", {}))
+        for name in type(self).__slots__:
+            try:
+                state[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+        return restore_instance, (self._model, state)
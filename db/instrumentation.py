@@ -0,0 +1,433 @@
+""" Provides the instrumentation layer wrapped around the graph backend,
+    which records the latency, result count, request charge (RUs) and,
+    optionally, response size of every submitted query, tagged with the
+    model method and the Flask endpoint it was submitted from.
+    Queries slower than the slow-query threshold are also kept (with their
+    bindings and, optionally, the server's execution profile) in the
+    SlowQueryLog
+"""
+from gremlin_python.driver.protocol import GremlinServerError
+from flask import has_request_context, request
+from db.backends import GraphBackend
+from concurrent.futures import ThreadPoolExecutor, wait
+from collections import deque
+import threading
+import logging
+import json
+import time
+import sys
+import re
+
+
+logger = logging.getLogger("db.queries")
+
+# The status attributes CosmosDB reports the request charge through
+REQUEST_CHARGE_ATTRIBUTES = ["x-ms-total-request-charge", "x-ms-request-charge"]
+
+
+class LatencyHistogram:
+    """ A fixed-bucket histogram of query latencies (in milliseconds) along
+        with the totals of everything else recorded for the queries
+    """
+    # Upper bounds of the buckets in milliseconds; the last bucket is
+    # unbounded
+    BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0
+        self.max_ms = 0
+        self.results = 0
+        self.response_bytes = 0
+        self.request_charge = 0
+
+    def record(self, sample):
+        index = 0
+        while index < len(self.BUCKETS) and \
+                sample["duration_ms"] > self.BUCKETS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.errors += 1 if sample["error"] else 0
+        self.total_ms += sample["duration_ms"]
+        self.max_ms = max(self.max_ms, sample["duration_ms"])
+        self.results += sample["results"]
+        self.response_bytes += sample["response_bytes"]
+        self.request_charge += sample["request_charge"] or 0
+
+    def percentile(self, percent):
+        """ Returns the upper bound of the bucket holding the given
+            percentile (0-100) of the latencies; None if there are none
+        """
+        if not self.count:
+            return None
+        rank = max(percent / 100 * self.count, 1)
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return self.BUCKETS[index] if index < len(self.BUCKETS) \
+                    else self.max_ms
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3)
+            if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 3),
+            "results": self.results,
+            "response_bytes": self.response_bytes,
+            "request_charge": round(self.request_charge, 3),
+            "buckets": dict(zip(
+                [str(i) for i in self.BUCKETS] + ["inf"], self.buckets))
+        }
+
+
+class QueryMetrics:
+    """ Keeps a LatencyHistogram for every model method (`caller`), Flask
+        endpoint (`endpoint`) and query script (`query`) that submitted
+        queries.
+        The number of histograms per group is capped, with anything above
+        the cap being recorded under the OVERFLOW_KEY
+    """
+    GROUPS = ["caller", "endpoint", "query"]
+    OVERFLOW_KEY = "<other>"
+
+    def __init__(self, max_keys=1000):
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """ Removes all of the recorded samples """
+        with self.lock:
+            self.histograms = {group: {} for group in self.GROUPS}
+
+    def record(self, sample):
+        with self.lock:
+            for group, histograms in self.histograms.items():
+                key = sample[group] or ""
+                if key not in histograms and \
+                        len(histograms) >= self.max_keys:
+                    key = self.OVERFLOW_KEY
+                histograms.setdefault(key, LatencyHistogram()).record(sample)
+
+    def snapshot(self, group="endpoint"):
+        """ Returns the histograms of the given group as dictionaries """
+        with self.lock:
+            return {key: histogram.to_dict() for key, histogram
+                    in self.histograms[group].items()}
+
+    def top(self, group="endpoint", by="request_charge", count=10):
+        """ Returns the `count` (key, stats) pairs of the group with the
+            highest value of the given stat (i.e. request_charge, total_ms)
+        """
+        stats = self.snapshot(group)
+        return sorted(stats.items(), key=lambda i: i[1][by] or 0,
+                      reverse=True)[:count]
+
+
+# Modules whose frames are skipped when looking for a query's caller
+SKIPPED_MODULES = {__name__, "db.traversal", "db.backends"}
+
+
+def find_caller():
+    """ Returns the `Class.method` (or `module.function`) name of the
+        first frame outside of this module (and the traversal builder and
+        the lazy backend)
+    """
+    frame = sys._getframe(1)
+    while frame is not None and \
+            frame.f_globals.get("__name__") in SKIPPED_MODULES:
+        frame = frame.f_back
+    if frame is None:
+        return None
+
+    name = frame.f_code.co_name
+    owner = frame.f_locals.get("cls") or frame.f_locals.get("self")
+    if owner is not None:
+        owner = owner if isinstance(owner, type) else type(owner)
+        return f"{owner.__name__}.{name}"
+    return f"{frame.f_globals.get('__name__')}.{name}"
+
+
+class SlowQueryLog:
+    """ A bounded (ring buffer) log of the queries that took longer than
+        `threshold_ms`, holding the last `size` of them.
+        With `profile`, each slow read-only query is submitted again in the
+        background with the `profile_step` appended (CosmosDB's
+        `executionProfile()`, or `profile()` on other Gremlin servers), and
+        the output is added to it's entry once it arrives; at most
+        `max_pending` profiles run at a time, with the rest being skipped
+    """
+    # Steps that write to the graph; queries with any of these are never
+    # submitted again for profiling
+    WRITE_STEPS = re.compile(r"\.(addV|addE|property|drop)\(")
+    # Bindings that are never logged (matched through the property they're
+    # written into)
+    SENSITIVE_PROPERTIES = {"password"}
+    MAX_BINDING_LENGTH = 200
+
+    def __init__(self, threshold_ms=500, size=100, profile=False,
+                 profile_step="executionProfile", max_pending=2):
+        self.threshold_ms = threshold_ms
+        self.profile = profile
+        self.profile_step = profile_step
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.entries = deque(maxlen=size)
+        self._pending = set()
+        self._executor = None
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(threshold_ms=settings.get("slow_query_ms", 500),
+                   size=settings.get("slow_query_log_size", 100),
+                   profile=settings.get("slow_query_profile", False),
+                   profile_step=settings.get(
+                       "slow_query_profile_step", "executionProfile"))
+
+    def is_slow(self, duration_ms):
+        return self.threshold_ms is not None and \
+            duration_ms >= self.threshold_ms
+
+    @classmethod
+    def redact(cls, message, bindings):
+        """ Returns the bindings with the sensitive values removed and the
+            long values truncated
+        """
+        sensitive = {name for key, name in re.findall(
+            r"property\('(\w+)', (\w+)\)", message)
+            if key in cls.SENSITIVE_PROPERTIES}
+        redacted = {}
+        for name, value in (bindings or {}).items():
+            if name in sensitive:
+                value = "<redacted>"
+            elif isinstance(value, str) and \
+                    len(value) > cls.MAX_BINDING_LENGTH:
+                value = value[:cls.MAX_BINDING_LENGTH] + "..."
+            redacted[name] = value
+        return redacted
+
+    def add(self, sample, bindings, backend=None):
+        """ Adds the (slow) query's sample to the log, profiling it through
+            the given backend if enabled
+        """
+        entry = dict(sample)
+        entry["bindings"] = self.redact(sample["query"], bindings)
+        entry["timestamp"] = time.time()
+        entry["profile"] = None
+        with self.lock:
+            self.entries.append(entry)
+
+        if self.profile and backend is not None and \
+                not self.WRITE_STEPS.search(sample["query"]):
+            self.submit_profile(entry, bindings, backend)
+        return entry
+
+    def submit_profile(self, entry, bindings, backend):
+        with self.lock:
+            if len(self._pending) >= self.max_pending:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_pending)
+            future = self._executor.submit(
+                self.run_profile, entry, bindings, backend)
+            self._pending.add(future)
+        future.add_done_callback(self.profile_done)
+
+    def profile_done(self, future):
+        with self.lock:
+            self._pending.discard(future)
+
+    def run_profile(self, entry, bindings, backend):
+        """ Submits the query again with the profile step appended, and
+            stores the output (or the error) on the entry
+        """
+        query = f"{entry['query']}.{self.profile_step}()"
+        try:
+            entry["profile"] = backend.submit(query, bindings).all().result()
+        except Exception as e:
+            entry["profile"] = {"error": f"{type(e).__name__}: {e}"}
+
+    def flush(self, timeout=None):
+        """ Waits for the pending profiles to complete """
+        with self.lock:
+            pending = list(self._pending)
+        wait(pending, timeout=timeout)
+
+    def snapshot(self):
+        """ Returns the logged entries, the slowest first """
+        with self.lock:
+            entries = [dict(i) for i in self.entries]
+        return sorted(entries, key=lambda i: i["duration_ms"], reverse=True)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def request_charge(status_attributes):
+    """ Returns the request charge in the status attributes (if any) """
+    for attribute in REQUEST_CHARGE_ATTRIBUTES:
+        if attribute in (status_attributes or {}):
+            try:
+                return float(status_attributes[attribute])
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+class InstrumentedBackend(GraphBackend):
+    """ Wraps a GraphBackend, recording a sample for every submitted query
+        into the QueryMetrics and (optionally) logging it as a structured
+        (JSON) line through the `db.queries` logger.
+        The driver doesn't keep the size of the responses, so they're only
+        measured (by serializing the results again) with `response_bytes`;
+        otherwise their size is recorded as 0.
+        All other attributes are looked up on the wrapped backend
+    """
+    def __init__(self, backend, metrics=None, log=False, slow_queries=None,
+                 response_bytes=False):
+        self.backend = backend
+        self.metrics = metrics or QueryMetrics()
+        self.log = log
+        self.slow_queries = slow_queries or SlowQueryLog()
+        self.response_bytes = response_bytes
+
+    @classmethod
+    def from_settings(cls, backend, settings):
+        return cls(backend, log=settings.get("query_log", False),
+                   slow_queries=SlowQueryLog.from_settings(settings),
+                   response_bytes=settings.get("query_response_bytes", False))
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def __getattr__(self, attribute):
+        return getattr(self.backend, attribute)
+
+    def warmup(self, connections=None):
+        return self.backend.warmup(connections)
+
+    @staticmethod
+    def tags():
+        """ Returns the caller/endpoint tags of the query being submitted;
+            the tags are read up front, as the response may be completed on
+            another thread (outside of the request context)
+        """
+        return {
+            "caller": find_caller(),
+            "endpoint": request.endpoint if has_request_context() else None
+        }
+
+    def submit(self, message, bindings=None):
+        """ Submits the message through the wrapped backend and records
+            it's sample once the response is complete
+        """
+        tags = self.tags()
+        start = time.perf_counter()
+        try:
+            result_set = self.backend.submit(message, bindings)
+        except Exception as e:
+            self.record(message, bindings, tags, start, error=e)
+            raise
+
+        if result_set.done.done():
+            self.record_result_set(message, bindings, tags, start, result_set)
+        else:
+            result_set.done.add_done_callback(
+                lambda _: self.record_result_set(
+                    message, bindings, tags, start, result_set))
+        return result_set
+
+    def stream(self, message, bindings=None, batch_size=None):
+        """ Yields the batches streamed by the wrapped backend, recording
+            the sample once the stream is exhausted (or closed)
+        """
+        tags = self.tags()
+        start = time.perf_counter()
+        results, response_bytes, error = 0, 0, None
+        try:
+            for batch in self.backend.stream(message, bindings, batch_size):
+                results += len(batch)
+                response_bytes += self.batch_bytes(batch)
+                yield batch
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.record(message, bindings, tags, start, results=results,
+                        response_bytes=response_bytes, error=error)
+
+    def batch_bytes(self, batch):
+        """ Returns the (JSON) size of the batch of results if the response
+            sizes are measured, 0 otherwise
+        """
+        if not self.response_bytes:
+            return 0
+        return len(json.dumps(batch, default=str))
+
+    def record_result_set(self, message, bindings, tags, start, result_set):
+        """ Records the sample of a completed ResultSet """
+        results, response_bytes = 0, 0
+        # Peeking at the (not yet consumed) batches of the response
+        for batch in list(result_set.stream.queue):
+            results += len(batch)
+            response_bytes += self.batch_bytes(batch)
+
+        self.record(message, bindings, tags, start, results=results,
+                    response_bytes=response_bytes,
+                    status_attributes=result_set.status_attributes,
+                    error=result_set.done.exception())
+
+    def record(self, message, bindings, tags, start, results=0,
+               response_bytes=0, status_attributes=None, error=None):
+        """ Records (and logs) the sample of a completed query, adding it to
+            the SlowQueryLog if it's over the threshold
+        """
+        duration_ms = (time.perf_counter() - start) * 1000
+        if isinstance(error, GremlinServerError):
+            status_attributes = error.status_attributes
+
+        sample = {
+            "query": message,
+            "caller": tags["caller"],
+            "endpoint": tags["endpoint"],
+            "duration_ms": duration_ms,
+            "results": results,
+            "response_bytes": response_bytes,
+            "request_charge": request_charge(status_attributes),
+            "error": type(error).__name__ if error is not None else None
+        }
+        self.metrics.record(sample)
+
+        if self.log:
+            logger.info(json.dumps(sample))
+
+        if self.slow_queries.is_slow(duration_ms):
+            # Profiled through the wrapped backend, so that the profiles
+            # themselves aren't recorded
+            self.slow_queries.add(sample, bindings, self.backend)
+            logger.warning(
+                f"Slow query ({duration_ms:.1f}ms) from {tags['caller']}: "
+                f"{message}")
+
+    def stats(self):
+        """ Returns the wrapped backend's stats along with the per-endpoint
+            query stats
+        """
+        stats = dict(self.backend.stats())
+        stats["query_stats"] = self.metrics.snapshot("endpoint")
+        return stats
+
+    def close(self):
+        self.backend.close()
@@ -0,0 +1,165 @@
+""" Provides the request-scoped DataLoaders used for loading the vertices
+    related to model instances (i.e. the template of a node) in batches.
+    Rather than querying the database once per instance, the lookups of a
+    request are queued on a DataLoader (kept on the Flask app context (`g`),
+    like the identity map) and every queued lookup is loaded through a
+    single query as soon as any one of them is read; the results are then
+    cached for the rest of the request
+"""
+from flask import g, has_app_context
+
+
+class DataLoader:
+    """ Loads values by their keys through `batch_load`, which receives a
+        list of keys and returns a {key: value} dictionary.
+        Keys are queued through `queue`, and all of the queued keys are
+        loaded together (in batches of at most `max_batch_size` keys) the
+        next time a value is read through `load`/`load_many`. Keys missing
+        from the batch's result are loaded as `[]` (with `many`) or None
+    """
+    def __init__(self, batch_load, many=False, max_batch_size=None):
+        self.batch_load = batch_load
+        self.many = many
+        self.max_batch_size = max_batch_size
+        self.cache = {}
+        # Used as an (insertion) ordered set
+        self.pending = {}
+        self.batches = 0
+
+    def queue(self, keys):
+        """ Queues the keys that haven't been loaded yet """
+        for key in keys:
+            if key not in self.cache:
+                self.pending[key] = None
+
+    def prime(self, key, value):
+        """ Stores an already-known value, so it's never loaded """
+        self.cache[key] = value
+        self.pending.pop(key, None)
+
+    def load(self, key):
+        """ Returns the value of the key, loading it along with all of the
+            other queued keys if it hasn't been loaded yet
+        """
+        self.queue([key])
+        self.dispatch()
+        return self.cache[key]
+
+    def load_many(self, keys):
+        keys = list(keys)
+        self.queue(keys)
+        self.dispatch()
+        return [self.cache[key] for key in keys]
+
+    def dispatch(self):
+        """ Loads all of the queued keys """
+        keys = list(self.pending)
+        if not keys:
+            return
+        self.pending.clear()
+        size = self.max_batch_size or len(keys)
+        for start in range(0, len(keys), size):
+            batch = keys[start:start + size]
+            values = self.batch_load(batch)
+            self.batches += 1
+            for key in batch:
+                self.cache[key] = values.get(key, [] if self.many else None)
+
+    def clear(self):
+        self.cache.clear()
+        self.pending.clear()
+
+
+def dataloader(name, batch_load, **options):
+    """ Returns the DataLoader with the given name from the current app
+        context (creating it on first use); outside of an app context (i.e.
+        in scripts) a new DataLoader is returned every time, so nothing is
+        cached
+    """
+    if not has_app_context():
+        return DataLoader(batch_load, **options)
+    if "dataloaders" not in g:
+        g.dataloaders = {}
+    if name not in g.dataloaders:
+        g.dataloaders[name] = DataLoader(batch_load, **options)
+    return g.dataloaders[name]
+
+
+def clear_dataloaders(exception=None):
+    """ Clears the DataLoaders of the current app context; registered as a
+        teardown_request function (see `clear_identity_map`)
+    """
+    loaders = g.get("dataloaders") if has_app_context() else None
+    if loaders is not None:
+        loaders.clear()
+
+
+class Relationship:
+    """ Descriptor for the vertices related to a model's instances, which
+        are loaded (by the instances' ids) through the request's DataLoader
+        of `batch_load` when the attribute is first read, i.e:
+            class Message(Vertex):
+                author = Relationship(
+                    lambda ids: UserSentMessage.get_authors(ids))
+        Assigning the attribute (i.e. when the related vertices were fetched
+        along with the instance) stores it on the instance without loading
+        it; compact instances with a slot for the attribute load it through
+        `compact_getattr` instead.
+        `queue` can be called with all of the instances that are about to
+        be read (i.e. by a list serializer), so that they're all loaded
+        through a single query
+    """
+    def __init__(self, batch_load, many=False, max_batch_size=None):
+        self.batch_load = batch_load
+        self.many = many
+        self.max_batch_size = max_batch_size
+        self.name = None
+        self.loader_name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.loader_name = f"{owner.__name__}.{name}"
+
+    def loader(self):
+        return dataloader(
+            self.loader_name, self.batch_load, many=self.many,
+            max_batch_size=self.max_batch_size)
+
+    def is_loaded(self, instance):
+        if self.name in getattr(instance, "__dict__", {}):
+            return True
+        # The attribute is a slot of compact instances (see db.instances)
+        slot = getattr(type(instance), self.name, None)
+        if slot is None or slot is self:
+            return False
+        try:
+            slot.__get__(instance, type(instance))
+        except AttributeError:
+            return False
+        return True
+
+    def queue(self, instances):
+        """ Queues the instances whose attribute hasn't been loaded yet """
+        self.loader().queue(
+            [i.id for i in instances if not self.is_loaded(i)])
+
+    def load(self, instance):
+        """ Loads the instance's attribute through the request's DataLoader
+            and stores it on the instance
+        """
+        value = self.loader().load(instance.id)
+        setattr(instance, self.name, value)
+        return value
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        if self.name in instance.__dict__:
+            return instance.__dict__[self.name]
+        return self.load(instance)
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+
+    def __delete__(self, instance):
+        instance.__dict__.pop(self.name, None)
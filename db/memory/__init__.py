@@ -0,0 +1,98 @@
+""" Provides the MemoryGraphBackend; an in-process graph that executes the
+    same Gremlin scripts (and bindings) the models send to CosmosDB, so the
+    test suite and local development can run without a database server
+"""
+from gremlin_python.driver.protocol import GremlinServerError
+from gremlin_python.driver.resultset import ResultSet
+from concurrent.futures import Future
+from db.backends import GraphBackend
+from .graph import MemoryGraph
+from .parser import parse, GremlinSyntaxError
+from .executor import Executor, GremlinExecutionError, to_graphson
+from .traversal import Traversal
+import threading
+import queue
+import uuid
+
+
+class MemoryGraphBackend(GraphBackend):
+    """ Executes Gremlin scripts against a MemoryGraph.
+        Parsed scripts are cached by their text, which (as the models bind
+        all of their values) means each query template is only parsed once.
+        With a `partition_key`, the V() steps accept CosmosDB's partitioned
+        `[partition_key_value, id]` vertex ids
+    """
+    name = "memory"
+
+    # The number of results put in each of the ResultSet's batches
+    BATCH_SIZE = 64
+
+    def __init__(self, graph=None, partition_key=None):
+        self.graph = graph or MemoryGraph()
+        self.partition_key = partition_key
+        self.parsed = {}
+        self.parsed_lock = threading.Lock()
+        self.queries = 0
+
+    @classmethod
+    def from_settings(cls, settings, **kwargs):
+        """ Returns a new backend; none of the connection settings (other
+            than the partition key) apply
+        """
+        kwargs.setdefault("partition_key", settings.get("partition_key"))
+        return cls(**kwargs)
+
+    def parse(self, message):
+        """ Returns the parsed (and cached) representation of the script """
+        with self.parsed_lock:
+            parsed = self.parsed.get(message)
+        if parsed is None:
+            parsed = parse(message)
+            with self.parsed_lock:
+                self.parsed[message] = parsed
+        return parsed
+
+    def execute(self, message, bindings=None):
+        """ Returns the (GraphSON-like) results of the script """
+        parsed = self.parse(message)
+        if not isinstance(parsed, Traversal):
+            return [parsed]
+        with self.graph.lock:
+            executor = Executor(
+                self.graph, bindings, partition_key=self.partition_key)
+            return [to_graphson(i.obj) for i in executor.execute(parsed)]
+
+    def submit(self, message, bindings=None):
+        """ Executes the script and returns a completed ResultSet """
+        self.queries += 1
+        stream = queue.Queue()
+        result_set = ResultSet(stream, str(uuid.uuid4()))
+        done = Future()
+        result_set.done = done
+
+        try:
+            results = self.execute(message, bindings)
+        except (GremlinSyntaxError, GremlinExecutionError, ValueError) as e:
+            done.set_exception(GremlinServerError({
+                "code": 597,
+                "message": f"{type(e).__name__}: {e}",
+                "attributes": {}
+            }))
+            return result_set
+
+        for start in range(0, len(results), self.BATCH_SIZE):
+            stream.put_nowait(results[start:start + self.BATCH_SIZE])
+        done.set_result(None)
+        return result_set
+
+    def stats(self):
+        """ Returns the number of elements and submitted queries """
+        return {
+            "vertices": len(self.graph.vertices),
+            "edges": len(self.graph.edges),
+            "queries": self.queries,
+            "parsed_scripts": len(self.parsed)
+        }
+
+    def close(self):
+        self.graph.clear()
@@ -0,0 +1,902 @@
+""" Executes Traversals against a MemoryGraph, following the semantics of
+    the TinkerPop reference implementation for the steps used by the
+    models
+"""
+from .graph import MemoryVertex, MemoryEdge
+from .traversal import Traversal, Predicate, Token, Variable
+
+
+class GremlinExecutionError(Exception):
+    """ Raised when a traversal can't be executed; the memory backend
+        returns these as the same server errors (597) a Gremlin server
+        would respond with
+    """
+    pass
+
+
+class Path:
+    """ The history of objects (and their step labels) of a traverser """
+    __slots__ = ("objects", "labels")
+
+    def __init__(self, objects, labels):
+        self.objects = objects
+        self.labels = labels
+
+
+class Traverser:
+    """ Holds the current object of a traversal along with it's path and
+        the number of times it went through the current repeat step
+    """
+    __slots__ = ("obj", "path", "loops")
+
+    def __init__(self, obj, path=None, loops=0):
+        self.obj = obj
+        self.path = path if path is not None else ((obj, ()),)
+        self.loops = loops
+
+    def extend(self, obj):
+        """ Returns a traverser at the given object with it in the path """
+        return Traverser(obj, self.path + ((obj, ()),), self.loops)
+
+    def labeled(self, labels):
+        """ Returns the traverser with the labels added to the current
+            object in the path
+        """
+        obj, existing = self.path[-1]
+        path = self.path[:-1] + ((obj, existing + tuple(labels)),)
+        return Traverser(self.obj, path, self.loops)
+
+    def with_loops(self, loops):
+        return Traverser(self.obj, self.path, loops)
+
+
+def to_graphson(obj):
+    """ Converts a result into the structure a CosmosDB response would be
+        deserialized into
+    """
+    if isinstance(obj, (MemoryVertex, MemoryEdge)):
+        return obj.to_graphson()
+    if isinstance(obj, Path):
+        return {
+            "labels": [list(labels) for labels in obj.labels],
+            "objects": [to_graphson(i) for i in obj.objects]
+        }
+    if isinstance(obj, dict):
+        return {to_graphson(key) if isinstance(key, (list, dict)) else
+                (key.id if isinstance(key, (MemoryVertex, MemoryEdge))
+                 else key): to_graphson(value)
+                for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_graphson(i) for i in obj]
+    return obj
+
+
+def identity_key(obj):
+    """ Returns a hashable key identifying the object (for dedup) """
+    if isinstance(obj, (MemoryVertex, MemoryEdge)):
+        return (type(obj), obj.id)
+    try:
+        hash(obj)
+        return obj
+    except TypeError:
+        return repr(to_graphson(obj))
+
+
+def sort_key(value):
+    """ Returns a key that can order values of mixed types """
+    if isinstance(value, (MemoryVertex, MemoryEdge)):
+        value = value.id
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    return (4, repr(value))
+
+
+class Executor:
+    """ Runs a traversal (and all of it's nested traversals) against the
+        graph with the given bindings
+    """
+    # The maximum number of iterations of a single repeat step
+    MAX_LOOPS = 10000
+
+    def __init__(self, graph, bindings=None, partition_key=None):
+        self.graph = graph
+        self.bindings = bindings or {}
+        self.partition_key = partition_key
+        self.side_effects = {}
+
+    # ---- Helpers ----
+    def resolve(self, value):
+        """ Resolves all of the variables (bindings) in the value """
+        if isinstance(value, Variable):
+            if value.name not in self.bindings:
+                raise GremlinExecutionError(
+                    f"No such property: {value.name}")
+            return self.bindings[value.name]
+        if isinstance(value, Predicate) and \
+                isinstance(value.value, (Variable, list)):
+            return Predicate(value.operator, self.resolve(value.value))
+        if isinstance(value, list):
+            return [self.resolve(i) for i in value]
+        return value
+
+    def resolve_args(self, step):
+        return [self.resolve(i) for i in step.args]
+
+    def run(self, traversal, traverser):
+        """ Runs the nested traversal for a single traverser and returns
+            the resulting traversers
+        """
+        if not isinstance(traversal, Traversal):
+            # Constants used in place of traversals (i.e. `by(constant)`)
+            return [traverser.extend(self.resolve(traversal))]
+        if traversal.source == "g":
+            return self.execute(traversal)
+        return self.execute(traversal, [traverser])
+
+    def first(self, traversal, traverser):
+        """ Returns a (found, value) tuple for the first result of the
+            nested traversal
+        """
+        results = self.run(traversal, traverser)
+        if not results:
+            return False, None
+        return True, results[0].obj
+
+    def execute(self, traversal, traversers=None):
+        """ Runs all of the steps of the traversal; the traversal starts
+            with it's first step if no traversers are given
+        """
+        steps = traversal.steps
+        if traversers is None:
+            if not steps:
+                return []
+            traversers = self.start(steps[0], steps[1:])
+            steps = steps[1:]
+
+        for step in steps:
+            handler = getattr(self, f"step_{step.name}", None)
+            if handler is None:
+                raise GremlinExecutionError(
+                    f"Unsupported step `{step.name}`")
+            traversers = handler(step, traversers)
+            if not isinstance(traversers, list):
+                traversers = list(traversers)
+
+        return traversers
+
+    def start(self, step, following):
+        """ Returns the traversers generated by a start step """
+        args = self.resolve_args(step)
+        if step.name == "V":
+            ids = self.flatten_ids(args, partitioned=True)
+            label = None
+            if ids is None:
+                ids, label = self.index_hints(following)
+            return [Traverser(v) for v in self.get_vertices(ids, label)]
+        if step.name == "E":
+            return [Traverser(e) for e in
+                    self.graph.get_edges(ids=self.flatten_ids(args))]
+        if step.name == "inject":
+            return [Traverser(i) for i in args]
+        if step.name == "addV":
+            label = args[0] if args else "vertex"
+            return [Traverser(self.graph.add_vertex(label))]
+
+        raise GremlinExecutionError(
+            f"`{step.name}` can not be used to start a traversal")
+
+    def flatten_ids(self, args, partitioned=False):
+        """ Returns the ids given to a V()/E() step (None for all).
+            With `partitioned` (V() steps of a partitioned graph), the
+            `[partition_key_value, id]` ids are returned as
+            (partition_key_value, id) tuples
+        """
+        if not args:
+            return None
+        partitioned = partitioned and self.partition_key is not None
+        ids = []
+        for arg in args:
+            if partitioned and self.is_partitioned_id(arg):
+                ids.append(tuple(arg))
+            elif isinstance(arg, (list, tuple)):
+                ids += [tuple(i) if partitioned and self.is_partitioned_id(i)
+                        else self.element_id(i) for i in arg]
+            else:
+                ids.append(self.element_id(arg))
+        return ids
+
+    @staticmethod
+    def is_partitioned_id(value):
+        """ Returns whether the value is a `[partition_key_value, id]` pair """
+        return isinstance(value, (list, tuple)) and len(value) == 2 and \
+            all(isinstance(i, str) for i in value)
+
+    def get_vertices(self, ids, label=None):
+        """ Returns the vertices with the given ids (and label); partitioned
+            ids only match the vertex if it's in the given partition
+        """
+        if ids is None:
+            return self.graph.get_vertices(label=label)
+        # The same id can be looked up in several partitions (of which
+        # only the vertex's own partition matches)
+        partitions = {}
+        for i in ids:
+            if isinstance(i, tuple):
+                partitions.setdefault(i[1], set()).add(i[0])
+        ids = [i[1] if isinstance(i, tuple) else i for i in ids]
+        vertices = self.graph.get_vertices(
+            ids=list(dict.fromkeys(ids)) if partitions else ids, label=label)
+        if not partitions:
+            return vertices
+        return [v for v in vertices if v.id not in partitions or
+                v.value(self.partition_key) in partitions[v.id]]
+
+    @staticmethod
+    def element_id(value):
+        if isinstance(value, (MemoryVertex, MemoryEdge)):
+            return value.id
+        if isinstance(value, dict) and "id" in value:
+            return value["id"]
+        return value
+
+    def index_hints(self, steps):
+        """ Looks through the filters following a `V()` for an id or label
+            that the vertex indexes can be used for instead of a scan
+        """
+        ids, label = None, None
+        for step in steps:
+            if step.name not in ("has", "hasLabel", "hasId"):
+                break
+            args = self.resolve_args(step)
+            if step.name == "hasLabel" and len(args) == 1 and \
+                    isinstance(args[0], str):
+                label = args[0]
+            elif step.name == "hasId" and \
+                    all(isinstance(i, str) for i in args):
+                ids = args
+            elif step.name == "has" and len(args) >= 2:
+                key, condition = args[-2], args[-1]
+                if len(args) == 3 and isinstance(args[0], str):
+                    label = args[0]
+                if self.key_name(key) != "id":
+                    continue
+                if isinstance(condition, str):
+                    ids = [condition]
+                elif isinstance(condition, Predicate) and \
+                        condition.operator in ("eq", "within"):
+                    value = condition.value
+                    ids = value if isinstance(value, list) else [value]
+        return ids, label
+
+    @staticmethod
+    def key_name(key):
+        if isinstance(key, Token):
+            return key.name
+        return key
+
+    def property_values(self, obj, key):
+        """ Returns all of the values of the property for the object """
+        key = self.key_name(key)
+        if isinstance(obj, (MemoryVertex, MemoryEdge)):
+            if key == "id":
+                return [obj.id]
+            if key == "label":
+                return [obj.label]
+            return obj.values(key)
+        if isinstance(obj, dict):
+            return [obj[key]] if key in obj else []
+        return []
+
+    def matches(self, value, condition):
+        if isinstance(condition, Predicate):
+            return condition.test(value)
+        return value == condition
+
+    def by_value(self, by, traverser):
+        """ Returns a (found, value) tuple for a by() modulator """
+        if not by:
+            return True, traverser.obj
+        modulator = by[0]
+        if isinstance(modulator, Traversal):
+            return self.first(modulator, traverser)
+        if isinstance(modulator, Token):
+            if modulator.name in ("id", "label"):
+                return True, self.property_values(
+                    traverser.obj, modulator.name)[0]
+            # Order tokens on their own (i.e. `by(decr)`)
+            return True, traverser.obj
+        values = self.property_values(traverser.obj, self.resolve(modulator))
+        if not values:
+            return False, None
+        return True, values[0]
+
+    def by_error(self, traverser, modulator):
+        return GremlinExecutionError(
+            "The provided traverser does not map to a value: "
+            f"{traverser.obj}->{modulator}")
+
+    # ---- Filter steps ----
+    def step_has(self, step, traversers):
+        args = self.resolve_args(step)
+        label = None
+        if len(args) == 1:
+            key, condition = args[0], None
+        elif len(args) == 2:
+            key, condition = args
+        else:
+            label, key, condition = args[:3]
+
+        result = []
+        for traverser in traversers:
+            obj = traverser.obj
+            if label is not None and getattr(obj, "label", None) != label:
+                continue
+            values = self.property_values(obj, key)
+            if condition is None:
+                if values:
+                    result.append(traverser)
+            elif isinstance(condition, Traversal):
+                if any(self.run(condition, traverser.extend(v))
+                       for v in values):
+                    result.append(traverser)
+            elif any(self.matches(v, condition) for v in values):
+                result.append(traverser)
+        return result
+
+    def step_hasLabel(self, step, traversers):
+        labels = self.resolve_args(step)
+        return [t for t in traversers if any(
+            self.matches(getattr(t.obj, "label", None), label)
+            for label in labels)]
+
+    def step_hasId(self, step, traversers):
+        ids = self.flatten_ids(self.resolve_args(step)) or []
+        return [t for t in traversers if getattr(t.obj, "id", None) in ids]
+
+    def step_hasNot(self, step, traversers):
+        key = self.resolve_args(step)[0]
+        return [t for t in traversers
+                if not self.property_values(t.obj, key)]
+
+    def step_is(self, step, traversers):
+        condition = self.resolve_args(step)[0]
+        return [t for t in traversers if self.matches(t.obj, condition)]
+
+    def step_filter(self, step, traversers):
+        return [t for t in traversers if self.run(step.args[0], t)]
+
+    def step_where(self, step, traversers):
+        condition = step.args[0]
+        if isinstance(condition, Traversal):
+            return self.step_filter(step, traversers)
+        raise GremlinExecutionError("Only where(traversal) is supported")
+
+    def step_not(self, step, traversers):
+        return [t for t in traversers if not self.run(step.args[0], t)]
+
+    def step_or(self, step, traversers):
+        return [t for t in traversers
+                if any(self.run(i, t) for i in step.args)]
+
+    def step_and(self, step, traversers):
+        return [t for t in traversers
+                if all(self.run(i, t) for i in step.args)]
+
+    def step_dedup(self, step, traversers):
+        seen = set()
+        result = []
+        for traverser in traversers:
+            found, value = self.by_value(
+                step.by[0] if step.by else (), traverser)
+            key = identity_key(value)
+            if key not in seen:
+                seen.add(key)
+                result.append(traverser)
+        return result
+
+    def step_limit(self, step, traversers):
+        args = self.resolve_args(step)
+        return traversers[:int(args[-1])]
+
+    def step_range(self, step, traversers):
+        args = self.resolve_args(step)
+        low, high = int(args[-2]), int(args[-1])
+        return traversers[low:] if high == -1 else traversers[low:high]
+
+    def step_skip(self, step, traversers):
+        return traversers[int(self.resolve_args(step)[-1]):]
+
+    def step_tail(self, step, traversers):
+        args = self.resolve_args(step)
+        count = int(args[-1]) if args else 1
+        return traversers[-count:] if count else []
+
+    def step_simplePath(self, step, traversers):
+        return [t for t in traversers if len(
+            {identity_key(obj) for obj, _ in t.path}) == len(t.path)]
+
+    # ---- Map/FlatMap steps ----
+    def adjacent(self, traversers, direction, labels, edges_only=False):
+        result = []
+        for traverser in traversers:
+            vertex = traverser.obj
+            if not isinstance(vertex, MemoryVertex):
+                continue
+            for edge in self.graph.vertex_edges(vertex, direction, labels):
+                if edges_only:
+                    result.append(traverser.extend(edge))
+                elif direction == "out":
+                    result.append(traverser.extend(edge.in_v))
+                elif direction == "in":
+                    result.append(traverser.extend(edge.out_v))
+                else:
+                    other = edge.in_v if edge.out_v is vertex else edge.out_v
+                    result.append(traverser.extend(other))
+        return result
+
+    def step_out(self, step, traversers):
+        return self.adjacent(traversers, "out", self.resolve_args(step))
+
+    def step_in(self, step, traversers):
+        return self.adjacent(traversers, "in", self.resolve_args(step))
+
+    def step_both(self, step, traversers):
+        return self.adjacent(traversers, "both", self.resolve_args(step))
+
+    def step_outE(self, step, traversers):
+        return self.adjacent(traversers, "out", self.resolve_args(step),
+                             edges_only=True)
+
+    def step_inE(self, step, traversers):
+        return self.adjacent(traversers, "in", self.resolve_args(step),
+                             edges_only=True)
+
+    def step_bothE(self, step, traversers):
+        return self.adjacent(traversers, "both", self.resolve_args(step),
+                             edges_only=True)
+
+    def step_inV(self, step, traversers):
+        return [t.extend(t.obj.in_v) for t in traversers
+                if isinstance(t.obj, MemoryEdge)]
+
+    def step_outV(self, step, traversers):
+        return [t.extend(t.obj.out_v) for t in traversers
+                if isinstance(t.obj, MemoryEdge)]
+
+    def step_bothV(self, step, traversers):
+        result = []
+        for t in traversers:
+            if isinstance(t.obj, MemoryEdge):
+                result += [t.extend(t.obj.out_v), t.extend(t.obj.in_v)]
+        return result
+
+    def step_otherV(self, step, traversers):
+        result = []
+        for t in traversers:
+            if not isinstance(t.obj, MemoryEdge):
+                continue
+            previous = t.path[-2][0] if len(t.path) > 1 else None
+            edge = t.obj
+            result.append(t.extend(
+                edge.in_v if previous is edge.out_v else edge.out_v))
+        return result
+
+    def step_V(self, step, traversers):
+        ids = self.flatten_ids(self.resolve_args(step), partitioned=True)
+        vertices = self.get_vertices(ids)
+        return [t.extend(v) for t in traversers for v in vertices]
+
+    def step_E(self, step, traversers):
+        edges = self.graph.get_edges(ids=self.flatten_ids(
+            self.resolve_args(step)))
+        return [t.extend(e) for t in traversers for e in edges]
+
+    def step_values(self, step, traversers):
+        keys = self.resolve_args(step)
+        result = []
+        for traverser in traversers:
+            obj = traverser.obj
+            if isinstance(obj, (MemoryVertex, MemoryEdge)):
+                for key in keys or list(obj.properties):
+                    for value in obj.values(key):
+                        result.append(traverser.extend(value))
+            elif isinstance(obj, dict):
+                for key in keys or list(obj):
+                    if key in obj:
+                        result.append(traverser.extend(obj[key]))
+        return result
+
+    def step_valueMap(self, step, traversers):
+        args = self.resolve_args(step)
+        include_tokens = bool(args) and isinstance(args[0], bool) and args[0]
+        keys = [i for i in args if isinstance(i, str)]
+        result = []
+        for traverser in traversers:
+            obj = traverser.obj
+            if isinstance(obj, MemoryVertex):
+                values = {key: obj.values(key)
+                          for key in keys or list(obj.properties)
+                          if key in obj.properties}
+            elif isinstance(obj, MemoryEdge):
+                values = {key: obj.properties[key]
+                          for key in keys or list(obj.properties)
+                          if key in obj.properties}
+            else:
+                continue
+            if include_tokens:
+                values["id"] = obj.id
+                values["label"] = obj.label
+            result.append(traverser.extend(values))
+        return result
+
+    def step_id(self, step, traversers):
+        return [t.extend(t.obj.id) for t in traversers
+                if hasattr(t.obj, "id")]
+
+    def step_label(self, step, traversers):
+        return [t.extend(t.obj.label) for t in traversers
+                if hasattr(t.obj, "label")]
+
+    def step_constant(self, step, traversers):
+        value = self.resolve_args(step)[0]
+        return [t.extend(value) for t in traversers]
+
+    def step_identity(self, step, traversers):
+        return traversers
+
+    def step_loops(self, step, traversers):
+        return [t.extend(t.loops) for t in traversers]
+
+    def step_unfold(self, step, traversers):
+        result = []
+        for traverser in traversers:
+            obj = traverser.obj
+            if isinstance(obj, (list, tuple)):
+                result += [traverser.extend(i) for i in obj]
+            elif isinstance(obj, dict):
+                result += [traverser.extend({key: value})
+                           for key, value in obj.items()]
+            elif isinstance(obj, Path):
+                result += [traverser.extend(i) for i in obj.objects]
+            else:
+                result.append(traverser)
+        return result
+
+    def step_map(self, step, traversers):
+        result = []
+        for traverser in traversers:
+            found, value = self.first(step.args[0], traverser)
+            if found:
+                result.append(traverser.extend(value))
+        return result
+
+    def step_flatMap(self, step, traversers):
+        result = []
+        for traverser in traversers:
+            result += self.run(step.args[0], traverser)
+        return result
+
+    def step_path(self, step, traversers):
+        result = []
+        for traverser in traversers:
+            path = Path([obj for obj, _ in traverser.path],
+                        [list(labels) for _, labels in traverser.path])
+            result.append(traverser.extend(path))
+        return result
+
+    def step_as(self, step, traversers):
+        labels = self.resolve_args(step)
+        return [t.labeled(labels) for t in traversers]
+
+    def select_value(self, traverser, key):
+        """ Returns a (found, value) tuple for the key from the current
+            object (if it's a map), the path labels or the side effects
+        """
+        if isinstance(traverser.obj, dict) and key in traverser.obj:
+            return True, traverser.obj[key]
+        for obj, labels in reversed(traverser.path):
+            if key in labels:
+                return True, obj
+        if key in self.side_effects:
+            return True, self.side_effects[key]
+        return False, None
+
+    def step_select(self, step, traversers):
+        keys = [i for i in self.resolve_args(step)
+                if not isinstance(i, Token)]
+        result = []
+        for traverser in traversers:
+            values = {}
+            for index, key in enumerate(keys):
+                found, value = self.select_value(traverser, key)
+                if not found:
+                    break
+                if step.by:
+                    by = step.by[index % len(step.by)]
+                    found, value = self.by_value(
+                        by, traverser.extend(value))
+                    if not found:
+                        raise self.by_error(traverser, by)
+                values[key] = value
+            else:
+                value = values[keys[0]] if len(keys) == 1 else values
+                result.append(traverser.extend(value))
+        return result
+
+    def step_project(self, step, traversers):
+        keys = self.resolve_args(step)
+        result = []
+        for traverser in traversers:
+            projection = {}
+            for index, key in enumerate(keys):
+                by = step.by[index % len(step.by)] if step.by else ()
+                found, value = self.by_value(by, traverser)
+                if not found:
+                    raise self.by_error(traverser, by)
+                projection[key] = value
+            result.append(traverser.extend(projection))
+        return result
+
+    def step_order(self, step, traversers):
+        result = list(traversers)
+        modulators = step.by or [()]
+        # Sorting by the last modulator first keeps the earlier ones as the
+        # primary sort keys (the sort is stable)
+        for by in reversed(modulators):
+            descending = any(isinstance(i, Token) and i.name == "decr"
+                             for i in by)
+            criteria = tuple(i for i in by if not (
+                isinstance(i, Token) and i.name in ("decr", "incr")))
+
+            def key(traverser, criteria=criteria):
+                found, value = self.by_value(criteria, traverser)
+                if not found:
+                    raise self.by_error(traverser, criteria)
+                return sort_key(value)
+            result.sort(key=key, reverse=descending)
+        return result
+
+    # ---- Barrier steps ----
+    def step_count(self, step, traversers):
+        return [Traverser(len(traversers))]
+
+    def step_fold(self, step, traversers):
+        return [Traverser([t.obj for t in traversers])]
+
+    def step_sum(self, step, traversers):
+        return [Traverser(sum(t.obj for t in traversers))]
+
+    def step_max(self, step, traversers):
+        values = [t.obj for t in traversers]
+        return [Traverser(max(values))] if values else []
+
+    def step_min(self, step, traversers):
+        values = [t.obj for t in traversers]
+        return [Traverser(min(values))] if values else []
+
+    def step_mean(self, step, traversers):
+        values = [t.obj for t in traversers]
+        return [Traverser(sum(values) / len(values))] if values else []
+
+    def step_groupCount(self, step, traversers):
+        counts = {}
+        for traverser in traversers:
+            by = step.by[0] if step.by else ()
+            found, value = self.by_value(by, traverser)
+            if found:
+                key = value.id if isinstance(
+                    value, (MemoryVertex, MemoryEdge)) else value
+                counts[key] = counts.get(key, 0) + 1
+        return [Traverser(counts)]
+
+    def step_store(self, step, traversers):
+        key = self.resolve_args(step)[0]
+        collection = self.side_effects.setdefault(key, [])
+        for traverser in traversers:
+            collection.append(traverser.obj)
+        return traversers
+
+    step_aggregate = step_store
+
+    def step_cap(self, step, traversers):
+        keys = self.resolve_args(step)
+        if len(keys) == 1:
+            return [Traverser(list(self.side_effects.get(keys[0], [])))]
+        return [Traverser({key: list(self.side_effects.get(key, []))
+                           for key in keys})]
+
+    def step_sideEffect(self, step, traversers):
+        for traverser in traversers:
+            self.run(step.args[0], traverser)
+        return traversers
+
+    # ---- Branch steps ----
+    def step_coalesce(self, step, traversers):
+        result = []
+        for traverser in traversers:
+            for branch in step.args:
+                branch_result = self.run(branch, traverser)
+                if branch_result:
+                    result += branch_result
+                    break
+        return result
+
+    def step_union(self, step, traversers):
+        result = []
+        for traverser in traversers:
+            for branch in step.args:
+                result += self.run(branch, traverser)
+        return result
+
+    def step_optional(self, step, traversers):
+        result = []
+        for traverser in traversers:
+            result += self.run(step.args[0], traverser) or [traverser]
+        return result
+
+    def step_choose(self, step, traversers):
+        result = []
+        if len(step.args) >= 2:
+            condition, true_branch = step.args[0], step.args[1]
+            false_branch = step.args[2] if len(step.args) > 2 else None
+            for traverser in traversers:
+                if isinstance(condition, Predicate):
+                    matched = self.resolve(condition).test(traverser.obj)
+                else:
+                    matched = bool(self.run(condition, traverser))
+                if matched:
+                    result += self.run(true_branch, traverser)
+                elif false_branch is not None:
+                    result += self.run(false_branch, traverser)
+                else:
+                    result.append(traverser)
+            return result
+
+        options = [(self.resolve(key), branch)
+                   for key, branch in step.options]
+        for traverser in traversers:
+            found, choice = self.first(step.args[0], traverser)
+            branch = None
+            for key, option in options:
+                if found and not isinstance(key, Token) and key == choice:
+                    branch = option
+                    break
+            if branch is None:
+                branch = next((option for key, option in options
+                               if key == Token("none")), None)
+            # Traversers that don't match any option are filtered
+            if branch is not None:
+                result += self.run(branch, traverser)
+        return result
+
+    def step_repeat(self, step, traversers):
+        body = step.args[0]
+        until = step.modulators.get("until")
+        emit = step.modulators.get("emit")
+        times = step.modulators.get("times")
+        until_first = (until or times or ((), False))[1]
+        emit_first = (emit or ((), False))[1]
+        max_loops = int(self.resolve(times[0][0])) if times else None
+
+        def until_check(traverser):
+            if max_loops is not None and traverser.loops >= max_loops:
+                return True
+            if until is None:
+                return False
+            condition = until[0][0]
+            if isinstance(condition, Predicate):
+                return self.resolve(condition).test(traverser.obj)
+            return bool(self.run(condition, traverser))
+
+        def emit_check(traverser):
+            if emit is None:
+                return False
+            if not emit[0]:
+                return True
+            return bool(self.run(emit[0][0], traverser))
+
+        output, pending = [], []
+
+        def enter(traverser):
+            if until_first and until_check(traverser):
+                output.append(traverser.with_loops(0))
+                return
+            pending.append(traverser)
+            if emit_first and emit_check(traverser):
+                output.append(traverser.with_loops(0))
+
+        for traverser in traversers:
+            enter(traverser)
+
+        iterations = 0
+        while pending:
+            iterations += 1
+            if iterations > self.MAX_LOOPS:
+                raise GremlinExecutionError(
+                    "Repeat step exceeded the maximum number of loops")
+            batch, pending = pending, []
+            for traverser in self.execute(body, batch):
+                traverser = traverser.with_loops(traverser.loops + 1)
+                if not until_first and until_check(traverser):
+                    output.append(traverser.with_loops(0))
+                    continue
+                if until_first or emit_first:
+                    enter(traverser)
+                else:
+                    pending.append(traverser)
+                if not emit_first and emit_check(traverser):
+                    output.append(traverser.with_loops(0))
+
+        return output
+
+    # ---- Mutation steps ----
+    def step_addV(self, step, traversers):
+        args = self.resolve_args(step)
+        label = args[0] if args else "vertex"
+        return [t.extend(self.graph.add_vertex(label)) for t in traversers]
+
+    def edge_endpoint(self, target, traverser):
+        """ Returns the vertex referenced by an addE's to()/from() """
+        if isinstance(target, Traversal):
+            found, vertex = self.first(target, traverser)
+        else:
+            found, vertex = self.select_value(traverser, self.resolve(target))
+        if not found or not isinstance(vertex, MemoryVertex):
+            raise GremlinExecutionError(
+                f"The addE endpoint `{target}` did not resolve to a vertex")
+        return vertex
+
+    def step_addE(self, step, traversers):
+        label = self.resolve_args(step)[0]
+        result = []
+        for traverser in traversers:
+            out_v = in_v = traverser.obj
+            if "from" in step.modulators:
+                out_v = self.edge_endpoint(step.modulators["from"], traverser)
+            if "to" in step.modulators:
+                in_v = self.edge_endpoint(step.modulators["to"], traverser)
+            if not isinstance(out_v, MemoryVertex) or \
+                    not isinstance(in_v, MemoryVertex):
+                raise GremlinExecutionError(
+                    "addE requires both ends of the edge to be vertices")
+            result.append(traverser.extend(
+                self.graph.add_edge(label, out_v, in_v)))
+        return result
+
+    def step_property(self, step, traversers):
+        args = list(step.args)
+        cardinality = "single"
+        if args and isinstance(args[0], Token):
+            cardinality = args.pop(0).name
+        key = self.key_name(self.resolve(args[0]))
+        for traverser in traversers:
+            value = args[1]
+            if isinstance(value, Traversal):
+                found, value = self.first(value, traverser)
+                if not found:
+                    continue
+            else:
+                value = self.resolve(value)
+            element = traverser.obj
+            if not isinstance(element, (MemoryVertex, MemoryEdge)):
+                raise GremlinExecutionError(
+                    "The property step requires an element")
+            if key == "id" and isinstance(element, MemoryVertex):
+                self.graph.change_vertex_id(element, value)
+            else:
+                element.set_property(key, value, cardinality)
+        return traversers
+
+    def step_drop(self, step, traversers):
+        for traverser in traversers:
+            if isinstance(traverser.obj, MemoryVertex):
+                self.graph.remove_vertex(traverser.obj)
+            elif isinstance(traverser.obj, MemoryEdge):
+                self.graph.remove_edge(traverser.obj)
+        return []
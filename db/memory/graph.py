@@ -0,0 +1,212 @@
+""" Provides the in-process graph store (vertices, edges and their
+    adjacency indexes) used by the memory backend
+"""
+import threading
+import uuid
+
+
+def generate_id():
+    """ Returns a new random element id (matching CosmosDB's GUID ids) """
+    return str(uuid.uuid4())
+
+
+class MemoryVertex:
+    """ A vertex in the MemoryGraph; properties are stored as lists of
+        (property_id, value) pairs, as vertex properties can have multiple
+        values
+    """
+    __slots__ = ("id", "label", "properties")
+
+    def __init__(self, vertex_id, label):
+        self.id = vertex_id
+        self.label = label
+        self.properties = {}
+
+    def values(self, key):
+        """ Returns all of the values of the given property """
+        return [value for _, value in self.properties.get(key, [])]
+
+    def value(self, key, default=None):
+        """ Returns the first value of the given property """
+        values = self.properties.get(key)
+        return values[0][1] if values else default
+
+    def set_property(self, key, value, cardinality="single"):
+        """ Sets (single) or appends (list) the value of the property """
+        entry = (generate_id(), value)
+        if cardinality == "list":
+            self.properties.setdefault(key, []).append(entry)
+        else:
+            self.properties[key] = [entry]
+
+    def to_graphson(self):
+        """ Returns the vertex in the same format as a CosmosDB response """
+        return {
+            "id": self.id,
+            "label": self.label,
+            "type": "vertex",
+            "properties": {
+                key: [{"id": pid, "value": value} for pid, value in values]
+                for key, values in self.properties.items()
+            }
+        }
+
+    def __repr__(self):
+        return f"v[{self.id}]"
+
+
+class MemoryEdge:
+    """ An edge in the MemoryGraph between two MemoryVertex instances """
+    __slots__ = ("id", "label", "out_v", "in_v", "properties")
+
+    def __init__(self, edge_id, label, out_v, in_v):
+        self.id = edge_id
+        self.label = label
+        self.out_v = out_v
+        self.in_v = in_v
+        self.properties = {}
+
+    def values(self, key):
+        """ Returns the value of the given property as a list """
+        return [self.properties[key]] if key in self.properties else []
+
+    def value(self, key, default=None):
+        """ Returns the value of the given property """
+        return self.properties.get(key, default)
+
+    def set_property(self, key, value, cardinality="single"):
+        """ Sets the value of the property; edges only hold single values """
+        self.properties[key] = value
+
+    def to_graphson(self):
+        """ Returns the edge in the same format as a CosmosDB response """
+        return {
+            "id": self.id,
+            "label": self.label,
+            "type": "edge",
+            "inVLabel": self.in_v.label,
+            "outVLabel": self.out_v.label,
+            "inV": self.in_v.id,
+            "outV": self.out_v.id,
+            "properties": dict(self.properties)
+        }
+
+    def __repr__(self):
+        return f"e[{self.id}][{self.out_v.id}-{self.label}->{self.in_v.id}]"
+
+
+class MemoryGraph:
+    """ Stores all of the vertices and edges along with the indexes used to
+        look them up without scanning the whole graph:
+            - vertices/edges by id
+            - vertices by label
+            - out/in edges of every vertex, by edge label
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        """ Removes all of the elements from the graph """
+        with self.lock:
+            self.vertices = {}
+            self.edges = {}
+            self.vertex_labels = {}
+            self.out_edges = {}
+            self.in_edges = {}
+
+    def add_vertex(self, label, vertex_id=None):
+        """ Creates and returns a new vertex with the given label """
+        with self.lock:
+            vertex = MemoryVertex(vertex_id or generate_id(), label)
+            self.vertices[vertex.id] = vertex
+            self.vertex_labels.setdefault(label, {})[vertex.id] = vertex
+            self.out_edges[vertex.id] = {}
+            self.in_edges[vertex.id] = {}
+            return vertex
+
+    def change_vertex_id(self, vertex, vertex_id):
+        """ Re-keys a vertex that doesn't have any edges yet; this is
+            only used for `addV(...).property('id', ...)`
+        """
+        with self.lock:
+            if vertex_id in self.vertices:
+                raise ValueError(f"Vertex with id `{vertex_id}` "
+                                 "already exists")
+            if self.out_edges[vertex.id] or self.in_edges[vertex.id]:
+                raise ValueError("Can not change the id of a vertex "
+                                 "with edges")
+            for index in [self.vertices, self.vertex_labels[vertex.label],
+                          self.out_edges, self.in_edges]:
+                index[vertex_id] = index.pop(vertex.id)
+            vertex.id = vertex_id
+
+    def add_edge(self, label, out_v, in_v, edge_id=None):
+        """ Creates and returns a new edge between the two vertices """
+        with self.lock:
+            edge = MemoryEdge(edge_id or generate_id(), label, out_v, in_v)
+            self.edges[edge.id] = edge
+            self.out_edges[out_v.id].setdefault(label, []).append(edge)
+            self.in_edges[in_v.id].setdefault(label, []).append(edge)
+            return edge
+
+    def remove_edge(self, edge):
+        """ Removes the edge from the graph and it's indexes """
+        with self.lock:
+            if self.edges.pop(edge.id, None) is None:
+                return
+            self.out_edges[edge.out_v.id][edge.label].remove(edge)
+            self.in_edges[edge.in_v.id][edge.label].remove(edge)
+
+    def remove_vertex(self, vertex):
+        """ Removes the vertex along with all of it's in and out edges """
+        with self.lock:
+            if self.vertices.pop(vertex.id, None) is None:
+                return
+            for index in [self.out_edges, self.in_edges]:
+                for edges in list(index[vertex.id].values()):
+                    for edge in list(edges):
+                        self.remove_edge(edge)
+            del self.out_edges[vertex.id]
+            del self.in_edges[vertex.id]
+            del self.vertex_labels[vertex.label][vertex.id]
+
+    def get_vertices(self, ids=None, label=None):
+        """ Returns the vertices with the given ids and/or label, through
+            the id and label indexes
+        """
+        if ids is not None:
+            vertices = [self.vertices[i] for i in ids if i in self.vertices]
+            if label is not None:
+                vertices = [v for v in vertices if v.label == label]
+            return vertices
+        if label is not None:
+            return list(self.vertex_labels.get(label, {}).values())
+        return list(self.vertices.values())
+
+    def get_edges(self, ids=None):
+        """ Returns the edges with the given ids (all edges otherwise) """
+        if ids is not None:
+            return [self.edges[i] for i in ids if i in self.edges]
+        return list(self.edges.values())
+
+    def vertex_edges(self, vertex, direction, labels=()):
+        """ Returns the edges in the given direction ("out" | "in" | "both")
+            of the vertex, optionally limited to the given edge labels
+        """
+        indexes = {
+            "out": [self.out_edges],
+            "in": [self.in_edges],
+            "both": [self.out_edges, self.in_edges]
+        }[direction]
+
+        edges = []
+        for index in indexes:
+            vertex_index = index.get(vertex.id, {})
+            if labels:
+                for label in labels:
+                    edges += vertex_index.get(label, [])
+            else:
+                for label_edges in vertex_index.values():
+                    edges += label_edges
+        return edges
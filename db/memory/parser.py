@@ -0,0 +1,193 @@
+""" Parses the subset of Gremlin-Groovy scripts used by the models into
+    the Traversal representation executed by the memory backend
+"""
+from .traversal import Traversal, Step, Predicate, Token, Variable
+import re
+
+
+class GremlinSyntaxError(ValueError):
+    """ Raised when a script can't be parsed """
+    pass
+
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?[LlDdFf]?)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<symbol>[().,\[\];])
+""", re.VERBOSE)
+
+ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+CONSTANTS = {"true": True, "false": False, "null": None}
+
+# Enum values that can be used without their class prefix
+TOKENS = {"decr", "incr", "desc", "asc", "shuffle", "single", "list", "set",
+          "local", "global", "first", "last", "all", "mixed", "keys",
+          "values", "none", "normSack"}
+
+# Classes whose members are tokens (i.e. T.id, Order.decr)
+TOKEN_CLASSES = {"T", "Order", "Cardinality", "Scope", "Pop", "Column",
+                 "VertexProperty.Cardinality", "Pick", "Direction"}
+
+PREDICATE_CLASSES = {"P", "TextP"}
+
+
+def unescape(literal):
+    """ Returns the value of a quoted string literal """
+    body = literal[1:-1]
+    return re.sub(r"\\(.)", lambda m: ESCAPES.get(m.group(1), m.group(1)),
+                  body)
+
+
+def tokenize(script):
+    """ Returns the list of (kind, value) tokens in the script """
+    tokens = []
+    position = 0
+    while position < len(script):
+        match = TOKEN_PATTERN.match(script, position)
+        if not match:
+            raise GremlinSyntaxError(
+                f"Unexpected character `{script[position]}` at {position}")
+        position = match.end()
+        kind = match.lastgroup
+        if kind != "space":
+            tokens.append((kind, match.group(kind)))
+    tokens.append(("end", None))
+    return tokens
+
+
+class Parser:
+    """ A recursive-descent parser for a single Gremlin-Groovy expression
+        (or several, separated by `;` - the last one being the result)
+    """
+    def __init__(self, script):
+        self.tokens = tokenize(script)
+        self.position = 0
+
+    def peek(self, offset=0):
+        return self.tokens[self.position + offset]
+
+    def advance(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def expect(self, kind, value=None):
+        token = self.advance()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise GremlinSyntaxError(
+                f"Expected `{value or kind}` but found `{token[1]}`")
+        return token
+
+    def accept(self, kind, value=None):
+        token = self.peek()
+        if token[0] == kind and (value is None or token[1] == value):
+            return self.advance()
+        return None
+
+    def parse(self):
+        """ Returns the last expression in the script """
+        expression = self.expression()
+        while self.accept("symbol", ";"):
+            if self.peek()[0] == "end":
+                break
+            expression = self.expression()
+        self.expect("end")
+        return expression
+
+    def arguments(self):
+        """ Parses a parenthesized, comma separated list of expressions """
+        self.expect("symbol", "(")
+        args = []
+        if not self.accept("symbol", ")"):
+            args.append(self.expression())
+            while self.accept("symbol", ","):
+                args.append(self.expression())
+            self.expect("symbol", ")")
+        return args
+
+    def steps(self):
+        """ Parses a chain of `.step(args)` calls """
+        steps = []
+        while self.peek() == ("symbol", "."):
+            self.advance()
+            name = self.expect("name")[1]
+            steps.append(Step(name, self.arguments()))
+        return steps
+
+    def expression(self):
+        kind, value = self.advance()
+
+        if kind == "number":
+            return self.number(value)
+        if kind == "string":
+            return unescape(value)
+        if kind == "symbol" and value == "[":
+            items = []
+            if not self.accept("symbol", "]"):
+                items.append(self.expression())
+                while self.accept("symbol", ","):
+                    items.append(self.expression())
+                self.expect("symbol", "]")
+            return items
+        if kind != "name":
+            raise GremlinSyntaxError(f"Unexpected `{value}`")
+
+        if value in CONSTANTS:
+            return CONSTANTS[value]
+        # Traversal sources and anonymous traversals
+        if value in ("g", "__") and self.peek() == ("symbol", "."):
+            return Traversal(self.steps(),
+                             source="g" if value == "g" else None)
+        # Class prefixed predicates/tokens; i.e. TextP.startingWith('a')
+        if self.peek() == ("symbol", ".") and \
+                self.peek(1)[0] == "name" and \
+                (value in PREDICATE_CLASSES or value in TOKEN_CLASSES or
+                 value == "VertexProperty"):
+            self.advance()
+            member = self.advance()[1]
+            if value == "VertexProperty":
+                self.expect("symbol", ".")
+                member = self.advance()[1]
+                value = "VertexProperty.Cardinality"
+            if value in PREDICATE_CLASSES:
+                return self.predicate(member, self.arguments())
+            return Token(member)
+        if self.peek() == ("symbol", "("):
+            args = self.arguments()
+            if value in Predicate.OPERATORS:
+                return self.predicate(value, args)
+            # A step without a prefix starts an anonymous traversal;
+            # i.e. `out('owns')` or `id()`
+            return Traversal([Step(value, args)] + self.steps())
+        if value in TOKENS:
+            return Token(value)
+
+        return Variable(value)
+
+    @staticmethod
+    def number(literal):
+        literal = literal.rstrip("LlDdFf")
+        if re.fullmatch(r"-?\d+", literal):
+            return int(literal)
+        return float(literal)
+
+    @staticmethod
+    def predicate(operator, args):
+        """ Returns the predicate; multi-valued predicates (within/without)
+            accept both varargs and a single list
+        """
+        if operator in ("within", "without"):
+            if len(args) == 1 and isinstance(args[0], (list, Variable)):
+                return Predicate(operator, args[0])
+            return Predicate(operator, args)
+        if operator in ("inside", "outside", "between"):
+            return Predicate(operator, args)
+        return Predicate(operator, args[0])
+
+
+def parse(script):
+    """ Returns the Traversal (or plain value) represented by the script """
+    return Parser(script).parse()
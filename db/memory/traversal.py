@@ -0,0 +1,160 @@
+""" Provides the intermediate representation of a Gremlin traversal used by
+    the memory backend. Scripts are parsed into (and bytecode can be
+    converted into) a Traversal holding a list of Steps, whose arguments are
+    plain values, nested Traversals, Predicates, Tokens or Variables
+"""
+
+
+class Variable:
+    """ A reference to a binding that is resolved upon execution """
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"Variable({self.name})"
+
+
+class Token:
+    """ A Gremlin enum value; i.e. `decr`, `T.id`, `single` """
+    __slots__ = ("name",)
+
+    # Aliases that mean the same thing
+    ALIASES = {
+        "desc": "decr",
+        "asc": "incr"
+    }
+
+    def __init__(self, name):
+        self.name = self.ALIASES.get(name, name)
+
+    def __eq__(self, other):
+        return isinstance(other, Token) and other.name == self.name
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def __repr__(self):
+        return f"Token({self.name})"
+
+
+class Predicate:
+    """ A Gremlin predicate (P/TextP); i.e. `gt(1)`, `within('a', 'b')` """
+    __slots__ = ("operator", "value")
+
+    OPERATORS = {
+        "eq": lambda a, b: a == b,
+        "neq": lambda a, b: a != b,
+        "lt": lambda a, b: a is not None and a < b,
+        "lte": lambda a, b: a is not None and a <= b,
+        "gt": lambda a, b: a is not None and a > b,
+        "gte": lambda a, b: a is not None and a >= b,
+        "inside": lambda a, b: a is not None and b[0] < a < b[1],
+        "outside": lambda a, b: a is not None and (a < b[0] or a > b[1]),
+        "between": lambda a, b: a is not None and b[0] <= a < b[1],
+        "within": lambda a, b: a in b,
+        "without": lambda a, b: a not in b,
+        "startingWith": lambda a, b: isinstance(a, str) and a.startswith(b),
+        "endingWith": lambda a, b: isinstance(a, str) and a.endswith(b),
+        "containing": lambda a, b: isinstance(a, str) and b in a,
+        "notStartingWith":
+            lambda a, b: isinstance(a, str) and not a.startswith(b),
+        "notEndingWith":
+            lambda a, b: isinstance(a, str) and not a.endswith(b),
+        "notContaining": lambda a, b: isinstance(a, str) and b not in a
+    }
+
+    def __init__(self, operator, value):
+        if operator not in self.OPERATORS:
+            raise ValueError(f"Unsupported predicate `{operator}`")
+        self.operator = operator
+        self.value = value
+
+    def test(self, value):
+        """ Returns True if the given value matches the predicate """
+        try:
+            return self.OPERATORS[self.operator](value, self.value)
+        except TypeError:
+            return False
+
+    def __repr__(self):
+        return f"{self.operator}({self.value!r})"
+
+
+class Step:
+    """ A single step of a traversal with the modulators attached to it;
+        i.e. the `by()`s of a project step or the `until()` of a repeat
+    """
+    __slots__ = ("name", "args", "by", "options", "modulators")
+
+    def __init__(self, name, args=()):
+        self.name = name
+        self.args = list(args)
+        self.by = []
+        self.options = []
+        self.modulators = {}
+
+    def __repr__(self):
+        return f"{self.name}({', '.join(repr(i) for i in self.args)})"
+
+
+class Traversal:
+    """ A list of steps; traversals with a `g` source (i.e. `g.V()`)
+        ignore their incoming traverser when nested inside another
+        traversal, while anonymous ones (`__.out()`) start from it
+    """
+    __slots__ = ("steps", "source")
+
+    # Steps that are only ever modulating the step before them
+    BY_STEPS = {"project", "select", "order", "path", "dedup", "group",
+                "groupCount", "valueMap", "sample"}
+    REPEAT_MODULATORS = {"until", "emit", "times"}
+
+    def __init__(self, steps=(), source=None):
+        self.source = source
+        self.steps = self.compile(list(steps))
+
+    @classmethod
+    def compile(cls, raw_steps):
+        """ Attaches all of the modulators (by/option/to/from/until/emit/
+            times) to the step they modulate, and splits the infix
+            `a.or().b` / `a.and().b` forms into regular or/and steps
+        """
+        for connective in ["or", "and"]:
+            for index, step in enumerate(raw_steps):
+                if step.name == connective and not step.args:
+                    left = Traversal(raw_steps[:index])
+                    right = Traversal(raw_steps[index + 1:])
+                    return [Step(connective, [left, right])]
+
+        steps = []
+        pending = {}
+        for step in raw_steps:
+            previous = steps[-1] if steps else None
+            if step.name == "by" and previous is not None and \
+                    previous.name in cls.BY_STEPS:
+                previous.by.append(step.args)
+            elif step.name == "option" and previous is not None and \
+                    previous.name == "choose":
+                previous.options.append(step.args)
+            elif step.name in ("to", "from") and previous is not None and \
+                    previous.name == "addE":
+                previous.modulators[step.name] = step.args[0]
+            elif step.name in cls.REPEAT_MODULATORS:
+                if previous is not None and previous.name == "repeat" and \
+                        step.name not in previous.modulators:
+                    previous.modulators[step.name] = (step.args, False)
+                else:
+                    pending[step.name] = (step.args, True)
+            else:
+                if step.name == "repeat":
+                    step.modulators.update(pending)
+                    pending = {}
+                steps.append(step)
+
+        return steps
+
+    def __repr__(self):
+        prefix = self.source or "__"
+        return prefix + "".join(f".{step!r}" for step in self.steps)
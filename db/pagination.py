@@ -0,0 +1,43 @@
+""" Provides the continuation tokens (cursors) and the Page list used for
+    the keyset pagination of `Vertex.filter`; a cursor holds the sort value
+    and id of the last vertex of a page, which the next page's traversal
+    continues after (instead of skipping over the previous pages)
+"""
+from db.exceptions import InvalidCursorException
+import base64
+import json
+
+
+class Page(list):
+    """ A list of instances along with the `cursor` that continues after
+        it's last instance; the cursor is None on the last page
+    """
+    def __init__(self, instances=(), cursor=None):
+        super().__init__(instances)
+        self.cursor = cursor
+
+
+def encode_cursor(order_by, descending, value, vertex_id):
+    """ Returns the opaque continuation token for the given sort position """
+    data = json.dumps({"k": order_by, "d": descending,
+                       "v": value, "i": vertex_id})
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor, order_by, descending):
+    """ Returns the (value, vertex_id) sort position of the token;
+        raises an InvalidCursorException if the token is malformed or was
+        created for a different ordering
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        key, direction = data["k"], data["d"]
+        value, vertex_id = data["v"], data["i"]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise InvalidCursorException("Malformed pagination cursor")
+
+    if key != order_by or direction != descending:
+        raise InvalidCursorException(
+            "The pagination cursor belongs to a different ordering")
+
+    return value, vertex_id
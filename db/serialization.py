@@ -0,0 +1,154 @@
+""" Provides the message serializers the ConnectionManager's clients can be
+    configured with (through the `serializer` setting), including the lean
+    serializer which decodes the responses in a single pass.
+    gremlin_python's GraphSON readers rebuild every dict and list of a
+    response (looking a type tag up in each of them), and decode vertices
+    and edges into `gremlin_python.structure.graph` objects that don't keep
+    their properties. The LeanGraphSONReader instead walks the response in
+    place, only decoding the type-tagged values, and decodes typed
+    vertices/edges straight into the plain shape read by
+    `Vertex.vertex_to_instance` and `Edge.edge_to_instance`:
+        {"id": ..., "label": ..., "type": "vertex",
+         "properties": {key: [{"id": ..., "value": ...}]}}
+    CosmosDB responds with untyped GraphSON (which is already in that
+    shape), so the lean reader leaves it's responses as they are
+"""
+from gremlin_python.driver import serializer
+from gremlin_python.structure.io import graphsonV2d0, graphsonV3d0
+
+TYPE_KEY = "@type"
+VALUE_KEY = "@value"
+
+GRAPHSON_VERSIONS = {
+    2: (graphsonV2d0, b"application/vnd.gremlin-v2.0+json"),
+    3: (graphsonV3d0, b"application/vnd.gremlin-v3.0+json")
+}
+
+
+class LeanGraphSONReader:
+    """ A GraphSON reader that decodes the responses in place; only the
+        type-tagged values are replaced, and the typed vertices, edges and
+        properties are decoded into plain dictionaries. Every other typed
+        value is decoded by the given GraphSON version's deserializers
+    """
+    def __init__(self, version=2):
+        module = GRAPHSON_VERSIONS[version][0]
+        self.deserializers = module.GraphSONReader().deserializers
+        self.decoders = {
+            "g:Vertex": self.vertex,
+            "g:Edge": self.edge,
+            "g:VertexProperty": self.vertex_property,
+            "g:Property": self.property
+        }
+
+    def toObject(self, obj):
+        """ Decodes the type-tagged values of the (json loaded) object;
+            containers without any are returned as they are
+        """
+        if isinstance(obj, dict):
+            if TYPE_KEY in obj:
+                return self.typed(obj[TYPE_KEY], obj.get(VALUE_KEY))
+            for key, value in obj.items():
+                if isinstance(value, (dict, list)):
+                    obj[key] = self.toObject(value)
+        elif isinstance(obj, list):
+            for index, value in enumerate(obj):
+                if isinstance(value, (dict, list)):
+                    obj[index] = self.toObject(value)
+        return obj
+
+    def typed(self, graphson_type, value):
+        decoder = self.decoders.get(graphson_type)
+        if decoder is not None:
+            return decoder(value)
+        deserializer = self.deserializers.get(graphson_type)
+        if deserializer is None:
+            return value
+        return deserializer.objectify(value, self)
+
+    def value(self, value):
+        """ Decodes a single value; only containers need to be walked """
+        if isinstance(value, (dict, list)):
+            return self.toObject(value)
+        return value
+
+    def vertex(self, value):
+        # The vertex properties are decoded here rather than through
+        # `toObject`, as they make up most of the response
+        properties = {}
+        for key, items in value.get("properties", {}).items():
+            properties[key] = [
+                self.vertex_property(item[VALUE_KEY])
+                if item.get(TYPE_KEY) == "g:VertexProperty"
+                else self.toObject(item) for item in items]
+        return {
+            "id": self.value(value["id"]),
+            "label": value.get("label", "vertex"),
+            "type": "vertex",
+            "properties": properties
+        }
+
+    def edge(self, value):
+        """ Decodes the edge; it's properties are flattened to their values,
+            like the edges returned by CosmosDB
+        """
+        properties = {}
+        for key, item in value.get("properties", {}).items():
+            item = self.toObject(item)
+            properties[key] = item["value"] if isinstance(item, dict) \
+                else item
+        return {
+            "id": self.toObject(value["id"]),
+            "label": value.get("label", "edge"),
+            "type": "edge",
+            "inV": self.toObject(value.get("inV")),
+            "inVLabel": value.get("inVLabel"),
+            "outV": self.toObject(value.get("outV")),
+            "outVLabel": value.get("outVLabel"),
+            "properties": properties
+        }
+
+    def vertex_property(self, value):
+        """ Decodes the vertex property in place, into the {"id": ..,
+            "value": ..} shape of CosmosDB's properties
+        """
+        value.pop("label", None)
+        if isinstance(value.get("id"), (dict, list)):
+            value["id"] = self.toObject(value["id"])
+        if isinstance(value["value"], (dict, list)):
+            value["value"] = self.toObject(value["value"])
+        return value
+
+    def property(self, value):
+        return {"key": value["key"], "value": self.toObject(value["value"])}
+
+
+class LeanGraphSONSerializer(serializer.GraphSONMessageSerializer):
+    """ Message serializer that writes the requests in the given GraphSON
+        version and reads the responses through the LeanGraphSONReader
+    """
+    def __init__(self, version=2):
+        module, mimetype = GRAPHSON_VERSIONS[version]
+        super().__init__(
+            LeanGraphSONReader(version), module.GraphSONWriter(), mimetype)
+
+
+# The serializers selectable through the `serializer` setting.
+# GraphBinary isn't available in gremlin_python 3.4 (nor supported by
+# CosmosDB), and CosmosDB only accepts GraphSON 2.0
+SERIALIZERS = {
+    "graphson2": serializer.GraphSONSerializersV2d0,
+    "graphson3": serializer.GraphSONSerializersV3d0,
+    "lean": lambda: LeanGraphSONSerializer(version=2),
+    "lean3": lambda: LeanGraphSONSerializer(version=3)
+}
+
+
+def load_serializer(name):
+    """ Returns a new instance of the serializer with the given name """
+    try:
+        factory = SERIALIZERS[name]
+    except KeyError:
+        raise ValueError(f"Unrecognized serializer `{name}`; expected one "
+                         f"of {sorted(SERIALIZERS)}")
+    return factory()
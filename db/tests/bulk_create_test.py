@@ -0,0 +1,45 @@
+from utils.flask_test_case import FlaskTestCase
+from core.models import *
+
+
+class BulkCreateTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) `Vertex.bulk_create` returns the created vertices in the same
+            order as the input rows, across chunks
+        2) No vertices are written if any of the rows is invalid
+    """
+    def setUp(self):
+        """ Fixtures for the test cases;
+            variables that remain the same for all of the test cases
+        """
+        super().setUp()
+        CoreVertex.query_templates().clear()
+
+    def test_bulk_create_keeps_input_order(self):
+        """ Asserts that the ids are returned in input order, with the rows
+            split over several (parallel) chunks
+        """
+        rows = [{"title": f"Node {i}", "templateData": "{}"}
+                for i in range(30)]
+        rows[3]["content"] = "Different shape"
+
+        vertices = CoreVertex.bulk_create(rows, chunk_size=10, parallelism=3)
+
+        self.assertEqual([v.title for v in vertices],
+                         [row["title"] for row in rows])
+        self.assertEqual(len({v.id for v in vertices}), len(rows))
+        self.assertEqual(vertices[3].content, "Different shape")
+
+        # The last two chunks have the same shape, so share a template
+        self.assertEqual(len(CoreVertex.query_templates()), 2)
+        self.assertEqual(len(CoreVertex.filter()), len(rows))
+
+    def test_invalid_row_writes_nothing(self):
+        """ Asserts that all rows are validated before any are written """
+        rows = [{"title": "Valid", "templateData": "{}"},
+                {"title": "Invalid", "unknown": "property"}]
+
+        with self.assertRaises(ValueError):
+            CoreVertex.bulk_create(rows, chunk_size=1)
+
+        self.assertEqual(CoreVertex.filter(), [])
@@ -0,0 +1,51 @@
+from utils.flask_test_case import FlaskTestCase
+from core.models import *
+import pickle
+
+
+class CompactInstancesTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) Vertices/Edges built from responses are compact (slotted)
+            instances of their model classes, only using a `__dict__` for
+            attributes outside of the properties schema
+        2) Compact instances can be pickled and share the model's query
+            templates
+    """
+    def test_instances_are_compact(self):
+        """ Asserts that the properties are held in the slots """
+        team = Team.create(name="Team")
+        cv = CoreVertex.create(title="Node", templateData="{}")
+        edge = CoreVertexOwnership.create(team=team.id, coreVertex=cv.id)
+
+        self.assertIsInstance(cv, CoreVertex)
+        self.assertEqual(cv.title, "Node")
+        # All of the properties are held in the slots
+        self.assertEqual(cv.__dict__, {})
+        self.assertFalse(hasattr(cv, "children"))
+        template = Template.create(name="Temp", canHaveChildren=True)
+        cv.template = template
+        cv.isFavorite = True
+        self.assertEqual(cv.__dict__,
+                         {"template": template, "isFavorite": True})
+
+        # Properties outside of the schema are still kept
+        other = CoreVertex.vertex_to_instance({"id": "x", "properties": {
+            "name": [{"id": "p", "value": "Template"}]}})
+        self.assertEqual(other.name, "Template")
+        self.assertEqual(other.__dict__, {"name": "Template"})
+
+        self.assertIsInstance(edge, CoreVertexOwnership)
+        self.assertEqual((edge.outV, edge.inV), (team.id, cv.id))
+
+    def test_pickling_and_query_templates(self):
+        """ Asserts that pickled instances are restored as compact instances
+            and that the query templates are shared with the model class
+        """
+        cv = CoreVertex.create(title="Node", templateData="{}")
+        cv.children = []
+        restored = pickle.loads(pickle.dumps(cv))
+
+        self.assertIs(type(restored), type(cv))
+        self.assertEqual((restored.id, restored.title, restored.children),
+                         (cv.id, "Node", []))
+        self.assertIs(cv.query_templates(), CoreVertex.query_templates())
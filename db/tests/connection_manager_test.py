@@ -0,0 +1,185 @@
+from concurrent.futures import Future
+from db.connection import ConnectionManager, percentile
+from db.exceptions import (
+    DatabaseConnectionException,
+    ConnectionPoolTimeoutException
+)
+import threading
+import unittest
+
+
+class StubResultSet:
+    """ Mimics the gremlin ResultSet for an already completed response """
+    def __init__(self, results, error=None):
+        self.done = Future()
+        if error is not None:
+            self.done.set_exception(error)
+        else:
+            self.done.set_result(None)
+        self.results = results
+
+    def all(self):
+        future = Future()
+        if self.done.exception() is not None:
+            future.set_exception(self.done.exception())
+        else:
+            future.set_result(self.results)
+        return future
+
+
+class StubClient:
+    """ Mimics a gremlin Client that records all of the submitted queries """
+    def __init__(self, fail_health_check=False):
+        self.fail_health_check = fail_health_check
+        self.submitted = []
+        self.closed = False
+
+    def submit(self, message, bindings=None):
+        self.submitted.append((message, bindings))
+        if message == ConnectionManager.HEALTH_CHECK_QUERY and \
+                self.fail_health_check:
+            return StubResultSet([], error=ConnectionError("closed"))
+        return StubResultSet([message])
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionManagerTestCase(unittest.TestCase):
+    """ Contains all of the test cases to confirm that:
+        1) Connections are opened upon initialization and reused
+        2) Broken/unhealthy connections are re-opened
+        3) Acquiring a connection times out when the pool is exhausted
+        4) Only the `warmup` connections are opened upfront, with the rest
+            being opened on demand
+    """
+    def create_manager(self, **kwargs):
+        """ Returns a ConnectionManager that uses stub clients """
+        self.clients = []
+
+        def factory():
+            client = StubClient(**self.client_options)
+            self.clients.append(client)
+            return client
+
+        options = {
+            "pool_size": 2,
+            "acquire_timeout": 0.1,
+            "reconnect_backoff": 0
+        }
+        options.update(kwargs)
+        return ConnectionManager("ws://stub", "g", client_factory=factory,
+                                 **options)
+
+    def setUp(self):
+        self.client_options = {}
+
+    def test_pool_is_warmed_and_reused(self):
+        """ Asserts that all of the connections are opened upfront and that
+            queries are submitted through them with their bindings
+        """
+        manager = self.create_manager()
+        self.assertEqual(len(self.clients), 2)
+
+        for i in range(5):
+            result = manager.submit("g.V().has('id', vid)", {"vid": i})
+            self.assertEqual(result.all().result(), ["g.V().has('id', vid)"])
+
+        self.assertEqual(len(self.clients), 2)
+        stats = manager.stats()
+        self.assertEqual(stats["acquired"], 5)
+        self.assertEqual(stats["in_use"], 0)
+        self.assertEqual(stats["idle"], 2)
+        self.assertIsNotNone(stats["acquire_p99_ms"])
+
+    def test_unhealthy_connection_is_reopened(self):
+        """ Asserts that an idle connection failing the health check is
+            replaced before being used
+        """
+        self.client_options = {"fail_health_check": True}
+        manager = self.create_manager(pool_size=1, health_check_interval=0)
+
+        manager.submit("g.V()")
+
+        self.assertEqual(len(self.clients), 2)
+        self.assertTrue(self.clients[0].closed)
+        self.assertEqual(manager.stats()["reconnects"], 1)
+        self.assertEqual(manager.stats()["failed_health_checks"], 1)
+
+    def test_transport_error_marks_connection_broken(self):
+        """ Asserts that a connection is re-opened on the next acquire after
+            a non-server error
+        """
+        manager = self.create_manager(pool_size=1)
+        self.clients[0].submit = lambda *args: StubResultSet(
+            [], error=ConnectionError("closed"))
+
+        manager.submit("g.V()")
+        manager.submit("g.V()")
+
+        self.assertEqual(len(self.clients), 2)
+        self.assertEqual(self.clients[1].submitted, [("g.V()", None)])
+
+    def test_acquire_times_out_when_exhausted(self):
+        """ Asserts that acquiring from an exhausted pool raises an error
+            instead of blocking forever
+        """
+        manager = self.create_manager(pool_size=1)
+        acquired = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            with manager.acquire():
+                acquired.set()
+                release.wait()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        acquired.wait()
+        try:
+            with self.assertRaises(ConnectionPoolTimeoutException):
+                with manager.acquire():
+                    pass
+            self.assertEqual(manager.stats()["timeouts"], 1)
+        finally:
+            release.set()
+            thread.join()
+
+    def test_connections_are_opened_on_demand(self):
+        """ Asserts that a pool without any warmup connections opens them as
+            they're needed (up to the pool size), and that `warmup` opens
+            them upfront
+        """
+        manager = self.create_manager(warmup=0)
+        self.assertEqual(self.clients, [])
+
+        manager.submit("g.V()")
+        manager.submit("g.V()")
+        self.assertEqual(len(self.clients), 1)
+        self.assertEqual(manager.stats()["open"], 1)
+
+        self.assertEqual(manager.warmup(), 2)
+        self.assertEqual(manager.warmup(5), 2)
+        self.assertEqual(len(self.clients), 2)
+
+        manager.close()
+        self.assertEqual(manager.stats()["open"], 0)
+
+    def test_connect_gives_up_after_all_attempts(self):
+        """ Asserts that a connection error is raised once all of the
+            reconnect attempts have failed
+        """
+        def factory():
+            raise ConnectionError("refused")
+
+        with self.assertRaises(DatabaseConnectionException):
+            ConnectionManager("ws://stub", "g", pool_size=1,
+                              reconnect_attempts=3, reconnect_backoff=0,
+                              client_factory=factory)
+
+    def test_percentile(self):
+        """ Asserts the nearest-rank percentile used for the stats """
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertIsNone(percentile([], 99))
@@ -0,0 +1,89 @@
+from utils.flask_test_case import FlaskTestCase
+from db.loader import DataLoader, dataloader, clear_dataloaders
+from core.serializers import TemplateDetailSchema, MessageListSchema
+from core.models import *
+import auth
+
+
+class DataLoaderTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) The queued keys are loaded together in a single batch
+        2) The relationships of model instances are loaded lazily, with
+            the queued instances being loaded through a single query
+        3) The list serializers queue all of the dumped instances
+    """
+    def queries(self):
+        return client.stats()["queries"]
+
+    def test_queued_keys_are_batched(self):
+        batches = []
+
+        def batch_load(keys):
+            batches.append(keys)
+            return {key: key * 2 for key in keys if key != 3}
+
+        loader = DataLoader(batch_load, max_batch_size=2)
+        loader.queue([1, 2, 3])
+        self.assertEqual(loader.load(4), 8)
+        self.assertEqual(batches, [[1, 2], [3, 4]])
+
+        self.assertEqual(loader.load_many([1, 2, 3]), [2, 4, None])
+        self.assertEqual(loader.batches, 2)
+
+        # The loaders are kept on (and cleared from) the app context
+        self.assertIs(dataloader("numbers", batch_load),
+                      dataloader("numbers", batch_load))
+        clear_dataloaders()
+        self.assertIsNot(dataloader("numbers", batch_load), loader)
+
+    def test_relationships_are_loaded_lazily(self):
+        """ Asserts that the queued core vertices' templates are loaded
+            through a single query, and assigned templates aren't loaded
+        """
+        team = Team.create(name="Team")
+        template = Template.create(name="Template", canHaveChildren=True)
+        TeamOwnsTemplate.create(team=team.id, template=template.id)
+        nodes = [CoreVertex.create(title=f"Node {i}", templateData="",
+                                   content="") for i in range(3)]
+        for node in nodes[:2]:
+            CoreVertexOwnership.create(outv_id=team.id, inv_id=node.id)
+            CoreVertexInheritsFromTemplate.create(
+                coreVertex=node.id, template=template.id)
+
+        loaded = [CoreVertex.vertex_to_instance(
+            {"id": i.id, "properties": {}}) for i in nodes]
+        loaded[0].template = template
+        CoreVertex.template.queue(loaded)
+
+        queries = self.queries()
+        self.assertEqual([getattr(i.template, "id", None) for i in loaded],
+                         [template.id, template.id, None])
+        self.assertEqual(self.queries() - queries, 1)
+
+        # The loaded values are cached for the rest of the request
+        loaded = CoreVertex.vertex_to_instance({"id": nodes[1].id})
+        self.assertEqual(loaded.template.id, template.id)
+        self.assertEqual(self.queries() - queries, 1)
+
+    def test_serializers_queue_the_dumped_instances(self):
+        templates = [Template.create(name=f"Template {i}",
+                                     canHaveChildren=False) for i in range(3)]
+        template_property = TemplateProperty.create(
+            name="Property", fieldType="text", propertyOptions="", index=0)
+        TemplateHasProperty.create(
+            template=templates[0].id, templateProperty=template_property.id)
+        user = auth.models.User.create(
+            username="Author", email="author@g.com", password="Test",
+            fullName="Author")
+        message = Message.create(text="Text", sent_at="2020-01-01")
+        UserSentMessage.create(user=user.id, message=message.id)
+
+        templates = Template.get_many([i.id for i in templates]).values()
+        queries = self.queries()
+        data = TemplateDetailSchema(many=True).dump(templates).data
+        self.assertEqual([len(i["properties"]) for i in data], [1, 0, 0])
+        self.assertEqual(self.queries() - queries, 1)
+
+        message = Message.get_many([message.id])[message.id]
+        data = MessageListSchema(many=True).dump([message]).data
+        self.assertEqual(data[0]["author"]["username"], "Author")
@@ -0,0 +1,41 @@
+from utils.flask_test_case import FlaskTestCase
+from db.exceptions import FieldNotLoadedException
+from auth.models import *
+from core.models import *
+
+
+class FieldProjectionTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) `filter(fields=[...])` only loads the given properties, and
+            reading any other property raises a FieldNotLoadedException
+        2) Projected queries can be paginated
+    """
+    def test_only_the_fields_are_loaded(self):
+        """ Asserts the loaded and unloaded properties """
+        user = User.create(**self.test_user_details)
+
+        partial = User.filter(id=user.id, fields=["username", "email"])[0]
+        self.assertIsInstance(partial, User)
+        self.assertEqual((partial.id, partial.username, partial.email),
+                         (user.id, "TestU", "TestE@g.com"))
+        with self.assertRaises(FieldNotLoadedException):
+            partial.password
+        self.assertIsNone(getattr(partial, "fullName", None))
+
+        # The partial instance isn't used for later (full) lookups
+        self.assertEqual(User.filter(id=user.id)[0].fullName, "Test")
+
+    def test_projected_pages(self):
+        """ Asserts that the ordered field is loaded for the cursor """
+        CoreVertex.bulk_create(
+            [{"title": f"Node {i}", "templateData": "{}"} for i in range(5)])
+
+        page = CoreVertex.filter(limit=3, order_by="title",
+                                 fields=["templateData"])
+        self.assertEqual([i.title for i in page],
+                         ["Node 0", "Node 1", "Node 2"])
+        page = CoreVertex.filter(limit=3, order_by="title", cursor=page.cursor,
+                                 fields=["templateData"])
+        self.assertEqual([i.title for i in page], ["Node 3", "Node 4"])
+        with self.assertRaises(FieldNotLoadedException):
+            page[0].content
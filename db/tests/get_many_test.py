@@ -0,0 +1,59 @@
+from utils.flask_test_case import FlaskTestCase
+from db.identity import identity_map, clear_identity_map
+from core.models import *
+
+
+class GetManyTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) `get_many` returns the existing vertices keyed by their ids, in
+            the order of the (deduplicated) ids
+        2) The ids are looked up in chunks, with one query per chunk
+        3) Already-loaded vertices are taken from the identity map
+    """
+    def setUp(self):
+        super().setUp()
+        self.teams = [Team.create(name=f"Team {i}") for i in range(5)]
+        self.ids = [i.id for i in self.teams]
+        clear_identity_map()
+
+    def test_vertices_are_keyed_by_id(self):
+        """ Asserts that duplicate and missing ids (and vertices of other
+            labels) are left out of the result
+        """
+        template = Template.create(name="Template", canHaveChildren=False)
+        vertex_ids = list(reversed(self.ids)) + \
+            [self.ids[0], "missing", template.id]
+
+        teams = Team.get_many(vertex_ids)
+        self.assertEqual(list(teams), list(reversed(self.ids)))
+        self.assertEqual([i.name for i in teams.values()],
+                         [f"Team {i}" for i in reversed(range(5))])
+        self.assertEqual(Team.get_many([]), {})
+
+    def test_ids_are_looked_up_in_chunks(self):
+        queries = client.stats()["queries"]
+        teams = Team.get_many(self.ids, fields=["name"], chunk_size=2)
+
+        self.assertEqual(client.stats()["queries"] - queries, 3)
+        self.assertEqual(list(teams), self.ids)
+        self.assertEqual(teams[self.ids[0]].name, "Team 0")
+        self.assertEqual(teams[self.ids[0]]._fields, {"name"})
+
+        templates = Team.query_templates()._templates
+        self.assertEqual(
+            sorted(key[1] for key in templates if key[0] == "get_many"),
+            [1, 2])
+
+    def test_loaded_vertices_are_mapped(self):
+        """ Asserts that mapped vertices aren't queried again, and that the
+            loaded ones are added to the identity map
+        """
+        first = Team.filter(id=self.ids[0])[0]
+        teams = Team.get_many(self.ids)
+        self.assertIs(teams[self.ids[0]], first)
+
+        queries = client.stats()["queries"]
+        self.assertIs(Team.filter(id=self.ids[1])[0], teams[self.ids[1]])
+        self.assertEqual(Team.get_many(self.ids), teams)
+        self.assertEqual(client.stats()["queries"], queries)
+        self.assertGreaterEqual(identity_map().hits, 6)
@@ -0,0 +1,37 @@
+from utils.flask_test_case import FlaskTestCase
+from db.identity import identity_map, clear_identity_map
+from core.models import *
+
+
+class IdentityMapTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) Repeated id lookups within a request return the already-loaded
+            instance
+        2) Updating/deleting a vertex removes it from the identity map
+    """
+    def test_repeated_id_lookups_are_mapped(self):
+        """ Asserts that the second lookup doesn't query the database """
+        team = Team.create(name="Team")
+        clear_identity_map()
+
+        first = Team.filter(id=team.id)[0]
+        queries = client.stats()["queries"]
+        self.assertIs(Team.filter(id=team.id)[0], first)
+        self.assertEqual(client.stats()["queries"], queries)
+        self.assertEqual(identity_map().hits, 1)
+
+        # Other kinds of lookups aren't mapped
+        self.assertIsNot(Team.filter(id=team.id, name="Team")[0], first)
+        self.assertEqual(CoreVertex.filter(id=team.id), [])
+
+    def test_writes_invalidate_the_mapped_instance(self):
+        """ Asserts that updated/deleted vertices are loaded again """
+        team = Team.create(name="Team")
+        Team.filter(id=team.id)
+
+        Team.update({"name": "Renamed"}, vertex_id=team.id)
+        loaded = Team.filter(id=team.id)[0]
+        self.assertEqual(loaded.name, "Renamed")
+
+        loaded.delete()
+        self.assertEqual(Team.filter(id=team.id), [])
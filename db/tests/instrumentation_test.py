@@ -0,0 +1,136 @@
+from flask import Flask
+from db.instrumentation import (
+    InstrumentedBackend,
+    LatencyHistogram,
+    QueryMetrics,
+    SlowQueryLog
+)
+from db.memory import MemoryGraphBackend
+import unittest
+import json
+
+
+class ChargedBackend(MemoryGraphBackend):
+    """ A memory backend that reports a request charge like CosmosDB """
+    def submit(self, message, bindings=None):
+        result_set = super().submit(message, bindings)
+        result_set.status_attributes = {"x-ms-total-request-charge": 2.5}
+        return result_set
+
+
+class InstrumentationTestCase(unittest.TestCase):
+    """ Contains all of the test cases to confirm that:
+        1) Every submitted query is recorded with it's caller, endpoint,
+            result count, response size and request charge
+        2) Samples can optionally be logged as structured lines
+        3) Queries over the slow-query threshold are kept (and optionally
+            profiled) in a bounded log
+    """
+    def setUp(self):
+        self.backend = InstrumentedBackend(ChargedBackend())
+        self.app = Flask(__name__)
+        self.app.add_url_rule("/nodes", "nodes", lambda: "")
+
+    def test_samples_are_tagged_and_recorded(self):
+        """ Asserts the caller and endpoint tags, and the recorded totals """
+        with self.app.test_request_context("/nodes"):
+            self.backend.submit("g.addV('a')").all().result()
+        self.backend.submit("g.V()").all().result()
+
+        callers = self.backend.metrics.snapshot("caller")
+        caller = "InstrumentationTestCase.test_samples_are_tagged_and_recorded"
+        self.assertEqual(callers[caller]["count"], 2)
+        self.assertEqual(callers[caller]["results"], 2)
+        self.assertEqual(callers[caller]["request_charge"], 5)
+        # The response sizes are only measured when enabled
+        self.assertEqual(callers[caller]["response_bytes"], 0)
+
+        endpoints = self.backend.metrics.snapshot("endpoint")
+        self.assertEqual(endpoints["nodes"]["count"], 1)
+        self.assertEqual(endpoints[""]["count"], 1)
+
+        queries = self.backend.metrics.snapshot("query")
+        self.assertEqual(set(queries), {"g.addV('a')", "g.V()"})
+        self.assertEqual(self.backend.name, "memory")
+
+        self.backend.response_bytes = True
+        self.backend.submit("g.V()").all().result()
+        self.assertGreater(self.backend.metrics.snapshot("caller")[caller]
+                           ["response_bytes"], 0)
+
+    def test_errors_are_recorded_and_logged(self):
+        """ Asserts that failed queries are counted and logged """
+        self.backend.log = True
+        with self.assertLogs("db.queries") as logs:
+            with self.assertRaises(Exception):
+                self.backend.submit("g.V().unknownStep()").all().result()
+
+        sample = json.loads(logs.records[0].getMessage())
+        self.assertEqual(sample["error"], "GremlinServerError")
+        self.assertEqual(self.backend.metrics.snapshot("query")[
+            "g.V().unknownStep()"]["errors"], 1)
+
+    def test_histogram_percentiles_and_overflow(self):
+        """ Asserts the bucketed percentiles and the capped number of keys """
+        histogram = LatencyHistogram()
+        for duration in [0.5, 3, 3, 3, 20000]:
+            histogram.record({"duration_ms": duration, "error": None,
+                              "results": 0, "response_bytes": 0,
+                              "request_charge": None})
+        self.assertEqual(histogram.percentile(50), 5)
+        self.assertEqual(histogram.percentile(100), 20000)
+
+        metrics = QueryMetrics(max_keys=1)
+        for query in ["a", "b", "c"]:
+            metrics.record({"query": query, "caller": None, "endpoint": None,
+                            "duration_ms": 1, "error": None, "results": 0,
+                            "response_bytes": 0, "request_charge": 1})
+        self.assertEqual(metrics.snapshot("query")["<other>"]["count"], 2)
+        self.assertEqual(metrics.top("query", count=1)[0][0], "<other>")
+
+    def test_slow_queries_are_logged(self):
+        """ Asserts that the slow queries are kept with their (redacted)
+            bindings, and that only the last `size` of them are kept
+        """
+        self.backend.slow_queries = SlowQueryLog(threshold_ms=0, size=2)
+        with self.assertLogs("db.queries", level="WARNING"):
+            self.backend.submit(
+                "g.addV('user').property('password', p0)"
+                ".property('email', p1)",
+                {"p0": "hash", "p1": "e" * 300}).all().result()
+        entry = self.backend.slow_queries.snapshot()[0]
+        self.assertEqual(entry["bindings"]["p0"], "<redacted>")
+        self.assertEqual(len(entry["bindings"]["p1"]), 203)
+        self.assertEqual(entry["caller"], "InstrumentationTestCase."
+                         "test_slow_queries_are_logged")
+        self.assertIsNone(entry["profile"])
+
+        for index in range(3):
+            self.backend.submit("g.V().limit(n)", {"n": index})
+        entries = self.backend.slow_queries.snapshot()
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(sorted(i["bindings"]["n"] for i in entries), [1, 2])
+
+        self.backend.slow_queries.threshold_ms = 10 ** 6
+        self.backend.submit("g.V()")
+        self.assertEqual(len(self.backend.slow_queries.snapshot()), 2)
+
+    def test_slow_reads_are_profiled(self):
+        """ Asserts that slow read queries are submitted again with the
+            profile step, while writes never are
+        """
+        self.backend.slow_queries = SlowQueryLog(
+            threshold_ms=0, profile=True, profile_step="explain")
+        with self.assertLogs("db.queries", level="WARNING"):
+            self.backend.submit("g.addV('a')").all().result()
+            self.backend.submit("g.V().hasLabel('a')").all().result()
+        self.backend.slow_queries.flush(timeout=5)
+
+        entries = {i["query"]: i for i in
+                   self.backend.slow_queries.snapshot()}
+        write, read = entries["g.addV('a')"], entries["g.V().hasLabel('a')"]
+        self.assertIsNone(write["profile"])
+        # The memory backend doesn't implement the profile steps
+        self.assertIn("explain", read["profile"]["error"])
+        # The profiles aren't recorded as queries
+        self.assertEqual(len(self.backend.metrics.snapshot("query")), 2)
@@ -0,0 +1,62 @@
+from db.backends import LazyBackend
+from db.memory import MemoryGraphBackend
+import unittest
+import os
+
+
+class LazyBackendTestCase(unittest.TestCase):
+    """ Contains all of the test cases to confirm that:
+        1) The backend is only created upon it's first use
+        2) The backend inherited from another process is discarded without
+            being closed
+        3) Closing the backend only closes the current process' backend
+    """
+    def setUp(self):
+        self.created = []
+
+        def factory():
+            backend = MemoryGraphBackend()
+            backend.closed = False
+            backend.close = lambda: setattr(backend, "closed", True)
+            self.created.append(backend)
+            return backend
+
+        self.client = LazyBackend(factory)
+
+    def test_backend_is_created_on_first_use(self):
+        self.assertFalse(self.client.initialized)
+        self.assertEqual(self.created, [])
+
+        self.client.submit("g.addV('team')").all().result()
+        self.assertEqual(len(self.client.submit("g.V()").all().result()), 1)
+        self.assertEqual(self.client.name, "memory")
+        self.assertEqual(self.client.queries, 2)
+        self.assertEqual(self.client.warmup(), 0)
+        self.assertEqual(len(self.created), 1)
+
+    def test_inherited_backend_is_discarded(self):
+        """ Asserts that a new backend is created after a fork (or in a
+            process with another pid) and the inherited one is left open
+        """
+        self.client.submit("g.addV('team')").all().result()
+        self.client.after_fork()
+        self.assertFalse(self.client.initialized)
+        self.assertEqual(self.client.submit("g.V()").all().result(), [])
+
+        # A backend created by another process
+        self.client._pid = os.getpid() + 1
+        self.assertFalse(self.client.initialized)
+        self.client.stats()
+
+        self.assertEqual(len(self.created), 3)
+        self.assertEqual([i.closed for i in self.created],
+                         [False, False, False])
+
+    def test_close_only_closes_the_current_backend(self):
+        self.client.close()
+        self.assertEqual(self.created, [])
+
+        self.client.stats()
+        self.client.close()
+        self.assertTrue(self.created[0].closed)
+        self.assertFalse(self.client.initialized)
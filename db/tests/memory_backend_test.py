@@ -0,0 +1,134 @@
+from gremlin_python.driver.protocol import GremlinServerError
+from db.memory import MemoryGraphBackend
+from db.backends import load_backend
+import unittest
+
+
+class MemoryBackendTestCase(unittest.TestCase):
+    """ Contains all of the test cases to confirm that:
+        1) The memory backend returns results in the same shape (and
+            through the same ResultSet interface) as CosmosDB
+        2) The traversal shapes used by the models behave the same way
+            they do on a Gremlin server
+    """
+    def setUp(self):
+        self.backend = MemoryGraphBackend()
+
+    def query(self, message, bindings=None):
+        return self.backend.submit(message, bindings).all().result()
+
+    def create(self, label, **properties):
+        query = f"g.addV('{label}')" + "".join(
+            f".property('{key}', '{value}')"
+            for key, value in properties.items())
+        return self.query(query)[0]
+
+    def connect(self, label, out_id, in_id):
+        return self.query(
+            f"g.V().has('id', out_id).addE('{label}')"
+            f".to(g.V().has('id', in_id))",
+            {"out_id": out_id, "in_id": in_id})[0]
+
+    def test_load_backend_from_settings(self):
+        """ Asserts that the backend is selected through the settings """
+        backend = load_backend({"backend": "memory"})
+        self.assertEqual(backend.name, "memory")
+
+        with self.assertRaises(ValueError):
+            load_backend({"backend": "unknown"})
+
+    def test_vertex_and_edge_format(self):
+        """ Asserts that elements are returned in the GraphSON format the
+            models' `vertex_to_instance` and `edge_to_instance` expect
+        """
+        team = self.create("team", name="Team")
+        cv = self.create("coreVertex", title="CV")
+        edge = self.connect("owns", team["id"], cv["id"])
+
+        self.assertEqual(team["type"], "vertex")
+        self.assertEqual(team["properties"]["name"][0]["value"], "Team")
+        self.assertEqual(edge["outV"], team["id"])
+        self.assertEqual(edge["inV"], cv["id"])
+        self.assertEqual(edge["inVLabel"], "coreVertex")
+
+    def test_bindings_and_iteration(self):
+        """ Asserts that bound values are matched on and that the results
+            can be read through `one()`/`next()` in batches
+        """
+        for index in range(100):
+            self.create("coreVertex", title=str(index))
+
+        results = self.query("g.V().hasLabel('coreVertex').has('title', t)",
+                             {"t": "42"})
+        self.assertEqual(len(results), 1)
+
+        result_set = self.backend.submit("g.V().hasLabel('coreVertex')")
+        first = result_set.one()
+        self.assertEqual(len(first), MemoryGraphBackend.BATCH_SIZE)
+        self.assertEqual(len(result_set.next()), 100 - len(first))
+
+    def test_repeat_path_to_team(self):
+        """ Asserts the breadcrumbs traversal used by
+            `get_core_vertex_with_details` returns the path up to the team
+        """
+        team = self.create("team", name="Team")
+        parent = self.create("coreVertex", title="Parent")
+        child = self.create("coreVertex", title="Child")
+        self.connect("owns", team["id"], parent["id"])
+        self.connect("owns", parent["id"], child["id"])
+
+        result = self.query(
+            "g.V().has('coreVertex', 'id', cv_id).fold()"
+            ".project('cv', 'path')"
+            ".by(unfold())"
+            ".by(unfold().until(__.hasLabel('team'))"
+            ".repeat(__.in('owns')).path())",
+            {"cv_id": child["id"]})[0]
+
+        objects = [i["id"] for i in result["path"]["objects"][1:]]
+        self.assertEqual(objects, [child["id"], parent["id"], team["id"]])
+
+    def test_project_without_value_raises(self):
+        """ Asserts that a `by()` without a result raises the same server
+            error CosmosDB does, which the models use for missing vertices
+        """
+        with self.assertRaises(GremlinServerError):
+            self.query("g.V().has('id', 'missing').fold()"
+                       ".project('cv').by(unfold())")
+
+    def test_choose_option_and_coalesce(self):
+        """ Asserts that the choose/option and coalesce branches used by
+            the permission queries select the right branch
+        """
+        self.create("team", name="Team")
+        cv = self.create("coreVertex", title="CV")
+
+        result = self.query(
+            "g.V().hasLabel('team', 'coreVertex').choose(label())"
+            ".option('team', constant('t'))")
+        self.assertEqual(result, ["t"])
+
+        result = self.query(
+            "g.V().has('id', cv_id).coalesce(values('missing'), "
+            "values('title'))", {"cv_id": cv["id"]})
+        self.assertEqual(result, ["CV"])
+
+    def test_drop_removes_edges(self):
+        """ Asserts that dropping a vertex drops all of it's edges """
+        team = self.create("team", name="Team")
+        cv = self.create("coreVertex", title="CV")
+        self.connect("owns", team["id"], cv["id"])
+
+        self.query("g.V().has('id', cv_id).drop()", {"cv_id": cv["id"]})
+
+        self.assertEqual(self.query("g.E().count()"), [0])
+        self.assertEqual(self.query("g.V().count()"), [1])
+
+    def test_scripts_are_parsed_once(self):
+        """ Asserts that the same script with different bindings is only
+            parsed once
+        """
+        for index in range(5):
+            self.query("g.V().has('id', vertex_id)", {"vertex_id": index})
+
+        self.assertEqual(self.backend.stats()["parsed_scripts"], 1)
@@ -0,0 +1,50 @@
+from utils.flask_test_case import FlaskTestCase
+from core.models import *
+from db.exceptions import InvalidCursorException
+
+
+class PaginationTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) Following the cursors of `Vertex.filter` returns every vertex
+            exactly once, in order (including ties on the sort key)
+        2) Cursors can't be reused for a different ordering
+    """
+    def setUp(self):
+        """ Fixtures for the test cases;
+            variables that remain the same for all of the test cases
+        """
+        super().setUp()
+        # Every title is shared by two vertices, to test the id tie-breaker
+        self.vertices = CoreVertex.bulk_create(
+            [{"title": f"Node {i // 2:02}", "templateData": "{}"}
+             for i in range(25)])
+
+    def read_pages(self, **kwargs):
+        """ Returns all of the pages by following the cursors """
+        pages = [CoreVertex.filter(limit=10, **kwargs)]
+        while pages[-1].cursor:
+            pages.append(CoreVertex.filter(
+                limit=10, cursor=pages[-1].cursor, **kwargs))
+        return pages
+
+    def test_pages_follow_sort_order(self):
+        """ Asserts that the pages are ordered and don't overlap """
+        pages = self.read_pages(order_by="title", templateData="{}")
+
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        ordered = sorted(self.vertices, key=lambda v: (v.title, v.id))
+        self.assertEqual([v.id for page in pages for v in page],
+                         [v.id for v in ordered])
+
+        pages = self.read_pages(order_by="id", descending=True)
+        self.assertEqual([v.id for page in pages for v in page],
+                         sorted([v.id for v in self.vertices], reverse=True))
+
+    def test_cursor_is_bound_to_ordering(self):
+        """ Asserts that a cursor can't be used with another ordering """
+        page = CoreVertex.filter(limit=10, order_by="title")
+
+        with self.assertRaises(InvalidCursorException):
+            CoreVertex.filter(limit=10, order_by="id", cursor=page.cursor)
+        with self.assertRaises(InvalidCursorException):
+            CoreVertex.filter(limit=10, order_by="title", cursor="invalid")
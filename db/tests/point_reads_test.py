@@ -0,0 +1,88 @@
+from utils.flask_test_case import FlaskTestCase
+from db.identity import clear_identity_map
+from db.memory import MemoryGraphBackend
+from db.engine import vertex_key
+from core.models import *
+
+
+class PointReadsTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) Vertices are looked up by their partition-qualified
+            `[partition_key_value, id]` ids whenever the label is known
+        2) Partitioned ids only match vertices in the given partition
+        3) Edges are deleted through their out vertex's partition
+    """
+    def test_partitioned_ids_match_the_partition(self):
+        """ Asserts that the memory backend only returns the vertex if it's
+            partition key matches
+        """
+        backend = MemoryGraphBackend(partition_key="topic")
+        vertex = backend.submit(
+            "g.addV('team').property('topic', 'team')").all().result()[0]
+
+        def lookup(key):
+            return backend.submit(
+                "g.V(key)", {"key": key}).all().result()
+
+        self.assertEqual(
+            [i["id"] for i in lookup(["team", vertex["id"]])], [vertex["id"]])
+        self.assertEqual(lookup(["coreVertex", vertex["id"]]), [])
+        # The same id looked up in several partitions (i.e. when the label
+        # of the vertex isn't known)
+        self.assertEqual(
+            [i["id"] for i in backend.submit(
+                "g.V(team_key, cv_key)", {
+                    "team_key": ["team", vertex["id"]],
+                    "cv_key": ["coreVertex", vertex["id"]]
+                }).all().result()], [vertex["id"]])
+
+        # Without a partition key, both of the list's items are ids
+        backend.partition_key = None
+        self.assertEqual(
+            [i["id"] for i in lookup(["coreVertex", vertex["id"]])],
+            [vertex["id"]])
+
+    def test_id_lookups_are_point_reads(self):
+        """ Asserts that id filters, updates and deletes use the vertex's
+            partition-qualified id
+        """
+        team = Team.create(name="Team")
+        clear_identity_map()
+
+        self.assertEqual(vertex_key(Team.LABEL, team.id), ["team", team.id])
+        self.assertEqual(Team.filter(id=team.id)[0].name, "Team")
+        self.assertEqual(
+            len(Team.filter(id=team.id, name="Team", fields=["name"])), 1)
+        self.assertEqual(Team.filter(id=team.id, name="Other"), [])
+        self.assertEqual(CoreVertex.filter(id=team.id), [])
+
+        templates = Team.query_templates()._templates
+        self.assertTrue(all(
+            i.startswith("g.V(vertex_key)") for key, i in templates.items()
+            if key[0] == "filter"))
+
+        Team.update({"name": "Renamed"}, vertex_id=team.id)
+        self.assertIsNone(
+            CoreVertex.update({"title": "Nope"}, vertex_id=team.id))
+        self.assertEqual(Team.filter(id=team.id)[0].name, "Renamed")
+
+        team.delete()
+        self.assertEqual(Team.filter(id=team.id), [])
+
+    def test_edges_are_deleted_through_the_out_vertex(self):
+        """ Asserts that edges loaded from a response are looked up through
+            their out vertex's partition
+        """
+        team = Team.create(name="Team")
+        template = Template.create(name="Template", canHaveChildren=False)
+        edge = TeamOwnsTemplate.create(outv_id=team.id, inv_id=template.id)
+        self.assertEqual(edge.outVLabel, "team")
+
+        found = TeamOwnsTemplate.filter(outv_id=team.id, inv_id=template.id)
+        self.assertEqual([i.id for i in found], [edge.id])
+
+        edge.delete()
+        self.assertIn(("delete", True), TeamOwnsTemplate.query_templates()
+                      ._templates)
+        self.assertEqual(
+            TeamOwnsTemplate.filter(outv_id=team.id, inv_id=template.id), [])
@@ -0,0 +1,64 @@
+from utils.flask_test_case import FlaskTestCase
+from core.models import *
+
+
+class QueryTemplatesTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) Queries with the same shape reuse the same template
+        2) Values sent through the bindings are stored/matched exactly
+            as they were with the string-built queries
+    """
+    def setUp(self):
+        """ Fixtures for the test cases;
+            variables that remain the same for all of the test cases
+        """
+        super().setUp()
+        CoreVertex.query_templates().clear()
+        Team.query_templates().clear()
+
+    def test_same_shape_reuses_template(self):
+        """ Asserts that creating vertices with the same set of properties
+            only ever generates a single template
+        """
+        CoreVertex.create(title="First", templateData="{}", content="")
+        CoreVertex.create(title="Second", templateData="{}", content="")
+
+        templates = CoreVertex.query_templates()
+        self.assertEqual(len(templates), 1)
+        self.assertEqual(templates.hits, 1)
+
+        # A different set of properties is a different shape
+        CoreVertex.create(title="Third", templateData="{}")
+        self.assertEqual(len(templates), 2)
+
+    def test_templates_are_not_shared_between_classes(self):
+        """ Asserts that every class keeps it's own templates """
+        Team.create(name="Test Team")
+
+        self.assertEqual(len(CoreVertex.query_templates()), 0)
+        self.assertEqual(len(Team.query_templates()), 1)
+
+    def test_bound_values_round_trip(self):
+        """ Asserts that values passed through the bindings (including
+            quotes) are written and filtered on correctly
+        """
+        title = "It's a \"quoted\" title"
+        vertex = CoreVertex.create(title=title, templateData="{}")
+
+        result = CoreVertex.filter(title=title)
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0].id, vertex.id)
+
+        updated = CoreVertex.update(
+            vertex_id=vertex.id, validated_data={"content": "Updated"})
+        self.assertEqual(updated.content, "Updated")
+
+        template = Template.create(name="TestTemplate", canHaveChildren=True)
+        team = Team.create(name="Test Team")
+        TeamOwnsTemplate.create(team=team.id, template=template.id)
+
+        edges = TeamOwnsTemplate.filter(outv_id=team.id, inv_id=template.id)
+        self.assertEqual(len(edges), 1)
+        # Values are still stored as strings
+        self.assertEqual(Template.filter(id=template.id)[0].canHaveChildren,
+                         "True")
@@ -0,0 +1,94 @@
+from gremlin_python.driver import serializer
+from gremlin_python.statics import long
+from db.connection import ConnectionManager
+from db.serialization import (
+    LeanGraphSONReader,
+    LeanGraphSONSerializer,
+    load_serializer
+)
+from core.models import CoreVertex, TemplateHasProperty
+import unittest
+
+
+def typed(graphson_type, value):
+    return {"@type": graphson_type, "@value": value}
+
+
+class SerializationTestCase(unittest.TestCase):
+    """ Contains all of the test cases to confirm that:
+        1) The serializer is selected by it's name
+        2) Untyped (CosmosDB) responses are left as they are by the lean
+            reader
+        3) Typed vertices and edges are decoded into the shape read by the
+            models, along with the typed values within them
+    """
+    def test_serializers_are_selected_by_name(self):
+        self.assertIsInstance(
+            load_serializer("graphson2"), serializer.GraphSONSerializersV2d0)
+        self.assertIsInstance(
+            load_serializer("graphson3"), serializer.GraphSONSerializersV3d0)
+        self.assertEqual(load_serializer("lean").version,
+                         b"application/vnd.gremlin-v2.0+json")
+        self.assertEqual(load_serializer("lean3").version,
+                         b"application/vnd.gremlin-v3.0+json")
+        with self.assertRaises(ValueError):
+            load_serializer("graphbinary")
+
+        manager = ConnectionManager(
+            "ws://localhost", "g", pool_size=0, serializer="lean",
+            client_factory=lambda: None)
+        self.assertEqual(manager.serializer, "lean")
+
+    def test_untyped_responses_are_unchanged(self):
+        vertex = {
+            "id": "1", "label": "coreVertex", "type": "vertex",
+            "properties": {"title": [{"id": "p1", "value": "Title"}]}
+        }
+        message = {
+            "requestId": "r1",
+            "status": {"code": 200, "attributes": {}, "message": ""},
+            "result": {"data": [{"child": vertex, "count": 2}], "meta": {}}
+        }
+        data = message["result"]["data"]
+
+        decoded = LeanGraphSONSerializer().deserialize_message(message)
+        self.assertIs(decoded["result"]["data"], data)
+        self.assertIs(data[0]["child"], vertex)
+        self.assertEqual(
+            CoreVertex.vertex_to_instance(vertex).title, "Title")
+
+    def test_typed_vertices_and_edges_are_decoded(self):
+        reader = LeanGraphSONReader(version=3)
+        vertex = reader.toObject(typed("g:Vertex", {
+            "id": typed("g:Int64", 1),
+            "label": "coreVertex",
+            "properties": {"title": [typed("g:VertexProperty", {
+                "id": typed("g:Int64", 2), "label": "title",
+                "value": "Title"
+            })]}
+        }))
+        self.assertEqual(vertex, {
+            "id": 1, "label": "coreVertex", "type": "vertex",
+            "properties": {"title": [{"id": 2, "value": "Title"}]}
+        })
+        self.assertIsInstance(vertex["id"], long)
+        self.assertEqual(
+            CoreVertex.vertex_to_instance(vertex).title, "Title")
+
+        edge = reader.toObject(typed("g:Edge", {
+            "id": typed("g:Int64", 3), "label": "hasProperty",
+            "outV": typed("g:Int64", 4), "outVLabel": "template",
+            "inV": typed("g:Int64", 5), "inVLabel": "property",
+            "properties": {"index": typed("g:Property", {
+                "key": "index", "value": typed("g:Int32", 0)
+            })}
+        }))
+        instance = TemplateHasProperty.edge_to_instance(edge)
+        self.assertEqual(
+            (instance.id, instance.outV, instance.inV, instance.outVLabel),
+            (3, 4, 5, "template"))
+        self.assertEqual(instance.index, 0)
+
+        self.assertEqual(reader.toObject(typed("g:List", [
+            typed("g:Int32", 1), {"key": typed("g:Double", 1.5)}
+        ])), [1, {"key": 1.5}])
@@ -0,0 +1,104 @@
+from utils.flask_test_case import FlaskTestCase
+from flask_jwt_extended import create_access_token
+from gremlin_python.driver.resultset import ResultSet
+from concurrent.futures import Future
+from db.backends import iterate_batches
+from utils.general_utils import stream_json_response
+from auth.models import *
+from auth.serializers import UserListSchema
+from core.models import *
+import threading
+import json
+import queue
+
+
+class StreamFilterTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) `stream_filter` yields the same instances as `filter`, in
+            batches of at most the given batch size
+        2) Batches are yielded as they arrive, before the whole response
+            has been received
+        3) Errors raised while streaming a response are reported to the
+            client, and the streamed instances are closed
+    """
+    def test_stream_filter_matches_filter(self):
+        """ Asserts that streamed vertices/edges match the filtered ones """
+        team = Team.create(name="Team")
+        vertices = CoreVertex.bulk_create(
+            [{"title": f"Node {i}", "templateData": "{}"} for i in range(10)])
+        CoreVertexOwnership.bulk_create([(team.id, v.id) for v in vertices])
+
+        stream = CoreVertex.stream_filter(templateData="{}", batch_size=3)
+        self.assertEqual([v.id for v in stream],
+                         [v.id for v in CoreVertex.filter(templateData="{}")])
+
+        edges = list(CoreVertexOwnership.stream_filter(batch_size=4))
+        self.assertEqual(len(edges), 10)
+        self.assertTrue(all(e.outV == team.id for e in edges))
+
+    def test_batches_are_yielded_as_they_arrive(self):
+        """ Asserts that the first batch is yielded before the response is
+            complete, and that the batches are capped to the batch size
+        """
+        result_set = ResultSet(queue.Queue(), "request")
+        result_set.done = Future()
+        received = threading.Event()
+
+        def respond():
+            result_set.stream.put([1, 2, 3, 4, 5])
+            received.wait(5)
+            result_set.stream.put([6])
+            result_set.done.set_result(None)
+        threading.Thread(target=respond).start()
+
+        batches = iterate_batches(result_set, batch_size=2)
+        self.assertEqual(next(batches), [1, 2])
+        self.assertFalse(result_set.done.done())
+        received.set()
+        self.assertEqual(list(batches), [[3, 4], [5], [6]])
+
+    def test_user_search_streams_json(self):
+        """ Asserts that the streamed user search returns a JSON list """
+        user = User.create(**self.test_user_details)
+        token = create_access_token(identity=user)
+
+        r = self.client.get(
+            "/auth/users?fullName=Te", headers=self.generate_headers(token))
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([i["id"] for i in r.json], [user.id])
+
+    def stream_users(self, users, fail_at, closed):
+        """ Yields the users, raising an error before the `fail_at` user """
+        try:
+            for index, user in enumerate(users):
+                if index == fail_at:
+                    raise RuntimeError("Connection lost")
+                yield user
+        finally:
+            closed.append(True)
+
+    def test_streamed_response_errors(self):
+        """ Asserts that an error before the first instance returns a 500,
+            and that an error mid-stream ends the list with an error element
+        """
+        users = [User.create(username=f"U{i}", email=f"u{i}@g.com",
+                             password="TestPass", fullName=f"User {i}")
+                 for i in range(3)]
+
+        with self.app.test_request_context():
+            closed = []
+            r = stream_json_response(
+                self.stream_users(users, 0, closed), UserListSchema())
+            self.assertEqual(r.status_code, 500)
+            self.assertEqual(closed, [True])
+
+            closed = []
+            r = stream_json_response(
+                self.stream_users(users, 2, closed), UserListSchema())
+            self.assertEqual(r.status_code, 200)
+            body = json.loads(r.get_data(as_text=True))
+            self.assertEqual([i.get("id") for i in body[:2]],
+                             [users[0].id, users[1].id])
+            self.assertEqual(body[2], {"error": "Internal server error"})
+            self.assertEqual(closed, [True])
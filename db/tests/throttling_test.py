@@ -0,0 +1,107 @@
+from gremlin_python.driver.protocol import GremlinServerError
+from db.throttling import (
+    AdaptiveTokenBucket,
+    ThrottledBackend,
+    retry_after
+)
+from db.exceptions import RequestThrottledException
+from db.memory import MemoryGraphBackend
+import unittest
+
+
+def throttled_error(retry_after_ms="00:00:00.2500000"):
+    """ Returns the error CosmosDB responds with to throttled requests """
+    return GremlinServerError({
+        "code": 500,
+        "message": "RequestRateTooLarge",
+        "attributes": {"x-ms-status-code": 429,
+                       "x-ms-retry-after-ms": retry_after_ms}
+    })
+
+
+class FlakyBackend(MemoryGraphBackend):
+    """ A memory backend that throttles the first `throttled` requests """
+    def __init__(self, throttled):
+        super().__init__()
+        self.throttled = throttled
+
+    def submit(self, message, bindings=None):
+        result_set = super().submit(message, bindings)
+        if self.throttled:
+            self.throttled -= 1
+            result_set.done = type(result_set.done)()
+            result_set.done.set_exception(throttled_error())
+        return result_set
+
+
+class FakeClock:
+    """ A clock that only moves forward when slept on """
+    def __init__(self):
+        self.now = 0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class ThrottlingTestCase(unittest.TestCase):
+    """ Contains all of the test cases to confirm that:
+        1) Throttled queries are retried after the retry-after hint, and
+            dropped after the maximum number of retries
+        2) The token bucket limits the request rate and slows down when
+            requests are throttled
+    """
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = AdaptiveTokenBucket(
+            rate=10, burst=2, clock=self.clock, sleep=self.clock.sleep)
+
+    def backend(self, throttled, max_retries=3):
+        return ThrottledBackend(
+            FlakyBackend(throttled), self.bucket, max_retries=max_retries,
+            backoff=0, max_wait=1, sleep=self.clock.sleep)
+
+    def test_throttled_queries_are_retried(self):
+        """ Asserts the retries (honoring the hint) and the counters """
+        backend = self.backend(throttled=2)
+        self.assertEqual(backend.submit("g.inject(1)").all().result(), [1])
+
+        self.assertEqual(self.clock.slept.count(0.25), 2)
+        self.assertEqual(backend.stats()["throttling"]["retried"], 2)
+        self.assertEqual(backend.stats()["throttling"]["dropped"], 0)
+        self.assertLess(self.bucket.rate, 10)
+
+        backend = self.backend(throttled=5, max_retries=1)
+        with self.assertRaises(GremlinServerError):
+            backend.submit("g.inject(1)").all().result()
+        self.assertEqual(backend.stats()["throttling"]["dropped"], 1)
+
+    def test_token_bucket_limits_the_rate(self):
+        """ Asserts the waits for tokens and the dropped requests """
+        for i in range(3):
+            self.assertTrue(self.bucket.acquire())
+        # The burst is used up; the third token had to be waited for
+        self.assertAlmostEqual(sum(self.clock.slept), 0.1)
+
+        self.bucket.on_throttled()
+        self.assertEqual(self.bucket.rate, 5)
+        self.assertFalse(self.bucket.acquire(timeout=0.1))
+        self.bucket.on_success()
+        self.assertEqual(self.bucket.rate, 5.5)
+
+        backend = self.backend(throttled=0)
+        backend.bucket = AdaptiveTokenBucket(
+            rate=1, burst=0, clock=self.clock, sleep=self.clock.sleep)
+        with self.assertRaises(RequestThrottledException):
+            backend.max_wait = 0.5
+            backend.submit("g.inject(1)")
+
+    def test_retry_after_formats(self):
+        """ Asserts that both of the hint formats are parsed """
+        self.assertEqual(retry_after(throttled_error("1500")), 1.5)
+        self.assertEqual(retry_after(throttled_error("00:00:01.2500000")),
+                         1.25)
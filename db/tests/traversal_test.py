@@ -0,0 +1,89 @@
+from gremlin_python.process.traversal import P, TextP, T, Order, Cardinality
+from gremlin_python.process.traversal import Binding
+from db.traversal import (
+    g, __, translate, ScriptTranslator, translation_cache
+)
+from db.memory import MemoryGraphBackend
+import unittest
+
+
+class TraversalTranslationTestCase(unittest.TestCase):
+    """ Contains all of the test cases to confirm that:
+        1) Built traversals are translated into scripts where only the keys
+            and labels are literals, and every value is a binding
+        2) The same traversal shape is always translated to the same script
+        3) The translated scripts run on the memory backend
+        4) Traversals of an already translated shape are read from the
+            translation cache, with the same script and bindings
+    """
+    def test_values_are_bound(self):
+        """ Asserts the literals, bindings, predicates and tokens """
+        query, bindings = translate(
+            g.V(["team", "t1"]).has("user", "id", P.within(["a", "b"]))
+            .as_("u").out("owns").has("name", TextP.startingWith("x"))
+            .property(Cardinality.list_, "tags", "tag")
+            .order().by("name", Order.decr).by(T.id)
+            .project("a").by(__.in_("owns").count()).limit(3))
+
+        self.assertEqual(
+            query,
+            "g.V(b0).has('user', 'id', within(b1, b2)).as('u').out('owns')"
+            ".has('name', TextP.startingWith(b3))"
+            ".property(Cardinality.list, 'tags', b4)"
+            ".order().by('name', Order.decr).by(T.id)"
+            ".project('a').by(__.in('owns').count()).limit(b5)")
+        self.assertEqual(bindings, {
+            "b0": ["team", "t1"], "b1": "a", "b2": "b", "b3": "x",
+            "b4": "tag", "b5": 3})
+
+        # Traversals spawned from `g` are kept as such
+        query, _ = translate(g.V("a").addE("owns").from_(g.V("b")))
+        self.assertEqual(query, "g.V(b0).addE('owns').from(g.V(b1))")
+
+    def test_scripts_only_depend_on_the_shape(self):
+        """ Asserts that values (including quotes) never reach the script """
+        first, _ = translate(g.V().has("title", "a"))
+        second, bindings = translate(g.V().has("title", "it's'), drop()"))
+        self.assertEqual(first, second)
+        self.assertEqual(bindings["b0"], "it's'), drop()")
+
+        # Keys and labels are escaped
+        query, _ = translate(g.V().hasLabel("it's"))
+        self.assertEqual(query, "g.V().hasLabel('it\\'s')")
+
+    def test_translated_scripts_run_on_the_memory_backend(self):
+        """ Asserts that the translated traversals can be executed """
+        backend = MemoryGraphBackend()
+
+        def run(traversal):
+            return backend.submit(*translate(traversal)).all().result()
+
+        team = run(g.addV("team").property("name", "Team"))[0]
+        run(g.V(team["id"]).as_("t").addV("coreVertex")
+            .property("title", "it's").addE("owns").from_("t"))
+
+        self.assertEqual(run(g.V().has("title", "it's").values("title")),
+                         ["it's"])
+        self.assertEqual(run(
+            g.V().has("team", "id", team["id"]).out("owns").count()), [1])
+
+    def test_shapes_are_cached(self):
+        """ Asserts that the cached translations match the translator's """
+        def traversals(value, ids):
+            return [
+                g.V(["team", value]).has("user", "id", P.within(ids))
+                .order().by("name", Order.decr).limit(len(ids)),
+                g.V(value).as_("v").addE("owns").from_(g.V(value))
+                .property("role", value).select("v"),
+                g.V().has("title", Binding("title", value))
+                .where(__.out("owns").has("name", P.gt(value)))
+            ]
+
+        translation_cache.clear()
+        for value, ids in (("a", ["x"]), ("b", ["y"]), ("c", ["x", "y"])):
+            for traversal in traversals(value, ids):
+                self.assertEqual(translate(traversal),
+                                 ScriptTranslator().translate(traversal))
+        # The within() with two values is a different shape
+        self.assertEqual((translation_cache.hits, len(translation_cache)),
+                         (5, 4))
@@ -0,0 +1,60 @@
+from utils.flask_test_case import FlaskTestCase
+from db.engine import UnitOfWork
+from db.exceptions import CustomValidationFailedException
+from auth.models import *
+from core.models import *
+
+
+class UnitOfWorkTestCase(FlaskTestCase):
+    """ Contains all of the test cases to confirm that:
+        1) The creates/updates made through a unit of work are written
+            through a single traversal on commit, with new objects
+            referencing each other
+        2) Nothing is written if the validation fails or a referenced
+            vertex doesn't exist
+    """
+    def test_writes_are_flushed_as_one_traversal(self):
+        """ Asserts the created/updated vertices and edges """
+        team = Team.create(name="Team")
+        queries = client.stats()["queries"]
+
+        with UnitOfWork() as uow:
+            user = uow.create(User, **self.test_user_details)
+            account = uow.create(Account, title="myaccount@TestU")
+            holds = uow.create_edge(UserHoldsAccount, user, account,
+                                    relationType="primary")
+            uow.create_edge(AccountOwnsTeam, account, team.id)
+            uow.update(Team, team.id, name="Renamed")
+            uow.update(User, user, fullName="Renamed")
+
+        # The AccountOwnsTeam validation (to an existing team) + the writes
+        self.assertEqual(client.stats()["queries"], queries + 2)
+        self.assertEqual(user.instance.id, user.id)
+        self.assertEqual(user.instance.username, "TestU")
+        self.assertEqual((holds.instance.outV, holds.instance.inV),
+                         (user.id, account.id))
+        self.assertEqual(AccountOwnsTeam.get_teams(account.id)[0].name,
+                         "Renamed")
+        self.assertEqual(User.filter(id=user.id)[0].fullName, "Renamed")
+
+    def test_nothing_is_written_on_failures(self):
+        """ Asserts that validation failures and missing vertices stop the
+            whole unit of work
+        """
+        team = Team.create(name="Team")
+        cv = CoreVertex.create(title="CV", templateData="{}")
+        CoreVertexOwnership.create(team=team.id, coreVertex=cv.id)
+
+        uow = UnitOfWork()
+        uow.create(CoreVertex, title="Node", templateData="{}")
+        # Already owned by the team
+        uow.create_edge(CoreVertexOwnership, team.id, cv.id)
+        with self.assertRaises(CustomValidationFailedException):
+            uow.commit()
+
+        with self.assertRaises(CustomValidationFailedException):
+            with UnitOfWork() as uow:
+                node = uow.create(CoreVertex, title="Node", templateData="{}")
+                uow.create_edge(CoreVertexOwnership, "missing", node)
+
+        self.assertEqual([i.title for i in CoreVertex.filter()], ["CV"])
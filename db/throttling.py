@@ -0,0 +1,248 @@
+""" Provides the throttling layer wrapped around the graph backend, which
+    retries the queries rejected by CosmosDB for exceeding the provisioned
+    request units (429 / "Request rate is large") after the server's
+    retry-after hint, and limits the rate of submitted queries through a
+    token bucket that slows down whenever the server throttles
+"""
+from gremlin_python.driver.protocol import GremlinServerError
+from db.backends import GraphBackend
+from db.exceptions import RequestThrottledException
+import threading
+import random
+import time
+
+
+THROTTLED_STATUS_CODE = 429
+# The status attributes CosmosDB reports the real status code and the
+# retry-after hint (in ms, or as a TimeSpan string) through
+STATUS_CODE_ATTRIBUTE = "x-ms-status-code"
+RETRY_AFTER_ATTRIBUTE = "x-ms-retry-after-ms"
+
+
+def is_throttled(error):
+    """ Returns whether the error is the server rejecting a request for
+        exceeding the request rate
+    """
+    if not isinstance(error, GremlinServerError):
+        return False
+    attributes = error.status_attributes or {}
+    return error.status_code == THROTTLED_STATUS_CODE or \
+        str(attributes.get(STATUS_CODE_ATTRIBUTE)) == \
+        str(THROTTLED_STATUS_CODE) or \
+        "RequestRateTooLarge" in str(error)
+
+
+def retry_after(error):
+    """ Returns the retry-after hint (in seconds) of a throttled error, or
+        None if there isn't one
+    """
+    value = (error.status_attributes or {}).get(RETRY_AFTER_ATTRIBUTE)
+    if value is None:
+        return None
+    try:
+        return float(value) / 1000
+    except (TypeError, ValueError):
+        pass
+    # TimeSpan format, i.e. "00:00:00.1230000"
+    try:
+        hours, minutes, seconds = str(value).split(":")
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except ValueError:
+        return None
+
+
+class AdaptiveTokenBucket:
+    """ A token bucket limiting the rate of submitted requests to `rate`
+        requests per second (with bursts of up to `burst` requests).
+        The rate is halved (down to `min_rate`) whenever a request is
+        throttled, and is increased back by `increase` requests per second
+        with each successful request (up to `max_rate`)
+    """
+    def __init__(self, rate, burst, min_rate=1, max_rate=None, increase=0.5,
+                 decrease=0.5, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate
+        self.increase = increase
+        self.decrease = decrease
+        self.clock = clock
+        self.sleep = sleep
+
+        self.tokens = burst
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, timeout=None):
+        """ Takes a token, waiting up to `timeout` seconds for one to become
+            available; returns False if none did
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            with self._lock:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+
+            if deadline is not None:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            self.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttled(self):
+        """ Slows the rate down and drops the tokens left for bursting """
+        with self._lock:
+            self.refill()
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = min(self.tokens, 0)
+
+
+class ThrottledBackend(GraphBackend):
+    """ Wraps a GraphBackend, submitting every query through the
+        AdaptiveTokenBucket and retrying throttled queries (up to
+        `max_retries` times) after the server's retry-after hint plus a
+        jittered exponential backoff.
+        Queries that are still throttled after all of the retries are
+        returned as is (raising the server's error when read), and queries
+        that couldn't get a token within `max_wait` seconds raise a
+        RequestThrottledException; both are counted as dropped.
+        All other attributes are looked up on the wrapped backend
+    """
+    def __init__(self, backend, bucket=None, max_retries=5, backoff=0.1,
+                 backoff_max=5, max_wait=30, sleep=time.sleep):
+        self.backend = backend
+        self.bucket = bucket or AdaptiveTokenBucket(rate=50, burst=20)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.max_wait = max_wait
+        self.sleep = sleep
+
+        self._lock = threading.Lock()
+        self._throttled = 0
+        self._retried = 0
+        self._dropped = 0
+
+    @classmethod
+    def from_settings(cls, backend, settings):
+        bucket = AdaptiveTokenBucket(
+            rate=settings.get("throttle_rate", 50),
+            burst=settings.get("throttle_burst", 20),
+            min_rate=settings.get("throttle_min_rate", 1))
+        return cls(backend, bucket,
+                   max_retries=settings.get("throttle_max_retries", 5),
+                   backoff=settings.get("throttle_backoff", 0.1),
+                   backoff_max=settings.get("throttle_backoff_max", 5),
+                   max_wait=settings.get("throttle_max_wait", 30))
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def __getattr__(self, attribute):
+        return getattr(self.backend, attribute)
+
+    def warmup(self, connections=None):
+        return self.backend.warmup(connections)
+
+    def count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def delay(self, error, attempt):
+        """ Returns the number of seconds to wait before retrying the given
+            attempt; the retry-after hint plus a random value up to the
+            (capped) exponential backoff
+        """
+        ceiling = min(self.backoff_max, self.backoff * (2 ** attempt))
+        return (retry_after(error) or 0) + random.uniform(0, ceiling)
+
+    def acquire(self):
+        if not self.bucket.acquire(timeout=self.max_wait):
+            self.count("_dropped")
+            raise RequestThrottledException(
+                f"The query could not be submitted within {self.max_wait} "
+                f"seconds due to throttling")
+
+    def throttled(self, error, attempt):
+        """ Records a throttled attempt; returns whether it should be
+            retried (after waiting for it's delay)
+        """
+        self.count("_throttled")
+        self.bucket.on_throttled()
+        if attempt >= self.max_retries:
+            self.count("_dropped")
+            return False
+
+        self.count("_retried")
+        self.sleep(self.delay(error, attempt))
+        return True
+
+    def submit(self, message, bindings=None):
+        """ Submits the message through the wrapped backend, retrying it for
+            as long as it's throttled (up to `max_retries` times)
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            result_set = self.backend.submit(message, bindings)
+            error = result_set.done.exception()
+            if not is_throttled(error):
+                self.bucket.on_success()
+                return result_set
+            if not self.throttled(error, attempt):
+                return result_set
+            attempt += 1
+
+    def stream(self, message, bindings=None, batch_size=None):
+        """ Yields the batches streamed by the wrapped backend; the query is
+            only retried if it's throttled before the first batch arrives
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            batches = self.backend.stream(message, bindings, batch_size)
+            try:
+                first = next(batches, None)
+            except Exception as e:
+                if is_throttled(e) and self.throttled(e, attempt):
+                    attempt += 1
+                    continue
+                raise
+            break
+
+        self.bucket.on_success()
+        if first is not None:
+            yield first
+        yield from batches
+
+    def stats(self):
+        """ Returns the wrapped backend's stats along with the throttling
+            counters and the limiter's current rate
+        """
+        stats = dict(self.backend.stats())
+        with self._lock:
+            stats["throttling"] = {
+                "rate": round(self.bucket.rate, 3),
+                "throttled": self._throttled,
+                "retried": self._retried,
+                "dropped": self._dropped
+            }
+        return stats
+
+    def close(self):
+        self.backend.close()
@@ -0,0 +1,259 @@
+""" Provides the traversal builder used by the models in place of
+    hand-concatenated script strings. Traversals are built through
+    gremlin_python's GraphTraversalSource (`g`) and anonymous traversals
+    (`__`), and their bytecode is translated by the ScriptTranslator into a
+    parameterized script with bindings before being submitted.
+    CosmosDB only accepts scripts (not bytecode), so rather than submitting
+    the bytecode, every value is sent as a binding; which keeps the values
+    out of the script (nothing needs to be escaped) and gives every call
+    of the same traversal shape the same script, and so the same compiled
+    plan on the server
+"""
+from gremlin_python.structure.graph import Graph
+from gremlin_python.process.graph_traversal import __
+from gremlin_python.process.traversal import (
+    Bytecode,
+    Traversal,
+    P,
+    TextP,
+    Binding
+)
+from enum import Enum
+import threading
+
+
+# The source every model traversal is built from; i.e. g.V().has(...)
+g = Graph().traversal()
+
+
+class ScriptTranslator:
+    """ Translates the bytecode of a traversal into a (script, bindings)
+        tuple.
+        The arguments of the steps that take property keys, labels and step
+        labels (i.e. `out('owns')`, `select('e')`) are written into the
+        script as literals, as they're part of the traversal's shape; every
+        other value (ids, property values, predicate values, limits, etc.)
+        is sent as a binding
+    """
+    # Steps whose (string) arguments are all keys or labels
+    LITERAL_STEPS = {
+        "addE", "addV", "aggregate", "as", "both", "bothE", "by", "cap",
+        "from", "group", "groupCount", "hasKey", "hasLabel", "hasNot", "in",
+        "inE", "out", "outE", "project", "properties", "select", "store",
+        "to", "tree", "valueMap", "values", "where"
+    }
+    # Steps where only the last argument is a value; i.e. has(key, value)
+    # and has(label, key, value)
+    KEYED_STEPS = {"has", "property"}
+
+    def __init__(self, prefix="b"):
+        self.prefix = prefix
+        self.bindings = {}
+
+    def translate(self, traversal):
+        """ Returns the (script, bindings) tuple of the traversal """
+        return "g" + self.instructions(traversal), self.bindings
+
+    def bind(self, value):
+        """ Adds the value as a binding and returns it's name """
+        if isinstance(value, Binding):
+            self.bindings[value.key] = value.value
+            return value.key
+        name = f"{self.prefix}{len(self.bindings)}"
+        self.bindings[name] = value
+        return name
+
+    @staticmethod
+    def literal(value):
+        """ Returns the quoted (and escaped) string literal """
+        escaped = value.replace("\\", "\\\\").replace("'", "\\'")
+        return f"'{escaped}'"
+
+    @staticmethod
+    def bytecode(traversal):
+        if isinstance(traversal, Traversal):
+            return traversal.bytecode
+        return traversal
+
+    def instructions(self, traversal):
+        """ Returns the `.step(args)` chain of the traversal's bytecode """
+        bytecode = self.bytecode(traversal)
+        script = ""
+        for instruction in bytecode.source_instructions + \
+                bytecode.step_instructions:
+            name, args = instruction[0], instruction[1:]
+            script += f".{name}({', '.join(self.arguments(name, args))})"
+        return script
+
+    def arguments(self, step, args):
+        """ Returns the translated arguments of the step """
+        if step in self.LITERAL_STEPS:
+            literals = range(len(args))
+        elif step in self.KEYED_STEPS:
+            literals = range(len(args) - 1)
+        else:
+            literals = ()
+
+        return [self.argument(arg, literal=index in literals)
+                for index, arg in enumerate(args)]
+
+    def argument(self, arg, literal=False):
+        if isinstance(arg, (Bytecode, Traversal)):
+            # Nested traversals that start with V() (i.e. `to(g.V(...))`)
+            # are written from the source, like the hand-written scripts
+            # were; gremlin_python keeps no difference between those and
+            # the anonymous `__.V(...)`
+            steps = self.bytecode(arg).step_instructions
+            source = "g" if steps and steps[0][0] == "V" else "__"
+            return source + self.instructions(arg)
+        if isinstance(arg, P):
+            return self.predicate(arg)
+        if isinstance(arg, Enum):
+            return self.token(arg)
+        if literal and isinstance(arg, str):
+            return self.literal(arg)
+        return self.bind(arg)
+
+    def predicate(self, predicate):
+        """ Returns the predicate with it's values bound; the values of
+            multi-valued predicates (i.e. within) are bound individually
+        """
+        prefix = "TextP." if isinstance(predicate, TextP) else ""
+        if predicate.other is not None and \
+                predicate.operator not in ("inside", "outside", "between"):
+            raise ValueError("Connected predicates (and/or) are not "
+                             "supported by the translator")
+
+        names = ", ".join(
+            self.bind(i) for i in self.predicate_values(predicate))
+        return f"{prefix}{predicate.operator}({names})"
+
+    @staticmethod
+    def predicate_values(predicate):
+        """ Returns the list of values bound for the predicate """
+        values = predicate.value
+        if predicate.operator in ("inside", "outside", "between"):
+            return [predicate.value, predicate.other]
+        if predicate.operator in ("within", "without") and \
+                isinstance(values, (list, tuple, set)):
+            return list(values)
+        return [values]
+
+    @staticmethod
+    def token(value):
+        """ Returns the enum token; i.e. T.id, Order.decr, Cardinality.list """
+        return f"{type(value).__name__}.{value.name.rstrip('_')}"
+
+    @classmethod
+    def shape(cls, traversal, values):
+        """ Returns the (hashable) shape of the traversal; everything that
+            is written into it's script. The values that would be bound are
+            added to `values`, in the same order as `translate` binds them
+        """
+        bytecode = cls.bytecode(traversal)
+        shape = []
+        for instructions in (bytecode.source_instructions,
+                             bytecode.step_instructions):
+            for instruction in instructions:
+                name = instruction[0]
+                if name in cls.LITERAL_STEPS:
+                    literals = len(instruction) - 1
+                elif name in cls.KEYED_STEPS:
+                    literals = len(instruction) - 2
+                else:
+                    literals = 0
+
+                step = [name]
+                for index, arg in enumerate(instruction[1:]):
+                    if type(arg) is str:
+                        if index < literals:
+                            step.append(arg)
+                        else:
+                            values.append(arg)
+                            step.append(None)
+                    elif isinstance(arg, (Bytecode, Traversal)):
+                        step.append(cls.shape(arg, values))
+                    elif isinstance(arg, P):
+                        predicate_values = cls.predicate_values(arg)
+                        values.extend(predicate_values)
+                        step.append((type(arg), arg.operator,
+                                     arg.other is not None,
+                                     len(predicate_values)))
+                    elif isinstance(arg, Enum):
+                        step.append(arg)
+                    elif isinstance(arg, Binding):
+                        values.append(arg.value)
+                        step.append((Binding, arg.key))
+                    else:
+                        values.append(arg)
+                        step.append(None)
+                shape.append(tuple(step))
+        return tuple(shape)
+
+
+class TranslationCache:
+    """ Stores the translated script, and the names of it's bindings, of
+        each traversal shape (see `ScriptTranslator.shape`); so a traversal
+        whose shape was already translated only has it's values collected,
+        instead of being translated again
+    """
+    # The cache is cleared once it holds this many shapes
+    MAX_SIZE = 5000
+
+    def __init__(self):
+        self._scripts = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def translate(self, traversal):
+        """ Returns the (script, bindings) tuple of the given traversal """
+        values = []
+        shape = ScriptTranslator.shape(traversal, values)
+        with self._lock:
+            cached = self._scripts.get(shape)
+            if cached is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if cached is not None:
+            script, names = cached
+            return script, dict(zip(names, values))
+
+        script, bindings = ScriptTranslator().translate(traversal)
+        # Bindings with the same name (i.e. a Binding used twice) can't be
+        # matched to the values by their position
+        if len(bindings) == len(values):
+            with self._lock:
+                if len(self._scripts) >= self.MAX_SIZE:
+                    self._scripts.clear()
+                self._scripts[shape] = (script, tuple(bindings))
+        return script, bindings
+
+    def clear(self):
+        """ Removes all of the stored scripts """
+        with self._lock:
+            self._scripts.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._scripts)
+
+
+translation_cache = TranslationCache()
+
+
+def translate(traversal):
+    """ Returns the (script, bindings) tuple of the given traversal, through
+        the translation cache
+    """
+    return translation_cache.translate(traversal)
+
+
+def submit(traversal):
+    """ Translates the traversal and submits it through the models' client;
+        returns the ResultSet, like `client.submit`
+    """
+    from db.engine import client
+    return client.submit(*translate(traversal))
@@ -19,7 +19,97 @@ DATABASE_SETTINGS = {
     "password": os.environ.get("DB_PASSWORD",
                                "YsvknCu93dwflesfg9H4E5GDWxBps97dkCWhvvWrb" +
                                "QRMQQG2FO0e8VDBVdIy3HWfSrwWJx5a7jmWvTsMYgVRBw=="),
-    "partition_key": os.environ.get("DB_PARTITION_KEY", "topic")
+    "partition_key": os.environ.get("DB_PARTITION_KEY", "topic"),
+    # The graph backend; `gremlin` (the server above) or `memory` (an
+    # in-process graph for development and tests)
+    "backend": os.environ.get("DB_BACKEND", "gremlin"),
+    # Records the latency/request charge of every query (see
+    # db.instrumentation); `query_log` also logs each query as a JSON line
+    "instrument_queries": os.environ.get(
+        "DB_INSTRUMENT_QUERIES", "true").lower() == "true",
+    "query_log": os.environ.get("DB_QUERY_LOG", "false").lower() == "true",
+    # Also measures the size of every response, by serializing it's results
+    # again; which costs as much as reading them
+    "query_response_bytes": os.environ.get(
+        "DB_QUERY_RESPONSE_BYTES", "false").lower() == "true",
+    # Queries taking longer than `slow_query_ms` are kept in a ring buffer
+    # of the last `slow_query_log_size` of them (see db.engine's
+    # `get_slow_query_log`); `slow_query_profile` also captures the server's
+    # execution profile of the slow read queries
+    "slow_query_ms": float(os.environ.get("DB_SLOW_QUERY_MS", 500)),
+    "slow_query_log_size": int(os.environ.get("DB_SLOW_QUERY_LOG_SIZE", 100)),
+    "slow_query_profile": os.environ.get(
+        "DB_SLOW_QUERY_PROFILE", "false").lower() == "true",
+    # Retries the queries throttled by CosmosDB (429) after the server's
+    # retry-after hint, and limits the rate of queries to `throttle_rate`
+    # per second (see db.throttling)
+    "throttle_queries": os.environ.get(
+        "DB_THROTTLE_QUERIES", "true").lower() == "true",
+    "throttle_rate": float(os.environ.get("DB_THROTTLE_RATE", 50)),
+    "throttle_burst": float(os.environ.get("DB_THROTTLE_BURST", 20)),
+    "throttle_max_retries": int(os.environ.get("DB_THROTTLE_MAX_RETRIES", 5)),
+    "throttle_max_wait": float(os.environ.get("DB_THROTTLE_MAX_WAIT", 30)),
+    # The message serializer of the connections (see db.serialization);
+    # `graphson2`, `graphson3`, or `lean`/`lean3` which decode the
+    # responses in a single pass
+    "serializer": os.environ.get("DB_SERIALIZER", "graphson2"),
+    # Connection pool settings - the pool size should be sized to the
+    # number of threads serving requests
+    "pool_size": int(os.environ.get("DB_POOL_SIZE", 4)),
+    # The connections opened as soon as the pool is created (upon the
+    # first query of each process); the rest are opened on demand
+    "warmup_connections": int(os.environ.get("DB_WARMUP_CONNECTIONS", 0)),
+    "max_workers": int(os.environ.get("DB_MAX_WORKERS", 4)),
+    "acquire_timeout": float(os.environ.get("DB_ACQUIRE_TIMEOUT", 30)),
+    "health_check_interval": float(
+        os.environ.get("DB_HEALTH_CHECK_INTERVAL", 60)),
+    "reconnect_attempts": int(os.environ.get("DB_RECONNECT_ATTEMPTS", 5)),
+    "reconnect_backoff": float(os.environ.get("DB_RECONNECT_BACKOFF", 0.5)),
+    "reconnect_backoff_max": float(
+        os.environ.get("DB_RECONNECT_BACKOFF_MAX", 10))
 }
 
 SECRET_KEY = os.environ.get("SECRET_KEY", "secret-key")
+
+# The number of server processes serving the app (i.e. gunicorn's workers,
+# which gunicorn also reads from WEB_CONCURRENCY); the caches kept in each
+# process can't be invalidated by the writes made through the others
+WORKER_PROCESSES = int(os.environ.get("WEB_CONCURRENCY", 1))
+
+# The emails of the users allowed to use the admin endpoints
+ADMIN_EMAILS = [i.strip() for i in os.environ.get(
+    "ADMIN_EMAILS", "").split(",") if i.strip()]
+
+# The process-wide cache of the roles resolved by the permission decorators
+# (see core.roles); entries are invalidated whenever a role is assigned,
+# changed or removed (or a node is moved), in the other processes through
+# the tokens kept in the shared response cache backend (i.e. "redis").
+# Without a shared backend, the cache is disabled if there is more than one
+# of the WORKER_PROCESSES
+ROLE_CACHE_SETTINGS = {
+    "maxsize": int(os.environ.get("ROLE_CACHE_SIZE", 10000)),
+    "ttl": float(os.environ.get("ROLE_CACHE_TTL", 30))
+}
+
+# The process-wide cache of each team's templates and their properties
+# (see core.templates); entries are invalidated whenever a template (or
+# it's properties) is changed through this process
+TEMPLATE_CACHE_SETTINGS = {
+    "maxsize": int(os.environ.get("TEMPLATE_CACHE_SIZE", 1024)),
+    "ttl": float(os.environ.get("TEMPLATE_CACHE_TTL", 300))
+}
+
+# The cache of the responses of the GET endpoints (see utils.response_cache),
+# configured as a Flask-Caching backend; "simple" is kept in each process,
+# a shared backend (i.e. "redis", along with the RESPONSE_CACHE_REDIS_URL)
+# is used by every process, and "null" disables the cache.
+# "simple" is only usable by a single process; the cache is disabled (with
+# a warning) if it's configured along with more than one WORKER_PROCESSES
+RESPONSE_CACHE_SETTINGS = {
+    "CACHE_TYPE": os.environ.get("RESPONSE_CACHE_TYPE", "simple"),
+    "CACHE_DEFAULT_TIMEOUT": int(os.environ.get("RESPONSE_CACHE_TTL", 300)),
+    "CACHE_THRESHOLD": int(os.environ.get("RESPONSE_CACHE_SIZE", 5000)),
+    "CACHE_KEY_PREFIX": os.environ.get("RESPONSE_CACHE_PREFIX", "ginger:"),
+    "CACHE_REDIS_URL": os.environ.get(
+        "RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+}
@@ -1,7 +1,9 @@
 from flask_testing import TestCase
 from api import app
 from db.engine import client
-import time
+from core.roles import role_cache
+from core.templates import template_cache
+from utils.response_cache import response_cache
 from settings import DATABASE_SETTINGS
 
 
@@ -27,10 +29,11 @@ class FlaskTestCase(TestCase):
         self.partition_key = DATABASE_SETTINGS['partition_key']
 
     def tearDown(self):
-        """ Clears the database after each test """
-        # This is to keep the request rate under control for CosmosDB Emulator
-        time.sleep(2)
+        """ Clears the database (and the caches) after each test """
         client.submit("g.V().drop()").all().result()
+        role_cache.clear()
+        template_cache.clear()
+        response_cache.clear()
 
     def generate_headers(self, token):
         """ Returns the authentication headers given the token """
@@ -1,9 +1,61 @@
 from api import app
+from flask import stream_with_context
+import itertools
+import logging
 import json
 
 
+logger = logging.getLogger(__name__)
+
+
 def jsonify_response(response, status=200):
     """ Returns the dict response as json with the provided status code """
     return app.response_class(
         response=json.dumps(response),
         status=status, mimetype="application/json")
+
+
+def stream_json_response(instances, schema, status=200):
+    """ Returns a response that serializes the instances (i.e. from a
+        `stream_filter`) into a JSON list through the given schema while
+        they're being iterated, instead of serializing the whole list first.
+        The first instance is fetched before the response is started, so
+        that a failing query still returns a 500; an error raised after
+        that (once the 200 was sent) is logged and ends the list with an
+        `{"error": ...}` element, which the clients have to check for.
+        The instances are closed in either case, releasing their stream
+    """
+    instances = iter(instances)
+
+    def close():
+        if hasattr(instances, "close"):
+            instances.close()
+
+    try:
+        first = [next(instances)]
+    except StopIteration:
+        first = []
+    except Exception:
+        logger.exception("Streamed response failed before it was started")
+        close()
+        return jsonify_response({"error": "Internal server error"}, 500)
+
+    def generate():
+        written = 0
+        try:
+            yield "["
+            for instance in itertools.chain(first, instances):
+                data = json.dumps(schema.dump(instance).data)
+                yield ("," if written else "") + data
+                written += 1
+        except Exception:
+            logger.exception("Streamed response failed after it was started")
+            yield ("," if written else "") + \
+                json.dumps({"error": "Internal server error"})
+        finally:
+            close()
+        yield "]"
+
+    return app.response_class(
+        response=stream_with_context(generate()),
+        status=status, mimetype="application/json")
@@ -0,0 +1,208 @@
+""" Provides the cache of the responses of the (most read) GET endpoints,
+    stored through a Flask-Caching backend: the in-process "simple" cache,
+    or a cache shared by every process (i.e. "redis").
+    Responses are cached per endpoint, url arguments, query string and
+    user, and tagged with the ids of the vertices they depend on (the ids in
+    the url and in the response, along with the user's id and the ids added
+    by the view through `tag`). Each tag has a
+    token (stored in the same backend, so that every process sees the same
+    tokens) which is replaced whenever the tag's vertex is written (see
+    `db.engine.notify_write`); cached responses keep the tokens of their
+    tags from when they were computed, and are only served while all of
+    them are still current
+"""
+from flask import current_app, g, request
+from flask_caching import Cache
+from flask_jwt_extended import get_jwt_identity
+from functools import wraps
+from db.engine import on_write
+import threading
+import logging
+import uuid
+
+
+logger = logging.getLogger(__name__)
+
+
+def response_ids(data):
+    """ Returns all of the "id" values in the (JSON) response data """
+    ids = set()
+    if isinstance(data, dict):
+        if isinstance(data.get("id"), str):
+            ids.add(data["id"])
+        data = data.values()
+    elif not isinstance(data, list):
+        return ids
+    for value in data:
+        ids |= response_ids(value)
+    return ids
+
+
+class ResponseCache:
+    """ Caches the responses of the decorated (GET) views; see `cached` """
+    # Included in the tags of every response; replaced when the ids of the
+    # written vertices aren't known
+    ALL = "*"
+
+    def __init__(self):
+        self.cache = Cache()
+        self.backend = None
+        self.shared = False
+        self.lock = threading.Lock()
+        # {endpoint: {"hits": .., "misses": ..}}
+        self.metrics = {}
+        self.invalidations = 0
+
+    def init_app(self, app, config, processes=1):
+        """ Creates the cache backend from the Flask-Caching `config`; a
+            "null" CACHE_TYPE disables the cache.
+            The "simple" (in-process) cache is disabled as well if the app
+            is served by more than one process, as the writes made through
+            one process would leave the others serving stale responses
+        """
+        config = dict(config)
+        if config["CACHE_TYPE"] == "simple" and processes > 1:
+            logger.warning(
+                "The response cache is disabled, as the \"simple\" cache "
+                f"can't be shared by the {processes} worker processes; a "
+                "shared backend (i.e. \"redis\") has to be configured")
+            config["CACHE_TYPE"] = "null"
+        self.cache.init_app(app, config=config)
+        self.backend = None if config["CACHE_TYPE"] == "null" else \
+            app.extensions["cache"][self.cache]
+        self.shared = config["CACHE_TYPE"] not in ("null", "simple")
+
+    def shared_backend(self):
+        """ Returns the cache backend if it's shared by every process (i.e.
+            "redis"), otherwise None
+        """
+        return self.backend if self.shared else None
+
+    @staticmethod
+    def tag_key(tag):
+        return f"tag:{tag}"
+
+    def tokens(self, tags):
+        """ Returns the current {tag: token} of the given tags, setting a
+            token for the tags that don't have one
+        """
+        tags = list(tags)
+        keys = [self.tag_key(i) for i in tags]
+        values = self.backend.get_many(*keys)
+        if None in values:
+            for key, value in zip(keys, values):
+                if value is None:
+                    # Not overwriting the token set by a concurrent request
+                    self.backend.add(key, uuid.uuid4().hex, timeout=0)
+            values = self.backend.get_many(*keys)
+        return dict(zip(tags, values))
+
+    def invalidate(self, vertex_ids):
+        """ Replaces the tokens of the given vertices' tags, which
+            invalidates every response tagged with them
+        """
+        if self.backend is None:
+            return
+        tags = {self.ALL if i is None else i for i in vertex_ids}
+        self.backend.set_many(
+            {self.tag_key(i): uuid.uuid4().hex for i in tags}, timeout=0)
+        with self.lock:
+            self.invalidations += len(tags)
+
+    def tag(self, vertex_ids):
+        """ Adds the given vertex ids to the tags of the response being
+            computed by the current (cached) view; for the vertices that
+            the response depends on without including their ids (i.e. the
+            favorited nodes without messages, left out of the inbox)
+        """
+        tags = getattr(g, "response_cache_tags", None)
+        if tags is not None:
+            tags.update(vertex_ids)
+
+    def record(self, endpoint, outcome):
+        with self.lock:
+            metrics = self.metrics.setdefault(
+                endpoint, {"hits": 0, "misses": 0})
+            metrics[outcome] += 1
+
+    @staticmethod
+    def request_key():
+        """ Returns the key of the current request's response """
+        view_args = ",".join(
+            f"{key}={value}"
+            for key, value in sorted((request.view_args or {}).items()))
+        query = "&".join(
+            f"{key}={value}"
+            for key, value in sorted(request.args.items(multi=True)))
+        return f"response:{request.endpoint}:{view_args}:{query}:" \
+            f"{get_jwt_identity()}"
+
+    def cached(self, view):
+        """ Decorator for GET views, which serves the view's cached response
+            if none of the vertices it depends on were written since;
+            meant to be applied after (below) the authentication and
+            permission decorators, so that those still run on every request.
+            Only successful (200) responses are cached
+        """
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if self.backend is None:
+                return view(*args, **kwargs)
+
+            key = self.request_key()
+            known_tags = {self.ALL, get_jwt_identity()}
+            known_tags |= {value for name, value in
+                           (request.view_args or {}).items()
+                           if name.endswith("_id")}
+
+            entry = self.backend.get(key)
+            if entry is not None and \
+                    self.backend.get_many(*[self.tag_key(i) for i in
+                                            entry["tags"]]) == \
+                    list(entry["tags"].values()):
+                self.record(request.endpoint, "hits")
+                data, status, mimetype = entry["response"]
+                return current_app.response_class(
+                    response=data, status=status, mimetype=mimetype)
+            self.record(request.endpoint, "misses")
+
+            before = self.tokens(known_tags)
+            g.response_cache_tags = set()
+            response = view(*args, **kwargs)
+            if response.status_code != 200 or response.is_streamed:
+                return response
+
+            tags = self.tokens(known_tags | g.response_cache_tags |
+                               response_ids(response.get_json()))
+            # Not storing the response if any of the vertices from the url
+            # were written while it was computed
+            if any(tags[i] != token for i, token in before.items()):
+                return response
+            self.backend.set(key, {
+                "tags": tags,
+                "response": (response.get_data(), response.status_code,
+                             response.mimetype)
+            })
+            return response
+
+        return wrapper
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+        with self.lock:
+            self.metrics.clear()
+            self.invalidations = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "enabled": self.backend is not None,
+                "invalidations": self.invalidations,
+                "endpoints": {endpoint: dict(metrics) for endpoint, metrics
+                              in self.metrics.items()}
+            }
+
+
+response_cache = ResponseCache()
+on_write(response_cache.invalidate)